@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+"""
+Compare computing `appsecret_proof` on every call with the memoized version.
+
+    $ PYTHONPATH=src python benchmarks/bench_appsecret_proof.py
+"""
+import timeit
+
+from facegraph import api
+
+NUMBER = 100000
+CALLS_PER_HOUR = 100000
+
+APP_SECRET = 'a3f9c2e1b7d84a6f9e0c1b2d3e4f5a6b'
+TOKENS = ['EAAB%040d' % i for i in range(100)]
+
+
+def uncached():
+    for token in TOKENS:
+        api._compute_appsecret_proof(APP_SECRET, token)
+
+
+def cached():
+    for token in TOKENS:
+        api.get_appsecret_proof(APP_SECRET, token)
+
+
+def per_call(fn):
+    calls = NUMBER * len(TOKENS) / 100
+    seconds = min(timeit.repeat(fn, number=NUMBER / 100, repeat=5))
+    return seconds / calls
+
+
+def main():
+    api._appsecret_proofs.clear()
+    cached()  # Warm the cache, as a long-running worker would be.
+
+    before = per_call(uncached)
+    after = per_call(cached)
+    print 'uncached: %8.3f us/call' % (before * 1e6)
+    print 'cached:   %8.3f us/call' % (after * 1e6)
+    print 'speedup:  %8.1fx' % (before / after)
+    print 'saved at %d calls/hour: %.3f CPU seconds/hour' % (
+        CALLS_PER_HOUR, (before - after) * CALLS_PER_HOUR)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Time decoding Graph API responses with each available JSON codec.
+
+The payloads in `benchmarks/payloads` are shaped like real responses (a page
+feed, `?ids=` users, comments, insights and an error). Pass other files or
+directories, e.g. responses recorded from your own workload, to time those
+instead:
+
+    $ PYTHONPATH=src python benchmarks/bench_codecs.py
+    $ PYTHONPATH=src python benchmarks/bench_codecs.py recorded/*.json
+"""
+import glob
+import os
+import sys
+import timeit
+
+from facegraph import codec
+
+PAYLOADS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'payloads')
+
+NUMBER = 200
+
+
+def load_payloads(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.json'))))
+        else:
+            files.append(path)
+    payloads = []
+    for filename in files:
+        with open(filename) as fp:
+            payloads.append((os.path.basename(filename), fp.read()))
+    return payloads
+
+
+def main(paths):
+    payloads = load_payloads(paths or [PAYLOADS])
+    names = codec.available()
+    print '%-20s %8s %s' % ('payload', 'bytes', ''.join('%14s' % n for n in names))
+    totals = dict.fromkeys(names, 0)
+    for filename, payload in payloads:
+        row = []
+        for name in names:
+            loads = codec.get(name).loads
+            seconds = min(timeit.repeat(lambda: loads(payload),
+                                        number=NUMBER, repeat=3)) / NUMBER
+            totals[name] += seconds
+            row.append('%11.1f us' % (seconds * 1e6))
+        print '%-20s %8d %s' % (filename, len(payload), ''.join(row))
+    print '%-20s %8s %s' % ('total', '', ''.join(
+        '%11.1f us' % (totals[name] * 1e6) for name in names))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
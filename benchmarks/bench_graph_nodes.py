@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+"""
+Time building `Graph` node chains and serializing their URLs.
+
+    $ PYTHONPATH=src python benchmarks/bench_graph_nodes.py
+"""
+import timeit
+
+SETUP = '''
+from facegraph.graph import Graph
+g = Graph('access_token', 'app_secret')
+'''
+
+CASES = [
+    ('g.me.feed', 'g.me.feed'),
+    ('g[id].comments.url', 'g[123456789].comments.url'),
+    ('g.a.b.c.d.e', 'g.a.b.c.d.e'),
+    ('g.me.feed.fields(...)', "g.me.feed.fields('id', 'message', 'from')"),
+    ('g.me.with_url_params(...).url', "g.me.with_url_params('limit', 100).url"),
+]
+
+NUMBER = 100000
+
+def main():
+    for name, stmt in CASES:
+        seconds = min(timeit.repeat(stmt, SETUP, number=NUMBER, repeat=3))
+        print '%-32s %8.3f us' % (name, seconds / NUMBER * 1e6)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Time importing facegraph, in fresh interpreters.
+
+Each statement is run `--runs` times, each in a new process so nothing is
+already imported, and timed from within it, so the interpreter's own startup
+is not counted; the median is reported. The last row adds what is deferred
+until the first request: importing `requests` with green sockets, and
+creating the session.
+
+    $ PYTHONPATH=src python benchmarks/bench_import.py
+    $ PYTHONPATH=src python benchmarks/bench_import.py --runs 50
+"""
+import optparse
+import os
+import subprocess
+import sys
+
+STATEMENTS = [
+    ('import eventlet', 'import eventlet'),
+    ('import facegraph', 'import facegraph'),
+    ('from facegraph import Graph', 'from facegraph import Graph'),
+    ('from facegraph import FQL, Api', 'from facegraph import FQL, Api'),
+    ('from facegraph import AsyncGraph', 'from facegraph import AsyncGraph'),
+    ('+ first session', 'from facegraph import Graph; '
+                        'from facegraph.transport import default_transport; '
+                        'default_transport.session'),
+]
+
+TIMER = '''
+import time
+started = time.time()
+%s
+print (time.time() - started) * 1000
+'''
+
+
+def time_statement(statement, runs):
+    times = []
+    for i in xrange(runs):
+        output = subprocess.check_output([sys.executable, '-c', TIMER % statement],
+                                         env=os.environ)
+        times.append(float(output))
+    times.sort()
+    return times[len(times) // 2]
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--runs', type='int', default=20)
+    options, args = parser.parse_args()
+
+    print '%-36s %10s' % ('statement', 'median ms')
+    for name, statement in STATEMENTS:
+        print '%-36s %10.1f' % (name, time_statement(statement, options.runs))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+"""
+Drive `Graph`, `FQL` and `Api` at scale against a local mock Graph API.
+
+Starts `mockserver.py` in another process, then makes `--requests` calls
+for each scenario, `--concurrency` at a time in greenthreads, and reports
+throughput, p50/p99 latency, and client CPU time and RSS growth per request:
+
+    $ PYTHONPATH=src python benchmarks/bench_load.py
+    $ PYTHONPATH=src python benchmarks/bench_load.py --latency 0.05 \\
+          --error-rate 0.01 --concurrency 200 call_fb fql_multi
+
+Errors are counted, not raised, so `--error-rate` and `--throttle-rate`
+show the cost of retries and error handling. `--https` serves TLS with a
+throwaway self-signed certificate (made with the `openssl` command).
+
+Save results with `--save results.json`; `--compare results.json` reports
+the change against them and exits with status 1 if throughput dropped, or
+p99 latency rose, by more than `--tolerance`, to catch regressions before
+a release.
+"""
+import optparse
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from StringIO import StringIO
+
+import eventlet
+import simplejson as json
+
+from facegraph.api import Api
+from facegraph.fql import FQL
+from facegraph.graph import Graph
+from facegraph.transport import Transport
+
+import mockserver
+
+PHOTO = 'P' * 16 * 1024
+
+SCENARIOS = ('call_fb', 'feed', 'post', 'post_mime', 'fql_multi',
+             'api_execute')
+
+
+def make_clients(root, certfile=None):
+    """Return a `Graph`, `FQL` and `Api` talking to the server at `root`."""
+    transport = Transport()
+    # Ignore proxies and CA bundles set in the environment.
+    transport.session.trust_env = False
+    if certfile:
+        transport.session.verify = certfile
+
+    class LocalFQL(FQL):
+        ENDPOINT = root + 'method/'
+
+    class LocalApi(Api):
+        GRAPH_ROOT = root
+        REST_ROOT = root + 'method/'
+
+    graph = Graph('token', url=root, transport=transport)
+    fql = LocalFQL('token', transport=transport)
+    api = LocalApi('token', transport=transport)
+    return graph, fql, api
+
+
+def scenario(name, graph, fql, api):
+    """Return a function making request number `i` of scenario `name`."""
+    if name == 'call_fb':
+        return lambda i: graph[100000 + i].call_fb()
+    if name == 'feed':
+        return lambda i: graph[100000 + i].feed.call_fb()
+    if name == 'post':
+        return lambda i: graph[100000 + i].feed.post(message='Post %d' % i)
+    if name == 'post_mime':
+        return lambda i: graph[100000 + i].photos.post_file(
+            StringIO(PHOTO), message='Photo %d' % i)
+    if name == 'fql_multi':
+        return lambda i: fql.multi({
+            'posts': 'SELECT post_id FROM stream WHERE source_id = %d' % i,
+            'actors': 'SELECT name FROM user WHERE uid IN '
+                      '(SELECT actor_id FROM #posts)'})
+    if name == 'api_execute':
+        return lambda i: api.users.getInfo(uids=str(i), fields='name')
+    raise ValueError('Unknown scenario %r' % name)
+
+
+def rss_kb():
+    with open('/proc/self/statm') as fp:
+        return int(fp.read().split()[1]) * resource.getpagesize() / 1024
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(q / 100.0 * len(sorted_values)))
+    return sorted_values[index]
+
+
+def run(call, requests, concurrency):
+    latencies = []
+    errors = [0]
+
+    def timed(i):
+        started = time.time()
+        try:
+            call(i)
+        except Exception:
+            errors[0] += 1
+        latencies.append(time.time() - started)
+
+    pool = eventlet.GreenPool(concurrency)
+    # Warm up: open connections and fill caches before measuring.
+    for i in xrange(min(concurrency, requests)):
+        pool.spawn_n(timed, i)
+    pool.waitall()
+    del latencies[:]
+    errors[0] = 0
+
+    rss_before = rss_kb()
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.time()
+    for i in xrange(requests):
+        pool.spawn_n(timed, i)
+    pool.waitall()
+    elapsed = time.time() - started
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+
+    cpu = ((usage.ru_utime - usage_before.ru_utime) +
+           (usage.ru_stime - usage_before.ru_stime))
+    latencies.sort()
+    return {'requests': requests,
+            'errors': errors[0],
+            'req_per_s': requests / elapsed,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'cpu_us_per_req': cpu / requests * 1e6,
+            'rss_kb': rss_kb() - rss_before}
+
+
+def self_signed_cert(directory):
+    certfile = os.path.join(directory, 'cert.pem')
+    keyfile = os.path.join(directory, 'key.pem')
+    subprocess.check_call(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+         '-days', '1', '-subj', '/CN=localhost',
+         '-addext', 'subjectAltName=DNS:localhost',
+         '-keyout', keyfile, '-out', certfile],
+        stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+    return certfile, keyfile
+
+
+def compare(results, baseline, tolerance):
+    """Print the change from `baseline`; return whether any regressed."""
+    regressed = False
+    print
+    print '%-12s %12s %12s' % ('vs baseline', 'req/s', 'p99')
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if not base:
+            continue
+        throughput = result['req_per_s'] / base['req_per_s'] - 1
+        p99 = result['p99_ms'] / base['p99_ms'] - 1 if base['p99_ms'] else 0
+        flag = ''
+        if throughput < -tolerance or p99 > tolerance:
+            flag = '  REGRESSION'
+            regressed = True
+        print '%-12s %+11.1f%% %+11.1f%%%s' % (name, throughput * 100,
+                                               p99 * 100, flag)
+    return regressed
+
+
+def main():
+    parser = optparse.OptionParser(
+        usage='%prog [options] [scenario ...]',
+        description='Scenarios: ' + ', '.join(SCENARIOS))
+    parser.add_option('-n', '--requests', type='int', default=2000)
+    parser.add_option('-c', '--concurrency', type='int', default=50)
+    parser.add_option('--latency', type='float', default=0)
+    parser.add_option('--jitter', type='float', default=0)
+    parser.add_option('--error-rate', type='float', default=0)
+    parser.add_option('--throttle-rate', type='float', default=0)
+    parser.add_option('--payloads', default=mockserver.PAYLOADS)
+    parser.add_option('--https', action='store_true')
+    parser.add_option('--save', metavar='FILE')
+    parser.add_option('--compare', metavar='FILE')
+    parser.add_option('--tolerance', type='float', default=0.2)
+    options, names = parser.parse_args()
+
+    tempdir = tempfile.mkdtemp()
+    certfile = keyfile = None
+    if options.https:
+        certfile, keyfile = self_signed_cert(tempdir)
+    server, port = mockserver.start(
+        latency=options.latency, jitter=options.jitter,
+        error_rate=options.error_rate, throttle_rate=options.throttle_rate,
+        payloads=options.payloads, certfile=certfile, keyfile=keyfile)
+    try:
+        scheme = 'https' if options.https else 'http'
+        root = '%s://localhost:%d/' % (scheme, port)
+        clients = make_clients(root, certfile)
+
+        results = {}
+        print '%-12s %8s %7s %9s %9s %9s %11s %8s' % (
+            'scenario', 'requests', 'errors', 'req/s', 'p50 ms', 'p99 ms',
+            'cpu us/req', 'rss KB')
+        for name in names or SCENARIOS:
+            result = run(scenario(name, *clients), options.requests,
+                         options.concurrency)
+            results[name] = result
+            print '%-12s %8d %7d %9.0f %9.2f %9.2f %11.0f %8d' % (
+                name, result['requests'], result['errors'],
+                result['req_per_s'], result['p50_ms'], result['p99_ms'],
+                result['cpu_us_per_req'], result['rss_kb'])
+    finally:
+        server.kill()
+        server.wait()
+        shutil.rmtree(tempdir)
+
+    if options.save:
+        with open(options.save, 'w') as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+    if options.compare:
+        with open(options.compare) as fp:
+            if compare(results, json.load(fp), options.tolerance):
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
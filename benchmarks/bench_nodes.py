@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Compare eager `bunch.bunchify` with lazy `Node` wrapping of a feed page.
+
+Reports the time to wrap a decoded page of 100 posts and read two fields
+of each, to read the whole page, and how many container objects are
+allocated for each.
+
+    $ PYTHONPATH=src python benchmarks/bench_nodes.py
+"""
+import gc
+import timeit
+
+import bunch
+import simplejson as json
+
+from facegraph.node import wrap
+
+
+def make_post(i):
+    user = {'id': str(1000 + i), 'name': 'User %d' % i}
+    return {
+        'id': '123_%d' % i,
+        'from': user,
+        'message': 'Post number %d ' % i * 5,
+        'created_time': '2013-05-01T12:00:00+0000',
+        'privacy': {'value': 'EVERYONE', 'description': 'Public'},
+        'actions': [{'name': 'Comment', 'link': 'https://facebook.com/%d' % i},
+                    {'name': 'Like', 'link': 'https://facebook.com/%d' % i}],
+        'likes': {'data': [dict(user, id=str(j)) for j in range(10)],
+                  'paging': {'cursors': {'after': 'QVFI', 'before': 'QVFI'}}},
+        'comments': {'data': [{'id': '%d_%d' % (i, j), 'from': user,
+                               'message': 'Comment %d' % j,
+                               'like_count': j} for j in range(5)]},
+    }
+
+PAGE = json.dumps({'data': [make_post(i) for i in range(100)],
+                   'paging': {'next': 'https://graph.facebook.com/me/feed'}})
+
+
+def read_two_fields(convert, raw):
+    page = convert(raw)
+    [(post.id, post['from'].name) for post in page.data]
+    return page
+
+
+def read_everything(convert, raw):
+    def walk(value):
+        if isinstance(value, dict):
+            for key in value:
+                walk(value[key])
+        elif isinstance(value, list):
+            for item in value:
+                walk(item)
+    page = convert(raw)
+    walk(page)
+    return page
+
+
+def allocations(func, convert):
+    """Count the objects a conversion allocates and keeps alive."""
+    raw = json.loads(PAGE)
+    gc.collect()
+    before = len(gc.get_objects())
+    page = func(convert, raw)
+    count = len(gc.get_objects()) - before
+    del page
+    return count
+
+CASES = [
+    ('read two fields', read_two_fields),
+    ('read everything', read_everything),
+]
+
+CONVERTERS = [('bunchify', bunch.bunchify), ('Node', wrap)]
+
+NUMBER = 100
+
+
+def main():
+    decode = min(timeit.repeat(lambda: json.loads(PAGE), number=NUMBER, repeat=3))
+    print '%-32s %8.3f ms' % ('json.loads (baseline)', decode / NUMBER * 1e3)
+    for name, func in CASES:
+        for converter, convert in CONVERTERS:
+            seconds = min(timeit.repeat(lambda: func(convert, json.loads(PAGE)),
+                                        number=NUMBER, repeat=3))
+            print '%-32s %8.3f ms %8d objects' % (
+                '%s (%s)' % (name, converter), seconds / NUMBER * 1e3,
+                allocations(func, convert))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Compare the memory held per post as bunchified dicts, `Node`s and records,
+for a sync which keeps (id, created_time, message, from.id) of every post.
+
+    $ PYTHONPATH=src python benchmarks/bench_records.py
+"""
+import gc
+import sys
+import timeit
+
+import bunch
+import simplejson as json
+
+from facegraph.node import wrap
+from facegraph.records import record_class
+
+FIELDS = ('id', 'created_time', 'message', 'from.id')
+
+# What Facebook returns for ?fields=id,created_time,message,from{id}
+PAGE = json.dumps({'data': [
+    {'id': '123456789_%d' % i, 'created_time': '2013-05-01T12:00:00+0000',
+     'message': 'Post number %d' % i, 'from': {'id': str(1000 + i)}}
+    for i in range(1000)]})
+
+
+def deep_size(value, seen=None):
+    """Approximate the bytes held by `value` and everything it refers to."""
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen)
+                    for k, v in dict.iteritems(value))
+    elif isinstance(value, list):
+        size += sum(deep_size(v, seen) for v in list.__iter__(value))
+    elif hasattr(value, '__slots__'):
+        size += sum(deep_size(getattr(value, a), seen) for a in value.__slots__)
+    return size
+
+
+def bunchify_items():
+    return bunch.bunchify(json.loads(PAGE)).data
+
+
+def node_items():
+    # Touching from.id wraps `from` in a Node of its own.
+    items = wrap(json.loads(PAGE)).data
+    [item['from'].id for item in items]
+    return items
+
+
+def record_items():
+    Post = record_class(FIELDS)
+    return [Post.from_dict(item) for item in json.loads(PAGE)['data']]
+
+CASES = [('bunchify', bunchify_items), ('Node', node_items),
+         ('Record', record_items)]
+
+NUMBER = 20
+
+
+def main():
+    for name, func in CASES:
+        items = func()
+        gc.collect()
+        per_item = deep_size(items) / float(len(items))
+        seconds = min(timeit.repeat(func, number=NUMBER, repeat=3))
+        print '%-12s %8.0f bytes/item %8.3f ms/page' % (
+            name, per_item, seconds / NUMBER * 1e3)
+
+if __name__ == '__main__':
+    main()
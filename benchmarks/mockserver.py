@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+A local stand-in for graph.facebook.com and api.facebook.com.
+
+Serves the responses in `benchmarks/payloads` (or another directory of
+recorded responses) to whichever path is asked for, with optional latency,
+transient errors and throttling, so clients can be driven at scale without
+touching Facebook:
+
+    $ python benchmarks/mockserver.py --port 8000 --latency 0.05 --error-rate 0.01
+
+Reads of a path ending in `feed`/`posts`, `comments` or `insights` get the
+recorded response of that name, `?ids=` reads get `ids.json`, and other
+reads a small node. POSTs get a new id, `fql.query` and `fql.multiquery`
+get result sets, and other REST methods an empty object. With `--certfile`
+(and `--keyfile`) it speaks HTTPS.
+
+`bench_load.py` starts one with `start()`, in a separate process so that the
+server's CPU time is not counted against the client's.
+"""
+import optparse
+import os
+import random
+import subprocess
+import sys
+import urlparse
+
+import eventlet
+import eventlet.wsgi
+import simplejson as json
+
+PAYLOADS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'payloads')
+
+TRANSIENT_ERROR = json.dumps({'error': {
+    'code': 2, 'is_transient': True, 'type': 'OAuthException',
+    'message': 'An unexpected error has occurred. Please retry your request later.'}})
+THROTTLED_ERROR = json.dumps({'error': {
+    'code': 4, 'type': 'OAuthException',
+    'message': '(#4) Application request limit reached'}})
+THROTTLED_USAGE = json.dumps({'call_count': 100, 'total_time': 40,
+                              'total_cputime': 35})
+
+FQL_ROWS = [{'post_id': '123_%d' % i, 'actor_id': 1000 + i,
+             'message': 'Post number %d' % i} for i in range(20)]
+
+
+class MockGraphApp(object):
+
+    def __init__(self, payloads=PAYLOADS, latency=0, jitter=0, error_rate=0,
+                 throttle_rate=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.payloads = {}
+        for filename in os.listdir(payloads):
+            name, ext = os.path.splitext(filename)
+            if ext == '.json':
+                with open(os.path.join(payloads, filename)) as fp:
+                    self.payloads[name] = fp.read()
+        self.posts = 0
+
+    def __call__(self, environ, start_response):
+        if environ.get('CONTENT_LENGTH'):
+            environ['wsgi.input'].read()
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            eventlet.sleep(delay)
+
+        headers = [('Content-Type', 'application/json; charset=UTF-8')]
+        roll = random.random()
+        if roll < self.throttle_rate:
+            status, body = '400 Bad Request', THROTTLED_ERROR
+            headers.append(('X-App-Usage', THROTTLED_USAGE))
+        elif roll < self.throttle_rate + self.error_rate:
+            status, body = '500 Internal Server Error', TRANSIENT_ERROR
+        else:
+            status, body = '200 OK', self.respond(environ)
+        start_response(status, headers)
+        return [body]
+
+    def respond(self, environ):
+        path = environ['PATH_INFO'].rstrip('/')
+        params = dict(urlparse.parse_qsl(environ.get('QUERY_STRING', '')))
+        if path.startswith('/method/'):
+            method = path[len('/method/'):]
+            if method == 'fql.query':
+                return json.dumps(FQL_ROWS)
+            if method == 'fql.multiquery':
+                queries = json.loads(params.get('queries', '{}'))
+                names = queries.keys() if isinstance(queries, dict) else range(len(queries))
+                return json.dumps([{'name': name, 'fql_result_set': FQL_ROWS}
+                                   for name in names])
+            return '{}'
+        if environ['REQUEST_METHOD'] == 'POST':
+            self.posts += 1
+            return json.dumps({'id': '123_%d' % self.posts})
+        if path == '/fql':
+            return json.dumps({'data': FQL_ROWS})
+        if 'ids' in params:
+            return self.payloads.get('ids', '{}')
+        edge = path.rsplit('/', 1)[-1]
+        if edge == 'posts':
+            edge = 'feed'
+        if edge in self.payloads:
+            return self.payloads[edge]
+        return json.dumps({'id': edge or 'me', 'name': 'Node %s' % edge})
+
+
+def serve(port=0, certfile=None, keyfile=None, ready=None, **options):
+    sock = eventlet.listen(('127.0.0.1', port), backlog=1024)
+    if certfile:
+        sock = eventlet.wrap_ssl(sock, certfile=certfile, keyfile=keyfile,
+                                 server_side=True)
+    if ready is not None:
+        ready(sock.getsockname()[1])
+    eventlet.wsgi.server(sock, MockGraphApp(**options), log_output=False,
+                         max_size=10000)
+
+
+def start(latency=0, jitter=0, error_rate=0, throttle_rate=0, payloads=PAYLOADS,
+          certfile=None, keyfile=None):
+    """Start a server in a new process; return it and the port it is on."""
+    args = [sys.executable, os.path.abspath(__file__), '--port', '0',
+            '--latency', str(latency), '--jitter', str(jitter),
+            '--error-rate', str(error_rate),
+            '--throttle-rate', str(throttle_rate), '--payloads', payloads]
+    if certfile:
+        args += ['--certfile', certfile]
+    if keyfile:
+        args += ['--keyfile', keyfile]
+    process = subprocess.Popen(args, stdout=subprocess.PIPE)
+    line = process.stdout.readline()
+    if not line.startswith('listening on '):
+        process.kill()
+        raise RuntimeError('Mock server failed to start')
+    return process, int(line.split()[-1])
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--port', type='int', default=8000)
+    parser.add_option('--latency', type='float', default=0,
+                      help='seconds to wait before each response')
+    parser.add_option('--jitter', type='float', default=0,
+                      help='up to this many more seconds, at random')
+    parser.add_option('--error-rate', type='float', default=0,
+                      help='fraction of requests failing with a transient 500')
+    parser.add_option('--throttle-rate', type='float', default=0,
+                      help='fraction of requests throttled (error code 4)')
+    parser.add_option('--payloads', default=PAYLOADS)
+    parser.add_option('--certfile')
+    parser.add_option('--keyfile')
+    options, args = parser.parse_args()
+
+    def ready(port):
+        print 'listening on %d' % port
+        sys.stdout.flush()
+
+    serve(options.port, options.certfile, options.keyfile, ready,
+          payloads=options.payloads, latency=options.latency,
+          jitter=options.jitter, error_rate=options.error_rate,
+          throttle_rate=options.throttle_rate)
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,44 @@
 # -*- coding: utf-8 -*-
+import importlib
+import sys
+import types
 
 __version__ = '1.1.0'
 
-from facegraph.api import Api
-from facegraph.api import ApiException
-from facegraph.fql import FQL
-from facegraph.graph import Graph
-from facegraph.graph import GraphException
+# The classes exported here, and the modules they are imported from the
+# first time they are used; importing them all up front is slow.
+_exports = {
+    'Api': 'facegraph.api',
+    'ApiException': 'facegraph.api',
+    'FQL': 'facegraph.fql',
+    'Graph': 'facegraph.graph',
+    'GraphException': 'facegraph.graph',
+    'AsyncFQL': 'facegraph.async_graph',
+    'AsyncGraph': 'facegraph.async_graph',
+}
+
+__all__ = sorted(_exports)
+
+
+class _LazyModule(types.ModuleType):
+
+    def __getattr__(self, name):
+        try:
+            module = _exports[name]
+        except KeyError:
+            raise AttributeError("'module' object has no attribute %r" % name)
+        value = getattr(importlib.import_module(module), name)
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(_exports))
+
+
+_module = sys.modules[__name__]
+_lazy = _LazyModule(__name__, __doc__)
+_lazy.__dict__.update(_module.__dict__)
+# Keep the original module alive: Python 2 clears a module's globals, which
+# `_LazyModule` uses, when it is freed.
+_lazy._module = _module
+sys.modules[__name__] = _lazy
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from facegraph.transport import requests_adapters, timed_connection_class
+
+__all__ = ['TimingAdapter', 'DNSCachingAdapter']
+
+
+class TimingAdapter(requests_adapters.HTTPAdapter):
+
+    """An `HTTPAdapter` whose new connections are timed; see `pop_connect_time`."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        requests_adapters.HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+        manager = self.poolmanager
+        new_pool = manager._new_pool
+
+        def _new_pool(scheme, host, port):
+            pool = new_pool(scheme, host, port)
+            pool.ConnectionCls = self.connection_class(pool.ConnectionCls)
+            return pool
+        manager._new_pool = _new_pool
+
+    def connection_class(self, base):
+        return timed_connection_class(base)
+
+
+class DNSCachingAdapter(TimingAdapter):
+
+    """A `TimingAdapter` whose new connections look hosts up in a `DNSCache`."""
+
+    def __init__(self, dns_cache, **kwargs):
+        self.dns_cache = dns_cache
+        TimingAdapter.__init__(self, **kwargs)
+
+    def connection_class(self, base):
+        return self.dns_cache.connection_class(
+            TimingAdapter.connection_class(self, base))
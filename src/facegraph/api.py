@@ -1,23 +1,27 @@
 import hashlib
 import hmac
 import socket
-import simplejson
 from urllib import urlencode, unquote
 from simplejson.decoder import JSONDecodeError
 
-FB_READ_TIMEOUT = 180
+from facegraph import codec
+from facegraph.circuit import CircuitBreakerRegistry
+from facegraph.instrument import Hooks, RequestEvent
+from facegraph.multipart import FilePart, MultipartEncoder
+from facegraph.retry import RECOVERABLE_FACEBOOK_ERRORS, RetryPolicy
 
-# Facebook occasionally gives these back instead of a valid json response
-RECOVERABLE_FACEBOOK_ERRORS = {
-    'recv() failed: Connection reset by peer',
-    'Got EOF while waiting for outstanding responses',
-}
+FB_READ_TIMEOUT = 180
 
 class Api:
 
+    # Where requests are sent; override these to talk to a stand-in server.
+    GRAPH_ROOT = 'https://graph.facebook.com/'
+    REST_ROOT = 'https://api.facebook.com/method/'
+
     def __init__(self, access_token=None, app_secret=None, request=None, cookie=None, app_id=None,
                        stack=None, err_handler=None, timeout=FB_READ_TIMEOUT, urllib2=None,
-                       httplib=None, retries=5):
+                       httplib=None, retries=5, retry_policy=None, circuit_breakers=None,
+                       transport=None, hooks=None):
 
         self.uid = None
         self.access_token = access_token
@@ -26,7 +30,14 @@ class Api:
         self.cookie = cookie
         self.err_handler = err_handler
         self.retries = retries
-
+        self.retry_policy = retry_policy
+        self.circuit_breakers = circuit_breakers
+        self.transport = transport
+        self.hooks = hooks
+
+        # Requests go through `transport` (or the shared session) unless a
+        # `urllib2` module is given.
+        self._urllib2 = urllib2
         if urllib2 is None:
             import urllib2
         self.urllib2 = urllib2
@@ -61,8 +72,10 @@ class Api:
         s.append(name)
         return self.__class__(stack=s, access_token=self.access_token, app_secret=self.app_secret,
                               cookie=self.cookie, err_handler=self.err_handler,
-                              timeout=self.timeout, retries=self.retries, urllib2=self.urllib2,
-                              httplib=self.httplib)
+                              timeout=self.timeout, retries=self.retries, urllib2=self._urllib2,
+                              httplib=self.httplib, retry_policy=self.retry_policy,
+                              circuit_breakers=self.circuit_breakers,
+                              transport=self.transport, hooks=self.hooks)
 
     def __getattr__(self, name):
         """
@@ -76,7 +89,7 @@ class Api:
             params['appsecret_proof'] = get_appsecret_proof(
                 self.app_secret, self.access_token)
         return self._execute(
-            "https://graph.facebook.com/fql", q=query, **params)
+            self.GRAPH_ROOT + "fql", q=query, **params)
 
     def _execute(self, fb_url, _retries=None, **kwargs):
         # UTF8
@@ -93,25 +106,80 @@ class Api:
             fb_url += 'access_token=%s&' % self.access_token
         fb_url += urlencode(utf8_kwargs)
 
-        attempt = 0
+        client = self._client()
+        hooks = Hooks.resolve(self.hooks)
+        event = RequestEvent('GET', fb_url)
+        retry = RetryPolicy.resolve(self.retry_policy, _retries).start()
+        breaker = CircuitBreakerRegistry.resolve(self.circuit_breakers, fb_url)
         while True:
+            breaker.before()
+            event.begin(retry.attempt)
+            hooks.fire('before_request', event)
             try:
-                response = self.urllib2.urlopen(fb_url, timeout=self.timeout).read()
-                break
-            except self.urllib2.HTTPError, e:
-                response = e.read()
-                if response in RECOVERABLE_FACEBOOK_ERRORS and attempt < _retries:
-                    attempt += 1
-                else:
-                    break
-            except (self.httplib.BadStatusLine, IOError):
-                if attempt < _retries:
-                    attempt += 1
-                else:
+                status, response, error = self._get(client, fb_url, event)
+            except (self.httplib.BadStatusLine, IOError), e:
+                # `requests`' exceptions are `IOError`s too.
+                breaker.record(False)
+                hooks.report(event.finish(e))
+                if not retry.retry():
                     raise
+                hooks.fire('on_retry', event)
+                continue
+            except BaseException, e:
+                # Killed, timed out or failed unexpectedly: the attempt must
+                # still be recorded, or a half-open circuit stays stuck.
+                breaker.record(False)
+                hooks.report(event.finish(e))
+                raise
+
+            if error is None:
+                breaker.record(True)
+                hooks.report(event.finish(data=response))
+                break
+            can_retry = retry.policy.is_retryable(response, status)
+            breaker.record(not can_retry)
+            hooks.report(event.finish(error, response))
+            if not (can_retry and retry.retry()):
+                break
+            hooks.fire('on_retry', event)
 
         return self.__process_response(response, params=kwargs)
 
+    def _client(self):
+        """Return the session to make requests with, or None for `urllib2`."""
+        if self._urllib2 is not None:
+            return None
+        if self.transport is not None:
+            return self.transport
+        from facegraph import graph
+        return graph.session
+
+    def _get(self, client, url, event):
+        """
+        GET `url` with `client`, or `urllib2` if it is None; return the
+        status, the body, and the HTTP error if the status is one.
+        """
+        if client is None:
+            try:
+                opened = self.urllib2.urlopen(url, timeout=self.timeout)
+            except self.urllib2.HTTPError, e:
+                response = e.read()
+                event.received(e, response)
+                return e.code, response, e
+            event.headers_received()
+            response = opened.read()
+            event.received(opened, response)
+            return opened.getcode(), response, None
+
+        from facegraph.transport import requests
+        opened = client.get(url, timeout=self.timeout)
+        event.received(opened)
+        try:
+            opened.raise_for_status()
+        except requests.HTTPError, e:
+            return opened.status_code, opened.content, e
+        return opened.status_code, opened.content, None
+
 
     def __call__(self, _retries=None, *args, **kwargs):
         """
@@ -125,14 +193,14 @@ class Api:
             # Custom overrides
             if method == "photos.upload":
                 return self.__photo_upload(**kwargs)
-            url = "https://api.facebook.com/method/%s?" % method
+            url = "%s%s?" % (self.REST_ROOT, method)
             return self._execute(fb_url=url, _retries=_retries, **kwargs)
 
     def __process_response(self, response, params=None):
         e = None
 
         try:
-            data = simplejson.loads(response)
+            data = codec.loads(response)
         except JSONDecodeError:
             data = response
         except ValueError:
@@ -172,10 +240,6 @@ class Api:
     def __photo_upload(self, _retries=None, **kwargs):
         _retries = _retries or self.retries
 
-        body = []
-        crlf = '\r\n'
-        boundary = "conversocialBoundary"
-
         # UTF8
         utf8_kwargs = {}
         for (k,v) in kwargs.iteritems():
@@ -186,50 +250,34 @@ class Api:
 
         # Add args
         utf8_kwargs.update({'access_token': self.access_token})
-        for (k,v) in utf8_kwargs.iteritems():
-            if k=='photo': continue
-            body.append("--"+boundary)
-            body.append('Content-Disposition: form-data; name="%s"' % k)
-            body.append('')
-            body.append(str(v))
-
-        # Add raw image data
-        photo = utf8_kwargs.get('photo')
-        photo.open()
-        data = photo.read()
-        photo.close()
-
-        body.append("--"+boundary)
-        body.append('Content-Disposition: form-data; filename="myfilewhichisgood.png"')
-        body.append('Content-Type: image/png')
-        body.append('')
-        body.append(data)
-
-        body.append("--"+boundary+"--")
-        body.append('')
+        fields = [(k, str(v)) for (k, v) in utf8_kwargs.iteritems() if k != 'photo']
 
-        body = crlf.join(body)
+        # Add raw image data, read as it is sent
+        photo = kwargs.get('photo')
+        photo.open()
+        body = MultipartEncoder(fields, [(None, FilePart(
+            photo, filename='myfilewhichisgood.png', content_type='image/png'))])
 
-        # Post to server
-        r = self.httplib.HTTPSConnection('api.facebook.com', timeout=self.timeout)
-        headers = {'Content-Type': 'multipart/form-data; boundary=%s' % boundary,
-                   'Content-Length': str(len(body)),
+        # Post to server, over pooled connections
+        from facegraph import graph
+        client = graph.session if self.transport is None else self.transport
+        headers = {'Content-Type': body.content_type,
                    'MIME-Version': '1.0'}
 
-        r.request('POST', '/method/photos.upload', body, headers)
-
-        attempt = 0
-        while True:
-            try:
-                response = r.getresponse().read()
-                return self.__process_response(response, params=kwargs)
-            except (self.httplib.BadStatusLine, IOError):
-                if attempt < _retries:
-                    attempt += 1
-                else:
-                    raise
-            finally:
-                r.close()
+        retry = RetryPolicy.resolve(self.retry_policy, _retries).start()
+        try:
+            while True:
+                try:
+                    body.rewind()
+                    response = client.post(
+                        self.REST_ROOT + 'photos.upload',
+                        data=body, headers=headers, timeout=self.timeout).content
+                    return self.__process_response(response, params=kwargs)
+                except IOError:
+                    if not retry.retry():
+                        raise
+        finally:
+            photo.close()
 
     def check_cookie(self, request, app_id):
         """"
@@ -260,10 +308,10 @@ class Api:
             response = self.urllib2.urlopen(url, timeout=self.timeout)
         except self.urllib2.HTTPError, e:
             response = e.fp
-        return simplejson.load(response)
+        return codec.loads(response.read())
 
     def verify_token(self, tries=1):
-        url = "https://graph.facebook.com/me?access_token=%s" % self.access_token
+        url = "%sme?access_token=%s" % (self.GRAPH_ROOT, self.access_token)
         if self.app_secret:
             url += '&appsecret_proof=%s' % get_appsecret_proof(
                 self.app_secret, self.access_token)
@@ -275,7 +323,7 @@ class Api:
                 return True
 
     def exists(self, object_id):
-        url = "https://graph.facebook.com/%s?access_token=%s" % (object_id, self.access_token)
+        url = "%s%s?access_token=%s" % (self.GRAPH_ROOT, object_id, self.access_token)
         if self.app_secret:
             url += '&appsecret_proof=%s' % get_appsecret_proof(
                 self.app_secret, self.access_token)
@@ -311,6 +359,26 @@ class ApiException(Exception):
         return str
 
 
+# Proofs are requested for every API call, but only depend on the
+# (app_secret, token) pair, so keep the most recent ones around.
+APPSECRET_PROOF_CACHE_SIZE = 4096
+_appsecret_proofs = {}
+
 def get_appsecret_proof(app_secret, token):
-    hmac_instance = hmac.new(app_secret, token, digestmod=hashlib.sha256)
-    return hmac_instance.hexdigest()
+    key = (app_secret, token)
+    proof = _appsecret_proofs.get(key)
+    if proof is None:
+        proof = _compute_appsecret_proof(app_secret, token)
+        if len(_appsecret_proofs) >= APPSECRET_PROOF_CACHE_SIZE:
+            _appsecret_proofs.clear()
+        _appsecret_proofs[key] = proof
+    return proof
+
+def _compute_appsecret_proof(app_secret, token):
+    return hmac_hexdigest(app_secret, token)
+
+def hmac_hexdigest(key, message, digestmod=hashlib.sha256):
+    """Sign `message` with the app secret `key`, as Facebook does."""
+    if isinstance(key, unicode):
+        key = key.encode('utf-8')
+    return hmac.new(key, message, digestmod=digestmod).hexdigest()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import eventlet
+
+from facegraph.fql import FQL
+from facegraph.graph import Graph
+
+__all__ = ['AsyncGraph', 'AsyncFQL']
+
+DEFAULT_POOL_SIZE = 1000
+
+
+class AsyncGraph(object):
+
+    """
+    A `Graph` whose requests run concurrently, in greenthreads.
+
+    Nodes are addressed exactly as with `Graph`, but `call_fb()`, `post()`,
+    `post_file()` and `delete()` return immediately with a
+    `eventlet.greenthread.GreenThread`; `wait()` on it for the result:
+
+        >>> g = AsyncGraph(access_token, pool_size=500)
+        >>> pending = [g[page_id].call_fb() for page_id in page_ids]
+        >>> pages = [p.wait() for p in pending]
+
+    Requests go through the wrapped `Graph`, so URL building, error mapping
+    (`process_response()` and `GraphException`, raised from `wait()`) and
+    retries are the same. At most `pool_size` requests are in flight at once
+    across every node derived from the same `AsyncGraph`; further calls block
+    until a greenthread is free. Pass `pool` to share an existing
+    `eventlet.GreenPool` instead.
+    """
+
+    __slots__ = ('graph', 'pool')
+
+    def __init__(self, access_token=None, app_secret=None, pool=None,
+                 pool_size=DEFAULT_POOL_SIZE, graph=None, **kwargs):
+        if graph is None:
+            graph = Graph(access_token, app_secret, **kwargs)
+        if pool is None:
+            pool = eventlet.GreenPool(pool_size)
+        self.graph = graph
+        self.pool = pool
+
+    def __repr__(self):
+        return '<AsyncGraph(%r) at 0x%x>' % (self.graph.url, id(self))
+
+    @property
+    def url(self):
+        return self.graph.url
+
+    def __getitem__(self, item):
+        return type(self)(graph=self.graph[item], pool=self.pool)
+
+    def __getattr__(self, attr):
+        if attr.startswith('__') and attr.endswith('__'):
+            raise AttributeError(attr)
+        return self[attr]
+
+    def with_url_params(self, param, val):
+        return type(self)(graph=self.graph.with_url_params(param, val),
+                          pool=self.pool)
+
+    def fields(self, *fields):
+        return type(self)(graph=self.graph.fields(*fields), pool=self.pool)
+
+    def ids(self, *ids):
+        return type(self)(graph=self.graph.ids(*ids), pool=self.pool)
+
+    def call_fb(self, **params):
+        """Start reading the current URL; return a `GreenThread`."""
+        return self.pool.spawn(self.graph.call_fb, **params)
+
+    def post(self, **params):
+        """Start a POST to the current URL; return a `GreenThread`."""
+        return self.pool.spawn(self.graph.post, **params)
+
+    def post_file(self, file, **params):
+        return self.pool.spawn(self.graph.post_file, file, **params)
+
+    def delete(self):
+        return self.pool.spawn(self.graph.delete)
+
+    def waitall(self):
+        """Wait for every request started from this pool to finish."""
+        self.pool.waitall()
+
+
+class AsyncFQL(object):
+
+    """
+    An `FQL` whose queries run concurrently, in greenthreads.
+
+        >>> q = AsyncFQL('access_token')
+        >>> pending = [q(query) for query in queries]
+        >>> results = [p.wait() for p in pending]
+
+    Like `AsyncGraph`, at most `pool_size` queries are in flight at once.
+    """
+
+    def __init__(self, access_token=None, err_handler=None, pool=None,
+                 pool_size=DEFAULT_POOL_SIZE, fql=None, transport=None,
+                 hooks=None):
+        if fql is None:
+            fql = FQL(access_token, err_handler=err_handler,
+                      transport=transport, hooks=hooks)
+        if pool is None:
+            pool = eventlet.GreenPool(pool_size)
+        self.fql = fql
+        self.pool = pool
+
+    def __call__(self, query, **params):
+        return self.pool.spawn(self.fql, query, **params)
+
+    def multi(self, queries, **params):
+        return self.pool.spawn(self.fql.multi, queries, **params)
+
+    def waitall(self):
+        self.pool.waitall()
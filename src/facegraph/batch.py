@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+import urllib
+import urlparse
+
+from simplejson.decoder import JSONDecodeError
+
+from facegraph import codec
+from facegraph.api import get_appsecret_proof
+from facegraph.graph import GraphException
+from facegraph.url_operations import _make_query_tuples
+
+__all__ = ['GraphBatch', 'BatchedRequest', 'BATCH_SIZE']
+
+# Facebook refuses batches with more than 50 operations in them.
+BATCH_SIZE = 50
+
+
+class BatchedRequest(object):
+
+    """
+    A single operation queued on a `GraphBatch`.
+
+    The result is only available once the batch has been executed:
+
+        >>> me.result()
+        Node({'id': '...'})
+
+    If Facebook returned an error for this operation, `result()` raises the
+    corresponding `GraphException` (or returns whatever the node's
+    `err_handler` returned).
+    """
+
+    def __init__(self, graph, method, params, name):
+        self.graph = graph
+        self.method = method
+        self.params = params
+        self.name = name
+        self.done = False
+        self._value = None
+        self._exception = None
+
+    def __repr__(self):
+        return '<BatchedRequest(%s %r) at 0x%x>' % (
+            self.method, self.graph.url, id(self))
+
+    def result(self):
+        if not self.done:
+            raise RuntimeError('%r has not been executed yet' % self)
+        if self._exception is not None:
+            raise self._exception
+        return self._value
+
+    def relative_url(self):
+        if self.method == 'GET':
+            url = self.graph._url_with(self.params)
+        else:
+            url = self.graph.url
+        scheme, host, path, query, fragment = urlparse.urlsplit(url)
+        if query:
+            return '%s?%s' % (path.lstrip('/'), query)
+        return path.lstrip('/')
+
+    def as_batch_item(self):
+        item = {'method': self.method, 'relative_url': self.relative_url()}
+        if self.method != 'GET' and self.params:
+            item['body'] = urllib.urlencode(_make_query_tuples(self.params))
+        return item
+
+    def set_response(self, item):
+        if item is None:
+            # Facebook uses `null` for operations which timed out.
+            self._set_exception(GraphException(
+                None, 'Batched request did not complete', graph=self.graph,
+                params=self.params, method=self.name))
+            return
+
+        body = item.get('body')
+        try:
+            data = codec.loads(body) if body else body
+        except JSONDecodeError:
+            data = body
+        try:
+            self._set_value(self.graph.process_response(
+                data, self.params, self.name))
+        except Exception, e:
+            self._set_exception(e)
+
+    def _set_value(self, value):
+        self._value = value
+        self.done = True
+
+    def _set_exception(self, exception):
+        self._exception = exception
+        self.done = True
+
+
+class GraphBatch(object):
+
+    """
+    Collects Graph API operations and sends them as batch requests.
+
+    Operations are queued with `call_fb()`, `post()` and `delete()`, which
+    mirror the methods of the same name on `Graph` but take the node to
+    operate on as their first argument. Nothing is sent until `execute()` is
+    called (or the `with` block exits), at which point the queue is sent in
+    chunks of at most `batch_size` operations per HTTP request:
+
+        >>> with g.batch() as batch:
+        ...     me = batch.call_fb(g.me, fields='id,name')
+        ...     feed = batch.call_fb(g.me.feed, limit=10)
+        ...     batch.post(g[post_id].comments, message='A comment.')
+        >>> me.result()
+        Node({'id': '...', 'name': '...'})
+
+    Each operation's response is passed through its node's
+    `process_response()`, so errors are raised per operation rather than for
+    the batch as a whole.
+    """
+
+    def __init__(self, graph, batch_size=BATCH_SIZE):
+        if not 0 < batch_size <= BATCH_SIZE:
+            raise ValueError('batch_size must be between 1 and %d' % BATCH_SIZE)
+        self.graph = graph
+        self.batch_size = batch_size
+        self.pending = []
+
+    def __repr__(self):
+        return '<GraphBatch(%d pending) at 0x%x>' % (len(self.pending), id(self))
+
+    def __len__(self):
+        return len(self.pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+
+    def call_fb(self, graph, **params):
+        """Queue a read of `graph`'s URL."""
+        return self._add(graph, 'GET', params, None)
+
+    def post(self, graph, **params):
+        """Queue a POST to `graph`'s URL."""
+        return self._add(graph, 'POST', params, 'post')
+
+    def delete(self, graph):
+        """Queue the deletion of the resource at `graph`'s URL."""
+        return self._add(graph, 'DELETE', {}, 'delete')
+
+    def _add(self, graph, method, params, name):
+        # The batch itself is authenticated with our token, so only nodes
+        # using a different one need to carry their own credentials.
+        if graph.access_token and graph.access_token != self.graph.access_token:
+            params['access_token'] = graph.access_token
+            if graph.app_secret:
+                params['appsecret_proof'] = get_appsecret_proof(
+                    graph.app_secret, graph.access_token)
+        request = BatchedRequest(graph, method, params, name)
+        self.pending.append(request)
+        return request
+
+    def execute(self):
+        """Send every queued operation; return the executed requests."""
+        pending, self.pending = self.pending, []
+        for start in xrange(0, len(pending), self.batch_size):
+            self._send(pending[start:start + self.batch_size])
+        return pending
+
+    def _send(self, requests):
+        graph = self.graph
+        params = {'batch': codec.dumps([r.as_batch_item() for r in requests])}
+        if graph.access_token:
+            params['access_token'] = graph.access_token
+            if graph.app_secret:
+                params['appsecret_proof'] = get_appsecret_proof(
+                    graph.app_secret, graph.access_token)
+
+        try:
+            data = graph._fetch(graph._base + '/', data=urllib.urlencode(params))
+            data = graph.process_response(data, params, 'batch')
+        except Exception, e:
+            for request in requests:
+                request._set_exception(e)
+            return
+
+        if not isinstance(data, list):
+            # The error handler swallowed a batch-level error.
+            for request in requests:
+                request._set_value(data)
+            return
+
+        for request, item in zip(requests, data):
+            request.set_response(item)
+        for request in requests[len(data):]:
+            request.set_response(None)
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+import re
+import threading
+import time
+import urllib
+import urlparse
+from collections import OrderedDict
+
+__all__ = ['CacheBackend', 'LocalCacheBackend', 'ResponseCache', 'ETagCache']
+
+DEFAULT_TTL = 60
+DEFAULT_MAXSIZE = 1024
+
+
+class CacheBackend(object):
+
+    """
+    Storage interface used by `ResponseCache`.
+
+    Values are decoded JSON (dicts, lists and scalars), so a shared backend
+    (memcached, redis, ...) only needs to serialize them to JSON. `get()`
+    returns `None` for missing or expired keys.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class LocalCacheBackend(CacheBackend):
+
+    """An in-process backend: a bounded LRU mapping with per-key expiry."""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, clock=time.time):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= self.clock():
+                return None
+            # Re-insert to mark the key as most recently used.
+            self._data[key] = entry
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (self.clock() + ttl, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class ResponseCache(object):
+
+    """
+    A cache of decoded Graph API responses, keyed by request URL.
+
+    Pass one to `Graph` to have `call_fb()` serve repeated reads from it:
+
+        >>> cache = ResponseCache(ttl=60, ttl_rules=[(r'/feed$', 10)])
+        >>> g = Graph(access_token, cache=cache)
+        >>> g.me.call_fb()  # Fetched from Facebook
+        >>> g.me.call_fb()  # Served from the cache
+        >>> cache.stats()
+        {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+    Keys are the normalized URL: host, path and sorted query parameters. With
+    `token_agnostic=True` the `access_token` and `appsecret_proof` parameters
+    are left out of the key, so every token shares the cached responses; only
+    use this for data which looks the same to all of them.
+
+    `ttl_rules` is a sequence of `(pattern, ttl)` pairs; the first pattern
+    found in the URL path decides the TTL, `ttl` is used otherwise. A TTL of
+    0 disables caching for matching paths. Error responses are never cached.
+    """
+
+    TOKEN_PARAMS = frozenset(['access_token', 'appsecret_proof'])
+
+    def __init__(self, backend=None, ttl=DEFAULT_TTL, ttl_rules=(),
+                 token_agnostic=False, maxsize=DEFAULT_MAXSIZE):
+        if backend is None:
+            backend = LocalCacheBackend(maxsize=maxsize)
+        self.backend = backend
+        self.ttl = ttl
+        self.ttl_rules = [(re.compile(pattern), rule_ttl)
+                          for (pattern, rule_ttl) in ttl_rules]
+        self.token_agnostic = token_agnostic
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return '<ResponseCache(hits=%d, misses=%d) at 0x%x>' % (
+            self.hits, self.misses, id(self))
+
+    def key(self, url):
+        scheme, host, path, query, fragment = urlparse.urlsplit(url)
+        params = urlparse.parse_qsl(query, keep_blank_values=True)
+        if self.token_agnostic:
+            params = [(k, v) for (k, v) in params
+                      if k not in self.TOKEN_PARAMS]
+        return '%s%s?%s' % (host.lower(), path, urllib.urlencode(sorted(params)))
+
+    def ttl_for(self, url):
+        path = urlparse.urlsplit(url)[2]
+        for pattern, ttl in self.ttl_rules:
+            if pattern.search(path):
+                return ttl
+        return self.ttl
+
+    def get(self, url):
+        """Return the cached response for `url`, or `None`."""
+        if not self.ttl_for(url):
+            return None
+        data = self.backend.get(self.key(url))
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+
+    def set(self, url, data):
+        ttl = self.ttl_for(url)
+        if not ttl or data is None:
+            return
+        if isinstance(data, dict) and data.get('error'):
+            return
+        self.backend.set(self.key(url), data, ttl)
+
+    def invalidate(self, url):
+        self.backend.delete(self.key(url))
+
+    def clear(self):
+        self.backend.clear()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / lookups if lookups else 0.0}
+
+
+class ETagCache(object):
+
+    """
+    Remembers the `ETag` and decoded body of recent Graph API reads.
+
+    With one of these passed to `Graph`, `call_fb()` sends `If-None-Match`
+    for URLs it has seen before; a `304 Not Modified` answer is counted as a
+    hit and served from the stored body without downloading or decoding it
+    again:
+
+        >>> etags = ETagCache(maxsize=10000)
+        >>> g = Graph(access_token, etags=etags)
+        >>> g.mypage.feed.call_fb()  # 200, body stored with its ETag
+        >>> g.mypage.feed.call_fb()  # 304, served from the stored body
+
+    At most `maxsize` URLs are remembered; the least recently used are
+    forgotten first.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<ETagCache(hits=%d, misses=%d) at 0x%x>' % (
+            self.hits, self.misses, id(self))
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, url):
+        """Return the `(etag, data)` pair stored for `url`, or `None`."""
+        with self._lock:
+            entry = self._data.pop(url, None)
+            if entry is not None:
+                self._data[url] = entry
+            return entry
+
+    def set(self, url, etag, data):
+        if not etag or (isinstance(data, dict) and data.get('error')):
+            return
+        with self._lock:
+            self._data.pop(url, None)
+            self._data[url] = (etag, data)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / lookups if lookups else 0.0}
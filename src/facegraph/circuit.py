@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from facegraph.url_operations import get_host, get_path, path_template
+
+__all__ = ['CircuitBreaker', 'CircuitBreakerRegistry', 'CircuitOpenError',
+           'default_registry', 'CLOSED', 'OPEN', 'HALF_OPEN']
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(Exception):
+
+    """Raised instead of making a request to an endpoint that is failing."""
+
+    def __init__(self, key, retry_after):
+        Exception.__init__(self)
+        self.key = key
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return 'Circuit open for %s%s, retry after %.1fs' % (
+            self.key + (self.retry_after,))
+
+
+class CircuitBreaker(object):
+
+    """
+    Tracks the health of one endpoint, and fails requests to it fast while it
+    is unhealthy.
+
+    The circuit starts `CLOSED`. After `failure_threshold` consecutive
+    failures it opens, and requests are rejected with `CircuitOpenError`
+    without being made. Once `reset_timeout` seconds have passed it becomes
+    `HALF_OPEN`, and lets up to `half_open_max` trial requests through: the
+    first success closes it again, a failure opens it for another
+    `reset_timeout`. Trials which have not reported back after
+    `reset_timeout` are given up on, and new ones let through.
+    """
+
+    def __init__(self, key, failure_threshold=5, reset_timeout=30,
+                 half_open_max=1, clock=time.time):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trials = 0
+        self.trial_at = None
+        self.successes = 0
+        self.failures_total = 0
+        self.rejected = 0
+        self.opened = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<CircuitBreaker(%s%s, %s) at 0x%x>' % (
+            self.key + (self.state, id(self)))
+
+    def before(self):
+        """Call before a request; raise `CircuitOpenError` to refuse it."""
+        with self._lock:
+            if self.state == OPEN:
+                retry_after = self.opened_at + self.reset_timeout - self.clock()
+                if retry_after > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.key, retry_after)
+                self.state = HALF_OPEN
+                self.trials = 0
+            if self.state == HALF_OPEN:
+                now = self.clock()
+                if (self.trials >= self.half_open_max and
+                        now - self.trial_at < self.reset_timeout):
+                    self.rejected += 1
+                    raise CircuitOpenError(self.key, 0)
+                if self.trials >= self.half_open_max:
+                    # The trials never reported back.
+                    self.trials = 0
+                self.trials += 1
+                self.trial_at = now
+
+    def success(self):
+        with self._lock:
+            self.successes += 1
+            self.failures = 0
+            if self.state != CLOSED:
+                self.state = CLOSED
+                self.opened_at = None
+
+    def failure(self):
+        with self._lock:
+            self.failures_total += 1
+            self.failures += 1
+            if self.state == HALF_OPEN or (
+                    self.state == CLOSED and
+                    self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = self.clock()
+                self.opened += 1
+
+    def record(self, ok):
+        if ok:
+            self.success()
+        else:
+            self.failure()
+
+    def stats(self):
+        return {'state': self.state,
+                'successes': self.successes,
+                'failures': self.failures_total,
+                'rejected': self.rejected,
+                'opened': self.opened}
+
+
+class _NoBreaker(object):
+
+    """Stands in for a `CircuitBreaker` when none is configured."""
+
+    def before(self):
+        pass
+
+    def record(self, ok):
+        pass
+
+
+class CircuitBreakerRegistry(object):
+
+    """
+    The circuit breakers for every endpoint a process talks to.
+
+    Endpoints are keyed by host and path template, so that `/123/feed` and
+    `/456/feed` share a breaker (`/{id}/feed`) but `/123/comments` does not.
+    Pass the same registry to every `Graph` and `Api`, e.g. the module's
+    `default_registry`:
+
+        >>> g = Graph(access_token, circuit_breakers=default_registry)
+        >>> api = Api(access_token, circuit_breakers=default_registry)
+
+    Extra keyword arguments are passed on to each `CircuitBreaker`.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+        self.breakers = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<CircuitBreakerRegistry(%d breakers) at 0x%x>' % (
+            len(self.breakers), id(self))
+
+    @staticmethod
+    def key(url):
+        return get_host(url), path_template(get_path(url))
+
+    def get(self, url):
+        """Return the breaker for `url`, creating it if need be."""
+        key = self.key(url)
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self.breakers.get(key)
+                if breaker is None:
+                    breaker = CircuitBreaker(key, **self.options)
+                    self.breakers[key] = breaker
+        return breaker
+
+    @staticmethod
+    def resolve(registry, url):
+        """Return the breaker for `url` in `registry`, which may be None."""
+        if registry is None:
+            return _no_breaker
+        return registry.get(url)
+
+    def stats(self):
+        """Return each breaker's state and counters, by (host, template)."""
+        return dict((key, breaker.stats())
+                    for key, breaker in self.breakers.items())
+
+
+_no_breaker = _NoBreaker()
+
+default_registry = CircuitBreakerRegistry()
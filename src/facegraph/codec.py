@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+The JSON library used to encode requests and decode responses.
+
+simplejson is used by default; switch library at runtime with `use()`:
+
+    >>> from facegraph import codec
+    >>> codec.available()
+    ['simplejson', 'json', 'ujson']
+    >>> codec.use('ujson')
+
+Whichever library is in use, decoding errors are raised as simplejson's
+`JSONDecodeError` (a `ValueError`), so error handling is unaffected.
+"""
+import importlib
+import threading
+from collections import OrderedDict
+
+import simplejson
+from simplejson.decoder import JSONDecodeError
+
+__all__ = ['Codec', 'available', 'current', 'dumps', 'get', 'loads', 'register',
+           'use', 'JSONDecodeError']
+
+
+class Codec(object):
+
+    """A JSON library's `loads()` and `dumps()`."""
+
+    def __init__(self, name, loads, dumps):
+        self.name = name
+        self._loads = loads
+        self._dumps = dumps
+
+    def __repr__(self):
+        return '<Codec(%r) at 0x%x>' % (self.name, id(self))
+
+    def loads(self, s):
+        try:
+            return self._loads(s)
+        except JSONDecodeError:
+            raise
+        except ValueError, e:
+            raise JSONDecodeError(str(e), s, 0)
+
+    def dumps(self, obj):
+        return self._dumps(obj)
+
+
+def _module_codec(module_name):
+    def load():
+        module = importlib.import_module(module_name)
+        return Codec(module_name, module.loads, module.dumps)
+    return load
+
+# Factories for each codec, in order of preference; a factory raises
+# ImportError if its library is not installed.
+_factories = OrderedDict((name, _module_codec(name))
+                         for name in ('simplejson', 'json', 'ujson'))
+_codecs = {}
+_lock = threading.Lock()
+_current = Codec('simplejson', simplejson.loads, simplejson.dumps)
+_codecs['simplejson'] = _current
+
+
+def register(name, loads, dumps):
+    """Make another JSON library available as `name`."""
+    with _lock:
+        _codecs[name] = Codec(name, loads, dumps)
+        _factories[name] = lambda: _codecs[name]
+
+
+def get(name):
+    """Return the codec called `name`; raise ImportError if unavailable."""
+    codec = _codecs.get(name)
+    if codec is None:
+        if name not in _factories:
+            raise ValueError('Unknown JSON codec %r' % name)
+        codec = _factories[name]()
+        with _lock:
+            codec = _codecs.setdefault(name, codec)
+    return codec
+
+
+def available():
+    """Return the names of the codecs which can be used here."""
+    names = []
+    for name in _factories:
+        try:
+            get(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def use(name):
+    """Use the codec called `name` from now on; return it."""
+    global _current
+    _current = get(name)
+    return _current
+
+
+def current():
+    return _current
+
+
+def loads(s):
+    return _current.loads(s)
+
+
+def dumps(obj):
+    return _current.dumps(obj)
@@ -1,18 +1,26 @@
 # -*- coding: utf-8 -*-
+import re
+import urllib
 
-import bunch
-import simplejson as json
+import eventlet
+import eventlet.queue
+
+import codec
 from graph import GraphException
+from instrument import Hooks, RequestEvent
+from node import wrap
+from transport import default_session
 from url_operations import add_path, update_query_params
 
-import eventlet
-requests = eventlet.import_patched('requests.__init__')
-requests_adapters = eventlet.import_patched('requests.adapters')
+# Shared with `Graph`: used by every `FQL` without a `transport` of its own.
+session = default_session
+
+# How many URL-encoded characters of queries `iter_multi()` sends at once,
+# keeping its URLs well below the lengths servers and proxies accept.
+MAX_QUERIES_LENGTH = 4000
 
-session = requests.Session()
-session.headers['Accept-encoding'] = 'gzip'
-session.mount('http://', requests_adapters.HTTPAdapter(pool_connections=500, pool_maxsize=500))
-session.mount('https://', requests_adapters.HTTPAdapter(pool_connections=500, pool_maxsize=500))
+# A multiquery's queries refer to each other's results as `#name`.
+QUERY_REFERENCE = re.compile(r'#(\w+)')
 
 class FQL(object):
     
@@ -27,10 +35,10 @@ class FQL(object):
         >>> q = FQL('access_token')
         >>> result = q("SELECT post_id FROM stream WHERE source_id = ...")
         >>> result
-        [Bunch(post_id='XXXYYYZZZ'), ...]
+        [Node({'post_id': 'XXXYYYZZZ'}), ...]
         
         >>> result[0]
-        Bunch(post_id='XXXYYYZZZ')
+        Node({'post_id': 'XXXYYYZZZ'})
         
         >>> result[0].post_id
         'XXXYYYZZZ'
@@ -54,9 +62,12 @@ class FQL(object):
     
     ENDPOINT = 'https://api.facebook.com/method/'
     
-    def __init__(self, access_token=None, err_handler=None):
+    def __init__(self, access_token=None, err_handler=None, transport=None,
+                 hooks=None):
         self.access_token = access_token
         self.err_handler = err_handler
+        self.transport = transport
+        self.hooks = hooks
     
     def __call__(self, query, **params):
         
@@ -68,10 +79,10 @@ class FQL(object):
             >>> q = FQL('access_token')
             >>> result = q("SELECT post_id FROM stream WHERE source_id = ...")
             >>> result
-            [Bunch(post_id='XXXYYYZZZ'), ...]
+            [Node({'post_id': 'XXXYYYZZZ'}), ...]
             
             >>> result[0]
-            Bunch(post_id='XXXYYYZZZ')
+            Node({'post_id': 'XXXYYYZZZ'})
             
             >>> result[0].post_id
             'XXXYYYZZZ'
@@ -83,7 +94,8 @@ class FQL(object):
                       format='json')
         url = update_query_params(url, params)
         
-        return self.fetch_json(url)
+        return self.fetch_json(url, transport=self.transport,
+                               hooks=self.hooks)
     
     def multi(self, queries, **params):
         
@@ -108,24 +120,144 @@ class FQL(object):
         """
         
         url = add_path(self.ENDPOINT, 'fql.multiquery')
-        params.update(queries=json.dumps(queries),
+        params.update(queries=codec.dumps(queries),
                       access_token=self.access_token, format='json')
         url = update_query_params(url, params)
         
-        return self.fetch_json(url)
+        return self.fetch_json(url, transport=self.transport,
+                               hooks=self.hooks)
+    
+    def iter_multi(self, queries, group_size=10, max_length=MAX_QUERIES_LENGTH,
+                   concurrency=10, **params):
+        
+        """
+        Execute many FQL queries in concurrent `fql.multiquery` requests;
+        yield `(name, fql_result_set)` pairs as each request completes.
+        
+        Example:
+        
+            >>> q = FQL('access_token')
+            >>> for name, rows in q.iter_multi(report_queries, concurrency=20):
+            ...     if isinstance(rows, Exception):
+            ...         log.warning('Query %s failed: %s', name, rows)
+        
+        `queries` (a dict, or `(name, query)` pairs) are split into groups of
+        at most `group_size` queries and about `max_length` URL-encoded
+        characters, keeping queries which refer to each other (`#name`)
+        together. Up to `concurrency` groups are requested at once, over the
+        transport's pooled connections, and the next group is only requested
+        once a result has been taken, so at most that many groups' results
+        are held in memory. If a group fails, its exception is yielded for
+        each of its queries.
+        
+        """
+        
+        groups = _group_queries(queries, group_size, max_length)
+        results = eventlet.queue.LightQueue()
+        
+        def run(group):
+            try:
+                results.put((group, self.multi(group, **params)))
+            except Exception, e:
+                results.put((group, e))
+        
+        in_flight = 0
+        while True:
+            while in_flight < concurrency:
+                group = next(groups, None)
+                if group is None:
+                    break
+                eventlet.spawn_n(run, group)
+                in_flight += 1
+            if not in_flight:
+                return
+            
+            group, data = results.get()
+            in_flight -= 1
+            if isinstance(data, Exception):
+                for name in group:
+                    yield name, data
+            else:
+                for result in data:
+                    yield result.name, result.fql_result_set
     
     @classmethod
-    def fetch_json(cls, url, data=None):
-        response = json.loads(cls.fetch(url, data=data))
+    def fetch_json(cls, url, data=None, transport=None, hooks=None):
+        response = codec.loads(cls.fetch(url, data=data, transport=transport,
+                                         hooks=hooks))
         if isinstance(response, dict):
             if response.get("error_msg"):
                 code = response.get("error_code")
                 msg = response.get("error_msg")
                 args = response.get("request_args")
                 raise GraphException(code, msg, args=args)
-        return bunch.bunchify(response)
+        return wrap(response)
     
     @staticmethod
-    def fetch(url, data=None):
-        response = session.get(url, data=data)
+    def fetch(url, data=None, transport=None, hooks=None):
+        client = session if transport is None else transport
+        hooks = Hooks.resolve(hooks)
+        event = RequestEvent('GET', url)
+        hooks.fire('before_request', event)
+        try:
+            response = client.get(url, data=data)
+        except Exception, e:
+            hooks.report(event.finish(e))
+            raise
+        event.received(response)
+        hooks.report(event.finish(data=response.content))
         return response.content
+
+
+def _group_queries(queries, group_size, max_length):
+    """
+    Split `queries` into dicts of at most `group_size` queries and about
+    `max_length` URL-encoded characters, without separating queries which
+    refer to one another; yield them in turn.
+    """
+    if isinstance(queries, dict):
+        queries = queries.items()
+    queries = [(unicode(name), query) for name, query in queries]
+
+    # Queries referring to each other, directly or not, go in one component.
+    parents = dict((name, name) for name, query in queries)
+
+    def root(name):
+        while parents[name] != name:
+            parents[name] = name = parents[parents[name]]
+        return name
+
+    for name, query in queries:
+        for other in QUERY_REFERENCE.findall(query):
+            if other in parents:
+                parents[root(other)] = root(name)
+
+    components = {}
+    order = []
+    for name, query in queries:
+        key = root(name)
+        if key not in components:
+            components[key] = []
+            order.append(key)
+        components[key].append((name, query))
+
+    group, length = {}, 0
+    for key in order:
+        component = components[key]
+        size = sum(_encoded_length(name) + _encoded_length(query) + 8
+                   for name, query in component)
+        if group and (len(group) + len(component) > group_size or
+                      length + size > max_length):
+            yield group
+            group, length = {}, 0
+        group.update(component)
+        length += size
+    if group:
+        yield group
+
+
+def _encoded_length(value):
+    value = codec.dumps(value)
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return len(urllib.quote_plus(value))
@@ -2,37 +2,60 @@
 import logging
 import re
 import urllib
-import urllib2 as default_urllib2
-import httplib as default_httplib
+import itertools
 import traceback
+import urlparse
+
+from facegraph import codec
+from facegraph.api import ApiException, get_appsecret_proof
+from facegraph.multipart import FilePart, MultipartEncoder
+from facegraph.circuit import CircuitBreakerRegistry
+from facegraph.instrument import Hooks, RequestEvent
+from facegraph.node import wrap
+from facegraph.records import expand_fields, record_class
+from facegraph.retry import RetryPolicy
+from facegraph.streaming import CHUNK_SIZE, JSONStream
+from facegraph.url_operations import join_path, merge_query_params
 
-from facegraph.api import (ApiException, get_appsecret_proof,
-        RECOVERABLE_FACEBOOK_ERRORS)
-from facegraph.url_operations import (add_path, get_host,
-        add_query_params, update_query_params, get_path)
-
-import bunch
-import simplejson as json
 from simplejson.decoder import JSONDecodeError
 from functools import partial
 
 import eventlet
-requests = eventlet.import_patched('requests.__init__')
-requests_adapters = eventlet.import_patched('requests.adapters')
+import eventlet.queue
+from facegraph.transport import default_session, requests
 
-session = requests.Session()
-session.headers['Accept-encoding'] = 'gzip'
-session.mount('http://', requests_adapters.HTTPAdapter(pool_connections=500, pool_maxsize=500))
-session.mount('https://', requests_adapters.HTTPAdapter(pool_connections=500, pool_maxsize=500))
+# Used by every `Graph` without a `transport` of its own.
+session = default_session
 
 p = "^\(#(\d+)\)"
 code_re = re.compile(p)
 
 __all__ = ['Graph']
 
+# Facebook's error code for bad parameters, including unknown `?ids=`.
+INVALID_PARAMETER = 100
+
+# Returned by `Graph.fetch` for `304 Not Modified` responses.
+NOT_MODIFIED = object()
+
 log = logging.getLogger('pyfacegraph')
 
 
+def _setting(name):
+    """A `Graph` attribute kept in the settings shared with derived nodes."""
+
+    def fget(self):
+        return self._settings[name]
+
+    def fset(self, value):
+        # Copy on write, so nodes derived earlier are left unchanged.
+        settings = dict(self._settings)
+        settings[name] = value
+        self._settings = settings
+
+    return property(fget, fset, doc=name)
+
+
 class Graph(object):
 
     """
@@ -142,55 +165,134 @@ class Graph(object):
     API_ROOT = 'https://graph.facebook.com/'
     DEFAULT_TIMEOUT = 0 # No timeout as default
 
-    def __init__(self, access_token=None, app_secret=None, err_handler=None, timeout=DEFAULT_TIMEOUT, retries=5, urllib2=None, httplib=None, **state):
-        self.access_token = access_token
-        self.app_secret = app_secret
-        self.err_handler = err_handler
-        self.url = self.API_ROOT
-        self.timeout = timeout
-        self.retries = retries
-        self.__dict__.update(state)
-        if urllib2 is None:
-            import urllib2
-        self.urllib2 = urllib2
-        if httplib is None:
-            import httplib
-        self.httplib = httplib
+    # The URL is kept in pieces, and only joined up when it is needed; this
+    # keeps `g.a.b.c` chains from parsing and rebuilding a string each step.
+    # Settings live in a dict shared by every node derived from this one.
+    __slots__ = ('_settings', '_base', '_path', '_params', '_fragment', '_url')
+
+    access_token = _setting('access_token')
+    app_secret = _setting('app_secret')
+    err_handler = _setting('err_handler')
+    timeout = _setting('timeout')
+    retries = _setting('retries')
+    cache = _setting('cache')
+    etags = _setting('etags')
+    rate_limiter = _setting('rate_limiter')
+    retry_policy = _setting('retry_policy')
+    circuit_breakers = _setting('circuit_breakers')
+    record = _setting('record')
+    transport = _setting('transport')
+    single_flight = _setting('single_flight')
+    hooks = _setting('hooks')
+    scheduler = _setting('scheduler')
+
+    def __init__(self, access_token=None, app_secret=None, err_handler=None, timeout=DEFAULT_TIMEOUT, retries=5, urllib2=None, httplib=None, cache=None, etags=None, rate_limiter=None, retry_policy=None, circuit_breakers=None, transport=None, single_flight=None, hooks=None, scheduler=None, **state):
+        # `urllib2` and `httplib` are no longer used: see `transport`.
+        self._settings = {
+            'access_token': access_token,
+            'app_secret': app_secret,
+            'err_handler': err_handler,
+            'timeout': timeout,
+            'retries': retries,
+            'cache': cache,
+            'etags': etags,
+            'rate_limiter': rate_limiter,
+            'retry_policy': retry_policy,
+            'circuit_breakers': circuit_breakers,
+            'record': None,
+            'transport': transport,
+            'single_flight': single_flight,
+            'hooks': hooks,
+            'scheduler': scheduler,
+        }
+        self.url = state.pop('url', self.API_ROOT)
+        for name, value in state.iteritems():
+            try:
+                setattr(self, name, value)
+            except AttributeError:
+                raise TypeError('%s() got an unexpected keyword argument %r' %
+                                (type(self).__name__, name))
 
     def __repr__(self):
         return '<Graph(%r) at 0x%x>' % (self.url, id(self))
 
+    def _get_url(self):
+        if self._url is None:
+            self._url = self._url_with(())
+        return self._url
+
+    def _set_url(self, url):
+        scheme, host, path, query, fragment = urlparse.urlsplit(url)
+        self._base = '%s://%s' % (scheme, host) if scheme else host
+        self._path = path
+        self._params = tuple(urlparse.parse_qsl(query))
+        self._fragment = fragment
+        self._url = url
+
+    url = property(_get_url, _set_url)
+
+    def _url_with(self, params):
+        """Serialize this node's URL, updated with the given query params."""
+        query_bits = self._params
+        if params:
+            query_bits = merge_query_params(query_bits, params)
+        url = self._base + self._path
+        if query_bits:
+            url += '?' + urllib.urlencode(query_bits)
+        if self._fragment:
+            url += '#' + self._fragment
+        return url
+
+    def _derive(self, path=None, params=None):
+        """Return a copy of this node, with a new path and/or query params."""
+        cls = type(self)
+        node = object.__new__(cls)
+        node._settings = self._settings
+        if cls.__dictoffset__:
+            # Subclasses without `__slots__` may keep state of their own.
+            node.__dict__.update(self.__dict__)
+        node._base = self._base
+        node._path = self._path if path is None else path
+        node._params = self._params if params is None else params
+        node._fragment = self._fragment
+        node._url = None
+        return node
+
     def copy(self, **update):
         """Copy this Graph, optionally overriding some attributes."""
-        return type(self)(access_token=self.access_token,
-                          app_secret=self.app_secret,
-                          err_handler=self.err_handler,
-                          timeout=self.timeout,
-                          retries=self.retries,
-                          urllib2=self.urllib2,
-                          httplib=self.httplib,
-                          **update)
+        node = self._derive()
+        if 'url' in update:
+            node.url = update.pop('url')
+        else:
+            node._url = self._url
+        for name, value in update.iteritems():
+            setattr(node, name, value)
+        return node
 
     def __getitem__(self, item):
         if isinstance(item, slice):
             log.debug('Deprecated magic slice!')
             log.debug( traceback.format_stack())
             return self._range(item.start, item.stop)
-        return self.copy(url=add_path(self.url, unicode(item)))
+        return self._derive(path=join_path(self._path, unicode(item)))
 
     def __getattr__(self, attr):
+        if attr.startswith('__') and attr.endswith('__'):
+            raise AttributeError(attr)
         return self[attr]
 
     def _range(self, start, stop):
         params = {'offset': start,
                   'limit': stop - start}
-        return self.copy(url=add_query_params(self.url, params))
+        return self._derive(
+            params=merge_query_params(self._params, params, update=False))
 
     def with_url_params(self, param, val):
         """
             this used to overload the bitwise OR op
         """
-        return self.copy(url=update_query_params(self.url, (param, val)))
+        return self._derive(
+            params=merge_query_params(self._params, (param, val)))
 
     def __call__(self, **params):
         log.debug('Deprecated magic call!')
@@ -200,30 +302,301 @@ class Graph(object):
     def call_fb(self, **params):
         """Read the current URL, and JSON-decode the results."""
 
+        url = self._signed_url(params)
+        data = self.cache.get(url) if self.cache is not None else None
+        if data is None:
+            if self.single_flight is not None:
+                data = self.single_flight.do(url, self._get, url)
+            else:
+                data = self._get(url)
+            if self.cache is not None:
+                self.cache.set(url, data)
+
+        return self.process_response(data, params)
+
+    def _signed_url(self, params):
+        """Add the access token and proof to `params`; return the URL."""
         if self.access_token:
             params['access_token'] = self.access_token
             if self.app_secret:
                 params['appsecret_proof'] = get_appsecret_proof(
                     self.app_secret, self.access_token)
-        url = update_query_params(self.url, params)
-        data = self.fetch(url, timeout=self.timeout,
-                               retries=self.retries,
-                               urllib2=self.urllib2,
-                               httplib=self.httplib)
+        return self._url_with(params)
+
+    def _stream(self, **params):
+        """Read the current URL; return a `JSONStream` over its `data`."""
+        url = self._signed_url(params)
+        return JSONStream(self.fetch_stream(url, timeout=self.timeout,
+                                            transport=self.transport))
+
+    def _get(self, url):
+        """Fetch `url`, revalidating it against `self.etags` if set."""
+        if self.etags is None:
+            return self._fetch(url)
+
+        entry = self.etags.get(url)
+        headers = {'If-None-Match': entry[0]} if entry else None
+        etag = []
+        data = self._fetch(url, headers=headers,
+                           on_response=lambda r: etag.append(r.headers.get('ETag')))
+        if data is NOT_MODIFIED and entry:
+            self.etags.hits += 1
+            return entry[1]
+        self.etags.misses += 1
+        self.etags.set(url, etag[-1] if etag else None, data)
+        return data
 
-        return self.process_response(data, params)
+    def _fetch(self, url, data=None, headers=None, on_response=None):
+        """Call `fetch()` with this node's settings and rate limiter."""
+        kwargs = {}
+        if headers:
+            kwargs['headers'] = headers
+        if self.retry_policy is not None:
+            kwargs['retry_policy'] = self.retry_policy
+        if self.circuit_breakers is not None:
+            kwargs['circuit_breakers'] = self.circuit_breakers
+        if self.transport is not None:
+            kwargs['transport'] = self.transport
+        if self.hooks is not None:
+            kwargs['hooks'] = self.hooks
+
+        limiter = self.rate_limiter
+        if limiter is not None:
+            token = self.access_token
+            limiter.wait(token)
+
+            def record_usage(response, on_response=on_response):
+                limiter.update(token, response.headers)
+                if on_response is not None:
+                    on_response(response)
+            on_response = record_usage
+        if on_response is not None:
+            kwargs['on_response'] = on_response
+
+        result = self._scheduled(self.fetch, url, data=data,
+                                 timeout=self.timeout,
+                                 retries=self.retries,
+                                 **kwargs)
+        if limiter is not None and isinstance(result, dict):
+            error = result.get('error')
+            if isinstance(error, dict):
+                limiter.throttled(token, error.get('code'))
+        return result
+
+    def _scheduled(self, func, *args, **kwargs):
+        """Call `func`, once `self.scheduler` (if any) gives us a turn."""
+        if self.scheduler is None:
+            return func(*args, **kwargs)
+        return self.scheduler.run(self.access_token, func, *args, **kwargs)
+
+    def batch(self, batch_size=50):
+        """
+        Return a `GraphBatch` for sending many operations in few requests.
+
+            >>> with g.batch() as batch:
+            ...     me = batch.call_fb(g.me)
+            ...     batch.post(g.me.feed, message="Test.")
+            >>> me.result()
+            Node({'id': '...'})
+
+        See `facegraph.batch.GraphBatch` for details.
+        """
+        from facegraph.batch import GraphBatch
+        return GraphBatch(self, batch_size=batch_size)
+
+    def iter_pages(self, max_pages=None, prefetch=False, **params):
+        """
+        Read this edge page by page, following Facebook's paging links.
+
+            >>> for page in g.me.feed.iter_pages(limit=100, max_pages=3):
+            ...     print len(page.data)
+
+        Cursor paging (`paging.cursors.after`) is preferred; `paging.next` is
+        followed for edges which only support offset or time based paging.
+        With `prefetch=True` the next page is fetched in a greenthread while
+        the caller is still processing the current one.
+        """
+        fetch = partial(self.call_fb, **params)
+        pending = None
+        pages = 0
+        try:
+            while fetch is not None:
+                if max_pages is not None and pages >= max_pages:
+                    return
+                if pending is not None:
+                    page, pending = pending.wait(), None
+                else:
+                    page = fetch()
+                pages += 1
+                fetch = self._next_page(page, params)
+                if prefetch and fetch is not None and (
+                        max_pages is None or pages < max_pages):
+                    pending = eventlet.spawn(fetch)
+                yield page
+        finally:
+            if pending is not None:
+                pending.kill()
+
+    def iter_items(self, max_items=None, max_pages=None, prefetch=False,
+                   stream=False, **params):
+        """
+        Yield the items of this edge one at a time, across all its pages.
+
+            >>> for post in g.me.feed.iter_items(max_items=500):
+            ...     print post.id
+
+        Only one page (two with `prefetch=True`) is held in memory at once.
+        With `stream=True` not even that: each response is decoded as it is
+        read, and items are yielded as soon as they have been parsed (see
+        `JSONStream`). Streamed responses bypass the cache and are not
+        retried, and can't be prefetched.
+        """
+        if max_items is not None and max_items <= 0:
+            return
+        if stream:
+            if prefetch:
+                raise ValueError('Streamed pages cannot be prefetched')
+            pages = self._iter_streamed(max_pages, params)
+        else:
+            pages = self.iter_pages(max_pages=max_pages, prefetch=prefetch,
+                                    **params)
+        count = 0
+        for page in pages:
+            if not isinstance(page, dict):
+                return
+            for item in page.get('data') or []:
+                yield item
+                count += 1
+                if max_items is not None and count >= max_items:
+                    return
+
+    def _iter_streamed(self, max_pages, params):
+        """Like `iter_pages()`, but each page's `data` is a generator."""
+        fetch = partial(self._stream, **params)
+        pages = 0
+        while fetch is not None:
+            if max_pages is not None and pages >= max_pages:
+                return
+            stream = fetch()
+            pages += 1
+            convert = wrap if self.record is None else self.record.from_dict
+            yield {'data': itertools.imap(convert, stream)}
+            page = self.process_response(stream.rest, params)
+            if not stream.count or not isinstance(page, dict):
+                return
+            # The items have gone; only the paging is left in `rest`.
+            fetch = self._next_page(dict(page, data=stream.count), params,
+                                    '_stream')
+
+    def _next_page(self, page, params, method='call_fb'):
+        """Return a callable fetching the page after `page`, if any."""
+        if not isinstance(page, dict) or not page.get('data'):
+            return None
+        paging = page.get('paging') or {}
+        if not paging.get('next'):
+            return None
+        after = (paging.get('cursors') or {}).get('after')
+        if after:
+            params = dict(params, after=after)
+            params.pop('before', None)
+            return partial(getattr(self, method), **params)
+        return getattr(self.copy(url=paging['next']), method)
 
     def __iter__(self):
         raise TypeError('%r object is not iterable' % self.__class__.__name__)
 
-    def fields(self, *fields):
-        """Shortcut for `?fields=x,y,z`."""
-        return self | ('fields', ','.join(fields))
+    def fields(self, *fields, **options):
+        """
+        Shortcut for `?fields=x,y,z`.
+
+        With `record=True`, results are decoded straight into compact
+        `Record`s holding only these fields, instead of `Node`s; nested
+        fields can be given with dots:
+
+            >>> feed = g.me.feed.fields('id', 'message', 'from.id', record=True)
+            >>> [(post.id, post.from_id) for post in feed.call_fb().data]
+        """
+        record = options.pop('record', False)
+        if options:
+            raise TypeError('fields() got an unexpected keyword argument %r' %
+                            options.keys()[0])
+        if not record:
+            return self.with_url_params('fields', ','.join(fields))
+        node = self.with_url_params('fields', expand_fields(fields))
+        node.record = record_class(fields)
+        return node
 
     def ids(self, *ids):
         """Shortcut for `?ids=1,2,3`."""
 
-        return self | ('ids', ','.join(map(str, ids)))
+        return self.with_url_params('ids', ','.join(map(str, ids)))
+
+    def fetch_many(self, ids, fields=None, concurrency=10, chunk_size=50,
+                   record=False, **params):
+        """
+        Fetch many objects by id; yield `(id, result)` pairs as they arrive.
+
+            >>> for id, post in g.fetch_many(post_ids, fields=['id', 'message'],
+            ...                              concurrency=20):
+            ...     if isinstance(post, Exception):
+            ...         log.warning('Could not fetch %s: %s', id, post)
+
+        Ids are requested `chunk_size` at a time with `?ids=`, with up to
+        `concurrency` requests in flight over the shared session. Errors are
+        reported per id rather than aborting the whole run: when Facebook
+        rejects a chunk because one of its ids is invalid (error #100), the
+        chunk is split in half and retried until the bad ids are isolated. Ids
+        missing from a response are reported as `GraphException`s. With
+        `record=True`, results are `Record`s of `fields` (see `fields()`).
+        """
+        node = self
+        if fields:
+            if isinstance(fields, basestring):
+                fields = [fields]
+            node = self.fields(*fields, record=record)
+
+        ids = iter(ids)
+        retry = []
+        results = eventlet.queue.LightQueue()
+
+        def next_chunk():
+            if retry:
+                return retry.pop()
+            return [unicode(i) for i in itertools.islice(ids, chunk_size)]
+
+        def fetch_chunk(chunk):
+            try:
+                results.put((chunk, node.ids(*chunk).call_fb(**params)))
+            except Exception, e:
+                results.put((chunk, e))
+
+        in_flight = 0
+        while True:
+            while in_flight < concurrency:
+                chunk = next_chunk()
+                if not chunk:
+                    break
+                eventlet.spawn_n(fetch_chunk, chunk)
+                in_flight += 1
+            if not in_flight:
+                return
+
+            chunk, data = results.get()
+            in_flight -= 1
+            if (isinstance(data, GraphException) and len(chunk) > 1 and
+                    data.code == INVALID_PARAMETER):
+                half = len(chunk) // 2
+                retry.extend([chunk[half:], chunk[:half]])
+                continue
+            for id in chunk:
+                if isinstance(data, Exception) or not isinstance(data, dict):
+                    yield id, data
+                elif id in data:
+                    yield id, data[id]
+                else:
+                    yield id, GraphException(
+                        None, 'No data returned for %s' % id, graph=node[id],
+                        params=params)
 
     def process_response(self, data, params, method=None):
         if isinstance(data, dict):
@@ -243,7 +616,10 @@ class Graph(object):
                     return self.err_handler(e=e)
                 else:
                     raise e
-            return bunch.bunchify(data)
+            if self.record is not None:
+                ids = any(key == 'ids' for key, value in self._params)
+                return self.record.from_response(data, ids=ids)
+            return wrap(data)
         return data
 
     def post(self, **params):
@@ -259,106 +635,110 @@ class Graph(object):
         Must pass in a file object as 'file'
         """
 
+        if self._path.rsplit('/', 1)[-1] in ['photos']:
+            return self._post_mime("post", **params)
+
         if self.access_token:
             params['access_token'] = self.access_token
             if self.app_secret:
                 params['appsecret_proof'] = get_appsecret_proof(
                     self.app_secret, self.access_token)
 
-        if get_path(self.url).split('/')[-1] in ['photos']:
-            params['timeout'] = self.timeout
-            params['httplib'] = self.httplib
-            fetch = partial(self.post_mime,
-                            self.url,
-                            httplib=self.httplib,
-                            retries=self.retries,
-                            **params)
-        else:
-            params = dict([(k, v.encode('UTF-8')) for (k,v) in params.iteritems() if v is not None])
-            fetch = partial(self.fetch,
-                            self.url,
-                            urllib2=self.urllib2,
-                            httplib=self.httplib,
-                            timeout=self.timeout,
-                            retries=self.retries,
-                            data=urllib.urlencode(params))
-
-        data = fetch()
+        params = dict([(k, v.encode('UTF-8')) for (k,v) in params.iteritems() if v is not None])
+        data = self._fetch(self.url, data=urllib.urlencode(params))
         return self.process_response(data, params, "post")
 
     def post_file(self, file, **params):
+        params['file'] = file
+        return self._post_mime("post_file", **params)
+
+    def upload_video(self, file, **params):
+        """
+        Upload a video to this edge (e.g. `g[page_id].videos`) in chunks,
+        with Facebook's resumable upload protocol; see `ResumableVideoUpload`.
+        """
+        from facegraph.video import ResumableVideoUpload
+        return ResumableVideoUpload(self, file).run(**params)
+
+    def _post_mime(self, method, **params):
+        """POST `params` to this URL as multipart/form-data."""
         if self.access_token:
             params['access_token'] = self.access_token
             if self.app_secret:
                 params['appsecret_proof'] = get_appsecret_proof(
                     self.app_secret, self.access_token)
-        params['file'] = file
-        params['timeout'] = self.timeout
-        params['httplib'] = self.httplib
-        data = self.post_mime(self.url, **params)
+        data = self._scheduled(self.post_mime, self.url, timeout=self.timeout,
+                               retries=self.retries,
+                               retry_policy=self.retry_policy,
+                               transport=self.transport, hooks=self.hooks,
+                               **params)
 
-        return self.process_response(data, params, "post_file")
+        return self.process_response(data, params, method)
 
     @staticmethod
-    def post_mime(url, httplib=default_httplib, timeout=DEFAULT_TIMEOUT, retries=5, **kwargs):
-        body = []
-        crlf = '\r\n'
-        boundary = "graphBoundary"
-
-        # UTF8 params
-        utf8_kwargs = dict([(k, v.encode('UTF-8')) for (k,v) in kwargs.iteritems() if k != 'file' and v is not None])
-
-        # Add args
-        for (k,v) in utf8_kwargs.iteritems():
-            body.append("--"+boundary)
-            body.append('Content-Disposition: form-data; name="%s"' % k)
-            body.append('')
-            body.append(str(v))
+    def post_mime(url, httplib=None, timeout=DEFAULT_TIMEOUT, retries=5, retry_policy=None, transport=None, hooks=None, **kwargs):
+        """
+        POST `kwargs` to `url` as multipart/form-data, attaching `file` and
+        any `FilePart` values; return the JSON-decoded response.
+
+        The body is streamed, reading files a chunk at a time, through
+        `transport` (or the shared session), so reuses its pooled keep-alive
+        connections; it is sent again in full if it fails. Each attempt is
+        reported to `hooks`. `httplib` is no longer used, and only accepted
+        for compatibility.
+        """
+        fields = []
+        files = []
+        for (k, v) in kwargs.iteritems():
+            if isinstance(v, FilePart):
+                files.append((k, v))
+            elif k != 'file' and v is not None:
+                fields.append((k, v.encode('UTF-8') if isinstance(v, unicode) else str(v)))
 
         # Add raw data
         file = kwargs.get('file')
         if file:
-            file.open()
-            data = file.read()
-            file.close()
-
-            body.append("--"+boundary)
-            body.append('Content-Disposition: form-data; filename="facegraphfile.png"')
-            body.append('')
-            body.append(data)
-
-            body.append("--"+boundary+"--")
-            body.append('')
-
-        body = crlf.join(body)
+            if hasattr(file, 'open'):
+                file.open()
+            files.append((None, file if isinstance(file, FilePart) else FilePart(file)))
 
-        # Post to server
-        kwargs = {}
-        if timeout:
-            kwargs = {'timeout': timeout}
-        r = httplib.HTTPSConnection(get_host(url), **kwargs)
-        headers = {'Content-Type': 'multipart/form-data; boundary=%s' % boundary,
-                   'Content-Length': str(len(body)),
+        body = MultipartEncoder(fields, files)
+        headers = {'Content-Type': body.content_type,
                    'MIME-Version': '1.0'}
-
-        r.request('POST', get_path(url).encode(), body, headers)
-        attempt = 0
-        while True:
-            try:
-                response = r.getresponse().read()
-                return json.loads(response)
-            except JSONDecodeError, e:
-                if len(e.doc) == 0:
-                    raise EmptyStringReturnedException(str(e))
-                else:
-                    raise WrappedJSONDecodeError(response, e)
-            except (httplib.BadStatusLine, IOError):
-                if attempt < retries:
-                    attempt += 1
-                else:
-                    raise
-            finally:
-                r.close()
+        kwargs = {'data': body, 'headers': headers}
+        if timeout:
+            kwargs['timeout'] = timeout
+
+        client = session if transport is None else transport
+        hooks = Hooks.resolve(hooks)
+        event = RequestEvent('POST', url)
+        retry = RetryPolicy.resolve(retry_policy, retries).start()
+        try:
+            while True:
+                try:
+                    body.rewind()
+                    event.begin(retry.attempt)
+                    hooks.fire('before_request', event)
+                    response = client.post(url, **kwargs)
+                    event.received(response)
+                    response = response.content
+                    data = event.load(response)
+                    hooks.report(event.finish(data=data))
+                    return data
+                except JSONDecodeError, e:
+                    hooks.report(event.finish(e))
+                    if len(e.doc) == 0:
+                        raise EmptyStringReturnedException(str(e))
+                    else:
+                        raise WrappedJSONDecodeError(response, e)
+                except requests.RequestException, e:
+                    hooks.report(event.finish(e))
+                    if not retry.retry():
+                        raise
+                    hooks.fire('on_retry', event)
+        finally:
+            if file and hasattr(file, 'close'):
+                file.close()
 
     def delete(self):
         """
@@ -367,56 +747,110 @@ class Graph(object):
         return self.post(method='delete')
 
     @staticmethod
-    def fetch(url, data=None, urllib2=default_urllib2, httplib=default_httplib, timeout=DEFAULT_TIMEOUT, retries=None):
+    def fetch(url, data=None, urllib2=None, httplib=None, timeout=DEFAULT_TIMEOUT, retries=None, headers=None, on_response=None, retry_policy=None, circuit_breakers=None, transport=None, hooks=None):
         """
         Fetch the specified URL, with optional form data; return a string.
 
-        This method exists mainly for dependency injection purposes. By default
-        it uses urllib2; you may override it and use an alternative library.
+        Requests are made with `transport`, or the module's shared `session`
+        if there is none. `urllib2` and `httplib` are no longer used, and only
+        accepted for compatibility.
+
+        `headers` are sent with the request, and `on_response` is called with
+        every HTTP response received. `NOT_MODIFIED` is returned for
+        `304 Not Modified` responses. Failures are retried according to
+        `retry_policy`, or up to `retries` times if there is none.
+
+        If `circuit_breakers` is given, failures are recorded against the
+        URL's endpoint, and `CircuitOpenError` is raised without making a
+        request while its circuit is open.
+
+        Each attempt is timed and reported to `hooks`, if given.
         """
-        attempt = 0
+        client = session if transport is None else transport
+        hooks = Hooks.resolve(hooks)
+        event = RequestEvent('POST' if data else 'GET', url)
+        retry = RetryPolicy.resolve(retry_policy, retries).start()
+        breaker = CircuitBreakerRegistry.resolve(circuit_breakers, url)
         while True:
+            breaker.before()
+            event.begin(retry.attempt)
+            hooks.fire('before_request', event)
             try:
                 kwargs = {}
                 if timeout:
                     kwargs = {'timeout': timeout}
+                if headers:
+                    kwargs['headers'] = headers
 
                 if data:
-                    response = session.post(url, data=data, **kwargs)
+                    response = client.post(url, data=data, **kwargs)
                 else:
-                    response = session.get(url, **kwargs)
-
+                    response = client.get(url, **kwargs)
+                event.received(response)
+
+                if on_response is not None:
+                    on_response(response)
+                if response.status_code == 304:
+                    breaker.record(True)
+                    hooks.report(event.finish())
+                    return NOT_MODIFIED
                 response.raise_for_status()
-                return json.loads(response.content)
-            except requests.HTTPError:
+                data = event.load(response.content)
+                breaker.record(True)
+                hooks.report(event.finish(data=data))
+                return data
+            except requests.HTTPError, e:
                 error = response.content
-                can_retry = (
-                        error in RECOVERABLE_FACEBOOK_ERRORS
-                        or 'Sorry, something went wrong' in error
-                )
-                if can_retry and attempt < retries:
-                    attempt += 1
-                else:
-                    return json.loads(error)
-            except requests.RequestException:
-                if attempt < retries:
-                    attempt += 1
-                else:
+                can_retry = retry.policy.is_retryable(error, response.status_code)
+                # Only transient errors say anything about the endpoint's health.
+                breaker.record(not can_retry)
+                hooks.report(event.finish(e, error))
+                if not (can_retry and retry.retry()):
+                    return codec.loads(error)
+            except requests.RequestException, e:
+                breaker.record(False)
+                hooks.report(event.finish(e))
+                if not retry.retry():
                     raise
-            except JSONDecodeError:
-                if attempt < retries:
-                    attempt += 1
-                else:
+            except JSONDecodeError, e:
+                breaker.record(False)
+                hooks.report(event.finish(e))
+                if not retry.retry():
                     raise ApiException(code=None,
                                        message='Could not decode response',
                                        method=url)
+            except BaseException, e:
+                # Killed, timed out or failed unexpectedly: the attempt must
+                # still be recorded, or a half-open circuit stays stuck.
+                breaker.record(False)
+                hooks.report(event.finish(e))
+                raise
+            hooks.fire('on_retry', event)
+
+    @staticmethod
+    def fetch_stream(url, timeout=DEFAULT_TIMEOUT, chunk_size=CHUNK_SIZE, transport=None):
+        """
+        Fetch the specified URL; yield the body in chunks as it arrives.
+
+        The connection is released when the generator is exhausted or closed.
+        """
+        kwargs = {}
+        if timeout:
+            kwargs = {'timeout': timeout}
+        client = session if transport is None else transport
+        response = client.get(url, stream=True, **kwargs)
+        try:
+            for chunk in response.iter_content(chunk_size):
+                yield chunk
+        finally:
+            response.close()
 
     def __sentry__(self):
         """
         Transform the graph object into something that sentry can
         understand
         """
-        return "Graph(url: %s, params: %s)" % (self.url, str(self.__dict__))
+        return "Graph(url: %s, params: %s)" % (self.url, str(self._settings))
 
 
 class GraphException(Exception):
@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+import bisect
+import datetime
+import logging
+import threading
+import time
+
+from facegraph import codec
+from facegraph.transport import pop_connect_time
+from facegraph.url_operations import get_host, get_path, path_template
+
+__all__ = ['Hooks', 'RequestEvent', 'Histogram', 'EVENTS', 'PHASES']
+
+log = logging.getLogger('pyfacegraph')
+
+EVENTS = ('before_request', 'after_response', 'on_retry', 'on_error')
+
+# The parts of a request's latency, in the order they happen, and the total.
+PHASES = ('connect', 'ttfb', 'download', 'decode', 'elapsed')
+
+# Upper bounds of the `Histogram` buckets, in seconds.
+DEFAULT_BOUNDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                  30, 60)
+
+
+def endpoint(url):
+    """Return the normalized endpoint of `url`, e.g. 'graph.facebook.com/{id}/feed'."""
+    return get_host(url) + path_template(get_path(url))
+
+
+def _error_code(data):
+    """Return the Facebook error code in a response, if it is an error."""
+    if isinstance(data, basestring):
+        if 'error' not in data:
+            return None
+        try:
+            data = codec.loads(data)
+        except ValueError:
+            return None
+    if not isinstance(data, dict):
+        return None
+    error = data.get('error')
+    if isinstance(error, dict):
+        return error.get('code', error.get('error_code'))
+    return data.get('error_code')
+
+
+class RequestEvent(object):
+
+    """
+    One attempt at an HTTP request, as passed to hooks.
+
+    `attempt` counts from zero. `status` and `bytes` (of the decoded body) are
+    set once a response has been received; `error` is the exception the
+    attempt failed with, if any, and `error_code` the code of a Facebook
+    error response.
+
+    Times are in seconds: `connect` is spent opening new connections (0 if
+    the connection was reused, or the transport is not a `Transport`), `ttfb`
+    waiting for the response headers, `download` reading the body and
+    `decode` decoding it; together they make up `elapsed`. Phases which are
+    not measured are `None`.
+    """
+
+    __slots__ = ('method', 'url', 'attempt', 'status', 'bytes', 'error',
+                 'started_at', 'connect', 'ttfb', 'download', 'decode',
+                 'elapsed', '_endpoint', '_body', '_error_code')
+
+    def __init__(self, method, url):
+        self.method = method
+        self.url = url
+        self._endpoint = None
+        self.begin(0)
+
+    def __repr__(self):
+        return '<RequestEvent(%s %s, attempt=%d, status=%r)>' % (
+            self.method, self.endpoint, self.attempt, self.status)
+
+    @property
+    def endpoint(self):
+        if self._endpoint is None:
+            self._endpoint = endpoint(self.url)
+        return self._endpoint
+
+    @property
+    def error_code(self):
+        if self._body is not None:
+            self._error_code = _error_code(self._body)
+            self._body = None
+        return self._error_code
+
+    @property
+    def failed(self):
+        return self.error is not None or self.error_code is not None
+
+    def begin(self, attempt):
+        """Start timing attempt number `attempt`."""
+        self.attempt = attempt
+        self.status = self.bytes = self.error = None
+        self.connect = self.ttfb = self.download = self.decode = None
+        self.elapsed = None
+        self._body = self._error_code = None
+        pop_connect_time()
+        self.started_at = time.time()
+
+    def headers_received(self):
+        """Note that a `urllib2` response's headers have been read."""
+        self.ttfb = time.time() - self.started_at
+
+    def received(self, response, content=None):
+        """
+        Record a `requests` response, or a `urllib2` one if its `content`
+        has been read.
+        """
+        now = time.time()
+        if content is None:
+            self.status = response.status_code
+            content = response.content
+            headers_at = getattr(response, 'elapsed', None)
+        else:
+            self.status = response.getcode()
+            headers_at = self.ttfb
+        if isinstance(content, basestring):
+            self.bytes = len(content)
+
+        total = now - self.started_at
+        if isinstance(headers_at, datetime.timedelta):
+            headers_at = min(headers_at.total_seconds(), total)
+        elif not isinstance(headers_at, float):
+            headers_at = total
+        self.connect = min(pop_connect_time(), headers_at)
+        self.ttfb = headers_at - self.connect
+        self.download = total - headers_at
+        return self
+
+    def load(self, content):
+        """Decode `content` with the current codec, timing it."""
+        started = time.time()
+        try:
+            return codec.loads(content)
+        finally:
+            self.decode = time.time() - started
+
+    def finish(self, error=None, data=None):
+        """
+        End the attempt, with the exception it failed with and/or the
+        response (decoded or not) it got.
+        """
+        self.elapsed = time.time() - self.started_at
+        self.error = error
+        self._body = data
+        return self
+
+
+class Hooks(object):
+
+    """
+    Functions called as requests are made, to measure them.
+
+    Each is called with a `RequestEvent`, on one of the `EVENTS`:
+
+    * `before_request` before each attempt,
+    * `after_response` once a response to it has been received and decoded,
+    * `on_error` when it fails: with an exception, an HTTP error status or
+      a Facebook error response,
+    * `on_retry` when a failed attempt is about to be followed by another.
+
+    Register functions with `on()`, or objects with methods named after the
+    events with `add()`, and pass the hooks to `Graph`, `FQL` or `Api`:
+
+        >>> hooks = Hooks(Histogram())
+        >>> @hooks.on('on_error')
+        ... def log_error(event):
+        ...     log.warning('%s failed: %s', event.endpoint, event.error_code)
+        >>> g = Graph(access_token, hooks=hooks)
+
+    Exceptions raised by hooks are logged, and do not affect requests.
+    """
+
+    def __init__(self, *listeners):
+        for name in EVENTS:
+            setattr(self, name, [])
+        for listener in listeners:
+            self.add(listener)
+
+    def __repr__(self):
+        return '<Hooks(%s) at 0x%x>' % (
+            ', '.join('%s=%d' % (name, len(getattr(self, name)))
+                      for name in EVENTS), id(self))
+
+    @staticmethod
+    def resolve(hooks):
+        """Return `hooks`, or hooks which do nothing if it is None."""
+        if hooks is None:
+            return _no_hooks
+        return hooks
+
+    def on(self, name, func=None):
+        """Call `func` on event `name`; may be used as a decorator."""
+        if name not in EVENTS:
+            raise ValueError('Unknown event %r' % (name,))
+        if func is None:
+            return lambda func: self.on(name, func)
+        getattr(self, name).append(func)
+        return func
+
+    def add(self, listener):
+        """Register each of `listener`'s methods named after an event."""
+        for name in EVENTS:
+            func = getattr(listener, name, None)
+            if func is not None:
+                self.on(name, func)
+        return listener
+
+    def fire(self, name, event):
+        for func in getattr(self, name):
+            try:
+                func(event)
+            except Exception:
+                log.exception('Error in %s hook %r', name, func)
+
+    def report(self, event):
+        """Fire `after_response` and/or `on_error` for a finished attempt."""
+        if event.status is not None:
+            self.fire('after_response', event)
+        if event.failed:
+            self.fire('on_error', event)
+
+
+class _NoHooks(object):
+
+    """Stands in for `Hooks` when none are configured."""
+
+    def fire(self, name, event):
+        pass
+
+    def report(self, event):
+        pass
+
+
+_no_hooks = _NoHooks()
+
+
+class Series(object):
+
+    """A histogram of one measurement."""
+
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """
+        Return the upper bound of the bucket holding the `q`th percentile
+        (0 < q <= 100), or the maximum if that is lower or past every bound.
+        """
+        if not self.count:
+            return 0.0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                if i < len(self.bounds):
+                    return min(self.bounds[i], self.max)
+                break
+        return self.max
+
+
+class Histogram(object):
+
+    """
+    Aggregates request latencies, sizes and errors by endpoint.
+
+    Add one to `Hooks`; each endpoint (e.g. 'graph.facebook.com/{id}/feed')
+    gets a histogram of every latency phase in `PHASES`:
+
+        >>> histogram = Histogram()
+        >>> g = Graph(access_token, hooks=Hooks(histogram))
+        >>> histogram.percentile('graph.facebook.com/{id}/feed', 95)
+        0.5
+        >>> histogram.slowest(5)  # The endpoints with the slowest p95
+        [('graph.facebook.com/{id}/insights', 2.5), ...]
+
+    Percentiles are as precise as `bounds`, the bucket bounds in seconds.
+    """
+
+    def __init__(self, bounds=DEFAULT_BOUNDS):
+        self.bounds = tuple(sorted(bounds))
+        self.series = {}
+        self.requests = {}
+        self.errors = {}
+        self.bytes = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<Histogram(%d endpoints) at 0x%x>' % (
+            len(self.requests), id(self))
+
+    def after_response(self, event):
+        key = event.endpoint
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.bytes[key] = self.bytes.get(key, 0) + (event.bytes or 0)
+            for phase in PHASES:
+                value = getattr(event, phase)
+                if value is not None:
+                    self._series(key, phase).add(value)
+
+    def on_error(self, event):
+        key = event.endpoint
+        with self._lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+            if event.status is None:
+                # No response: only the time until it failed is known.
+                self.requests[key] = self.requests.get(key, 0) + 1
+                self._series(key, 'elapsed').add(event.elapsed)
+
+    def _series(self, key, phase):
+        series = self.series.get((key, phase))
+        if series is None:
+            series = self.series[(key, phase)] = Series(self.bounds)
+        return series
+
+    def percentile(self, endpoint, q, phase='elapsed'):
+        series = self.series.get((endpoint, phase))
+        return series.percentile(q) if series is not None else None
+
+    def slowest(self, n=10, q=95, phase='elapsed'):
+        """Return the `n` endpoints with the highest `q`th percentile."""
+        with self._lock:
+            latencies = [(key, series.percentile(q))
+                         for (key, name), series in self.series.items()
+                         if name == phase]
+        latencies.sort(key=lambda item: item[1], reverse=True)
+        return latencies[:n]
+
+    def stats(self):
+        """Return counts and latency percentiles for each endpoint."""
+        stats = {}
+        with self._lock:
+            for key, count in self.requests.items():
+                stats[key] = {'requests': count,
+                              'errors': self.errors.get(key, 0),
+                              'bytes': self.bytes.get(key, 0)}
+            for (key, phase), series in self.series.items():
+                stats[key][phase] = {'count': series.count,
+                                     'mean': series.mean(),
+                                     'p50': series.percentile(50),
+                                     'p95': series.percentile(95),
+                                     'p99': series.percentile(99),
+                                     'max': series.max}
+        return stats
+
+    def reset(self):
+        with self._lock:
+            self.series.clear()
+            self.requests.clear()
+            self.errors.clear()
+            self.bytes.clear()
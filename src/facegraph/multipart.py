@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import os
+import uuid
+from cStringIO import StringIO
+
+__all__ = ['MultipartEncoder', 'FilePart', 'CHUNK_SIZE']
+
+# How much of a file is read into memory at a time.
+CHUNK_SIZE = 64 * 1024
+
+CRLF = '\r\n'
+
+
+class FilePart(object):
+
+    """
+    A file, or `length` bytes of it from `offset`, to attach to a multipart
+    body. `file` may be any object with `read()`; `seek()` is needed to send
+    a slice or to send the body again. Its size is found from `length`, a
+    `size` attribute (as on Django's `File`), its `fileno()` or by seeking to
+    its end; failing all those, it is read into memory.
+    """
+
+    def __init__(self, file, filename='facegraphfile.png', content_type=None,
+                 offset=0, length=None):
+        if length is None:
+            try:
+                length = _file_size(file) - offset
+            except AttributeError:
+                file = StringIO(file.read())
+                length = _file_size(file) - offset
+        self.file = file
+        self.filename = filename
+        self.content_type = content_type
+        self.offset = offset
+        self.length = length
+
+    def __repr__(self):
+        return '<FilePart(%r, %d bytes) at 0x%x>' % (
+            self.filename, self.length, id(self))
+
+
+def _file_size(file):
+    size = getattr(file, 'size', None)
+    if isinstance(size, (int, long)):
+        return size
+    try:
+        return os.fstat(file.fileno()).st_size
+    except (AttributeError, IOError, OSError, ValueError):
+        pass
+    position = file.tell()
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(position)
+    return size
+
+
+class MultipartEncoder(object):
+
+    """
+    A `multipart/form-data` body, read a chunk at a time.
+
+        >>> body = MultipartEncoder([('message', 'Hi')],
+        ...                         [('source', FilePart(open('cat.png', 'rb')))])
+        >>> session.post(url, data=body,
+        ...              headers={'Content-Type': body.content_type})
+
+    Files are read from as the body is, so memory use is bounded however
+    large they are; `len()` is the body's size, for the `Content-Length`.
+    Fields are (name, value) pairs of byte strings; a file may have no name.
+    `rewind()` goes back to the start, to send the body again.
+    """
+
+    def __init__(self, fields=(), files=(), boundary=None):
+        if boundary is None:
+            boundary = uuid.uuid4().hex
+        self.boundary = boundary
+        self.content_type = 'multipart/form-data; boundary=%s' % boundary
+
+        parts = []
+        for name, value in fields:
+            parts.append(self._header(
+                'Content-Disposition: form-data; name="%s"' % name))
+            parts.append(value + CRLF)
+        for name, part in files:
+            disposition = 'Content-Disposition: form-data; '
+            if name is not None:
+                disposition += 'name="%s"; ' % name
+            disposition += 'filename="%s"' % part.filename
+            headers = [disposition]
+            if part.content_type:
+                headers.append('Content-Type: %s' % part.content_type)
+            parts.append(self._header(*headers))
+            parts.append(part)
+            parts.append(CRLF)
+        parts.append('--%s--%s' % (boundary, CRLF))
+        self._parts = parts
+        self._length = sum(_length(p) for p in parts)
+        self.rewind()
+
+    def __repr__(self):
+        return '<MultipartEncoder(%d bytes) at 0x%x>' % (self._length, id(self))
+
+    def _header(self, *headers):
+        return '--%s%s%s%s%s' % (self.boundary, CRLF, CRLF.join(headers),
+                                 CRLF, CRLF)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def rewind(self):
+        self._index = 0
+        self._position = 0
+
+    def read(self, size=-1):
+        """Read up to `size` bytes, or the rest of the body."""
+        chunks = []
+        wanted = size if size is not None and size >= 0 else self._length
+        while wanted > 0 and self._index < len(self._parts):
+            part = self._parts[self._index]
+            if isinstance(part, FilePart):
+                if self._position == 0 and (part.offset or
+                                            hasattr(part.file, 'seek')):
+                    part.file.seek(part.offset)
+                count = min(wanted, part.length - self._position)
+                chunk = part.file.read(count)
+                if len(chunk) < count:
+                    raise IOError('%r ended early' % part)
+            else:
+                chunk = part[self._position:self._position + wanted]
+            chunks.append(chunk)
+            wanted -= len(chunk)
+            self._position += len(chunk)
+            if self._position == _length(part):
+                self._index += 1
+                self._position = 0
+        return ''.join(chunks)
+
+
+def _length(part):
+    return part.length if isinstance(part, FilePart) else len(part)
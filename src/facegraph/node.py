@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import bunch
+
+__all__ = ['Node', 'NodeList', 'wrap']
+
+
+def wrap(value):
+    """Wrap decoded JSON for attribute access, without copying it deeply."""
+    if type(value) is dict:
+        return Node(value)
+    if type(value) is list:
+        return NodeList(value)
+    return value
+
+
+class Node(bunch.Bunch):
+
+    """
+    A `bunch.Bunch` over a decoded JSON object, which wraps nested objects and
+    arrays the first time they are read.
+
+        >>> post = Node({'id': '1', 'from': {'name': 'Zachary'}})
+        >>> post
+        Node({'from': {'name': 'Zachary'}, 'id': '1'})
+        >>> post['from'].name
+        'Zachary'
+
+    `bunch.bunchify()` copies a whole response into Bunches up front; a
+    `Node` only makes a shallow copy of each object or array that is actually
+    read. Access by attribute, item, `get()` and iteration over values behaves
+    as with a bunchified response.
+    """
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if type(value) is dict or type(value) is list:
+            value = wrap(value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def __repr__(self):
+        return 'Node(%s)' % dict.__repr__(self)
+
+    def get(self, key, default=None):
+        if dict.__contains__(self, key):
+            return self[key]
+        return default
+
+    def pop(self, key, *default):
+        return wrap(dict.pop(self, key, *default))
+
+    def setdefault(self, key, default=None):
+        if not dict.__contains__(self, key):
+            dict.__setitem__(self, key, default)
+        return self[key]
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        return key, wrap(value)
+
+    def itervalues(self):
+        for key in self.iterkeys():
+            yield self[key]
+
+    def iteritems(self):
+        for key in self.iterkeys():
+            yield key, self[key]
+
+    def values(self):
+        return list(self.itervalues())
+
+    def items(self):
+        return list(self.iteritems())
+
+
+class NodeList(list):
+
+    """A list over a decoded JSON array, wrapping its items as they are read."""
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return NodeList(list.__getitem__(self, index))
+        value = list.__getitem__(self, index)
+        if type(value) is dict or type(value) is list:
+            value = wrap(value)
+            list.__setitem__(self, index, value)
+        return value
+
+    def __getslice__(self, start, stop):
+        return NodeList(list.__getslice__(self, start, stop))
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+    def __reversed__(self):
+        for i in xrange(len(self) - 1, -1, -1):
+            yield self[i]
+
+    def pop(self, *index):
+        return wrap(list.pop(self, *index))
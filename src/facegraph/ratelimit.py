@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import eventlet
+
+from facegraph import codec
+
+__all__ = ['RateLimiter', 'Usage', 'THROTTLING_ERRORS']
+
+# Error codes Facebook uses once a rate limit has been exceeded:
+# API Too Many Calls, User Request Limit, Page Request Limit and
+# API User Too Many Calls.
+THROTTLING_ERRORS = frozenset([4, 17, 32, 613])
+
+USAGE_FIELDS = ('call_count', 'total_time', 'total_cputime', 'acc_id_util_pct')
+
+
+class Usage(object):
+
+    """
+    One usage reading, as a percentage of the limit it is measured against.
+
+    `regain_at` is set when Facebook has said when access will be restored
+    (`estimated_time_to_regain_access`), or when we have been throttled.
+    """
+
+    __slots__ = ('level', 'updated_at', 'regain_at')
+
+    def __init__(self, level, updated_at, regain_at=None):
+        self.level = level
+        self.updated_at = updated_at
+        self.regain_at = regain_at
+
+    def __repr__(self):
+        return '<Usage(%s%%)>' % self.level
+
+    @classmethod
+    def from_header(cls, value, now):
+        """Parse one usage object, e.g. `{"call_count": 28, ...}`."""
+        level = max([value.get(field) or 0 for field in USAGE_FIELDS])
+        regain = value.get('estimated_time_to_regain_access')
+        regain_at = now + regain * 60 if regain else None
+        return cls(level, now, regain_at)
+
+
+class RateLimiter(object):
+
+    """
+    Slows requests down as Facebook's reported API usage nears its limits.
+
+    Facebook reports usage in response headers, as percentages of the limits:
+
+    * `X-App-Usage` for the app as a whole,
+    * `X-Page-Usage` and `X-Ad-Account-Usage` for the token's page or ad
+      account,
+    * `X-Business-Use-Case-Usage` for each business the token acts for.
+
+    Pass one limiter per app to `Graph`; every response updates the model,
+    and every request first waits for `delay(token)` seconds:
+
+        >>> limiter = RateLimiter(threshold=75, max_delay=30)
+        >>> g = Graph(access_token, rate_limiter=limiter)
+
+    Below `threshold` percent nothing is delayed. Above it, the delay grows
+    quadratically up to `max_delay` at 100%. If Facebook has given an
+    estimated time to regain access, or we have been throttled (error codes 4,
+    17, 32 and 613), requests for the affected token wait at least until then.
+    Readings older than `ttl` seconds are forgotten, since Facebook measures
+    usage over a rolling window.
+    """
+
+    APP_HEADER = 'X-App-Usage'
+    TOKEN_HEADERS = ('X-Page-Usage', 'X-Ad-Account-Usage')
+    BUSINESS_HEADER = 'X-Business-Use-Case-Usage'
+
+    def __init__(self, threshold=75, max_delay=60, throttled_delay=60,
+                 ttl=300, clock=time.time, sleep=eventlet.sleep):
+        self.threshold = threshold
+        self.max_delay = max_delay
+        self.throttled_delay = throttled_delay
+        self.ttl = ttl
+        self.clock = clock
+        self.sleep = sleep
+        self.app = None
+        self.tokens = {}
+        self.businesses = {}
+        self._token_businesses = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<RateLimiter(app=%r, %d tokens, %d businesses) at 0x%x>' % (
+            self.app, len(self.tokens), len(self.businesses), id(self))
+
+    def update(self, token, headers):
+        """Record the usage headers of a response to a request by `token`."""
+        now = self.clock()
+        app = _parse_header(headers, self.APP_HEADER)
+        with self._lock:
+            if app:
+                self.app = Usage.from_header(app, now)
+            for header in self.TOKEN_HEADERS:
+                usage = _parse_header(headers, header)
+                if usage:
+                    self.tokens[token] = Usage.from_header(usage, now)
+            businesses = _parse_header(headers, self.BUSINESS_HEADER) or {}
+            for business_id, use_cases in businesses.iteritems():
+                for use_case in use_cases or ():
+                    key = (business_id, use_case.get('type'))
+                    self.businesses[key] = Usage.from_header(use_case, now)
+                    self._token_businesses.setdefault(token, set()).add(key)
+
+    def throttled(self, token, code):
+        """Record that a request by `token` failed with error `code`."""
+        if code not in THROTTLING_ERRORS:
+            return
+        now = self.clock()
+        usage = Usage(100, now, now + self.throttled_delay)
+        with self._lock:
+            if code == 4:
+                # Application-level limit: every token is affected.
+                self.app = usage
+            else:
+                self.tokens[token] = usage
+
+    def usage(self, token):
+        """Return the current readings relevant to requests by `token`."""
+        now = self.clock()
+        with self._lock:
+            readings = [self.app, self.tokens.get(token)]
+            for key in self._token_businesses.get(token, ()):
+                readings.append(self.businesses.get(key))
+        return [u for u in readings
+                if u is not None and (now - u.updated_at < self.ttl or
+                                      (u.regain_at or 0) > now)]
+
+    def delay(self, token):
+        """Return how many seconds a request by `token` should wait."""
+        now = self.clock()
+        delay = 0
+        for usage in self.usage(token):
+            if usage.regain_at is not None:
+                # Once access is due back, only a fresh reading can tell.
+                if usage.regain_at > now:
+                    delay = max(delay, usage.regain_at - now)
+                continue
+            if usage.level > self.threshold:
+                excess = min(usage.level - self.threshold,
+                             100 - self.threshold)
+                fraction = float(excess) / (100 - self.threshold)
+                delay = max(delay, self.max_delay * fraction ** 2)
+        return delay
+
+    def wait(self, token):
+        delay = self.delay(token)
+        if delay:
+            self.sleep(delay)
+        return delay
+
+
+def _parse_header(headers, name):
+    try:
+        value = headers.get(name)
+        return codec.loads(value) if value else None
+    except (AttributeError, TypeError, ValueError):
+        return None
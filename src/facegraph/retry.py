@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+import random
+import threading
+import time
+
+import eventlet
+
+from facegraph import codec
+
+__all__ = ['RetryPolicy', 'RetryBudget', 'RECOVERABLE_FACEBOOK_ERRORS',
+           'RETRYABLE_ERROR_CODES', 'RETRYABLE_STATUSES']
+
+# Facebook occasionally gives these back instead of a valid json response
+RECOVERABLE_FACEBOOK_ERRORS = {
+    'recv() failed: Connection reset by peer',
+    'Got EOF while waiting for outstanding responses',
+}
+
+# Unknown error and Service temporarily unavailable. Facebook also flags
+# transient errors with `is_transient`, which is honoured regardless.
+RETRYABLE_ERROR_CODES = frozenset([1, 2])
+
+RETRYABLE_STATUSES = frozenset([500, 502, 503, 504])
+
+
+class RetryBudget(object):
+
+    """
+    A token bucket limiting how often retries may happen, process-wide.
+
+    Each retry takes a token; tokens come back at `rate` per second, up to
+    `capacity`. When Facebook is having a bad day this stops every worker
+    from multiplying its load on them by the number of retries.
+    """
+
+    def __init__(self, capacity=100, rate=10, clock=time.time):
+        self.capacity = capacity
+        self.rate = rate
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated_at = clock()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<RetryBudget(%d/%d) at 0x%x>' % (
+            self.tokens, self.capacity, id(self))
+
+    def acquire(self):
+        """Take a token if there is one; return whether there was."""
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+default_budget = RetryBudget()
+
+
+class RetryPolicy(object):
+
+    """
+    Decides whether, and after how long, a failed request is retried.
+
+    Retries back off exponentially from `base_delay`, capped at `max_delay`,
+    with "full jitter" (a random delay between zero and the cap) so clients
+    do not retry in lockstep. No retry is made after `max_retries` attempts,
+    if it would take the total time past `max_elapsed` seconds, or if the
+    shared `budget` has run out.
+
+    Graph API error responses are retried if they are one of the
+    `RECOVERABLE_FACEBOOK_ERRORS`, have a status in `retryable_statuses`, an
+    error code in `retryable_codes`, or are marked `is_transient`.
+
+        >>> policy = RetryPolicy(max_retries=3, base_delay=0.5, max_elapsed=20)
+        >>> g = Graph(access_token, retry_policy=policy)
+        >>> api = Api(access_token, retry_policy=policy)
+    """
+
+    def __init__(self, max_retries=5, base_delay=0.1, max_delay=10,
+                 max_elapsed=60, jitter=True, budget=default_budget,
+                 retryable_codes=RETRYABLE_ERROR_CODES,
+                 retryable_statuses=RETRYABLE_STATUSES,
+                 sleep=eventlet.sleep, clock=time.time):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_elapsed = max_elapsed
+        self.jitter = jitter
+        self.budget = budget
+        self.retryable_codes = retryable_codes
+        self.retryable_statuses = retryable_statuses
+        self.sleep = sleep
+        self.clock = clock
+
+    def __repr__(self):
+        return '<RetryPolicy(max_retries=%r) at 0x%x>' % (
+            self.max_retries, id(self))
+
+    @classmethod
+    def resolve(cls, policy, retries):
+        """
+        Return `policy`, or if there is none, a default policy allowing the
+        legacy `retries` count: with backoff, but no `max_elapsed` or shared
+        budget, so those callers retry as often as they always have.
+        """
+        if policy is None:
+            return cls(max_retries=retries or 0, max_elapsed=None, budget=None)
+        return policy
+
+    def backoff(self, attempt):
+        """Return the delay before retry number `attempt` (from zero)."""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def is_retryable(self, body, status=None):
+        """Classify an error response from Facebook."""
+        if body in RECOVERABLE_FACEBOOK_ERRORS or (
+                body and 'Sorry, something went wrong' in body):
+            return True
+        if status in self.retryable_statuses:
+            return True
+        try:
+            error = codec.loads(body)['error']
+        except (TypeError, ValueError, KeyError):
+            return False
+        if not isinstance(error, dict):
+            return False
+        return bool(error.get('is_transient') or
+                    error.get('code') in self.retryable_codes)
+
+    def start(self):
+        """Begin retrying a new request; return its `RetryState`."""
+        return RetryState(self)
+
+
+class RetryState(object):
+
+    """The retry bookkeeping for a single request."""
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.attempt = 0
+        self.started_at = policy.clock()
+
+    def retry(self):
+        """
+        Wait before another attempt and return True, or return False if the
+        request should not be retried again.
+        """
+        policy = self.policy
+        if self.attempt >= policy.max_retries:
+            return False
+        delay = policy.backoff(self.attempt)
+        elapsed = policy.clock() - self.started_at
+        if policy.max_elapsed is not None and elapsed + delay > policy.max_elapsed:
+            return False
+        if policy.budget is not None and not policy.budget.acquire():
+            return False
+        if delay:
+            policy.sleep(delay)
+        self.attempt += 1
+        return True
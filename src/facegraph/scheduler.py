@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+import collections
+import heapq
+import itertools
+import time
+
+import eventlet
+import eventlet.event
+
+__all__ = ['Scheduler', 'QueueFull']
+
+
+class QueueFull(Exception):
+
+    """Raised instead of queueing a request behind too many others."""
+
+    def __init__(self, key, waiting):
+        Exception.__init__(self)
+        self.key = key
+        self.waiting = waiting
+
+    def __str__(self):
+        return '%d requests already waiting for %r' % (self.waiting, self.key)
+
+
+class _Tenant(object):
+
+    """The queue, limits and share of one tenant of a `Scheduler`."""
+
+    __slots__ = ('key', 'weight', 'concurrency', 'rate', 'burst', 'waiting',
+                 'active', 'tokens', 'refilled_at', 'finish', 'entry')
+
+    def __init__(self, key, weight, concurrency, rate, burst, now):
+        self.key = key
+        self.weight = weight
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, rate or 1)
+        self.waiting = collections.deque()
+        self.active = 0
+        self.tokens = self.burst
+        self.refilled_at = now
+        # Virtual time at which this tenant's last request was served; the
+        # tenant furthest behind goes next.
+        self.finish = 0.0
+        # Its place in the scheduler's heap, if it has one.
+        self.entry = None
+
+    def __repr__(self):
+        return '<_Tenant(%r, active=%d, waiting=%d)>' % (
+            self.key, self.active, len(self.waiting))
+
+    def wait_for_rate(self, now):
+        """Return how long until the rate limit allows a request (0 if now)."""
+        if self.rate is None:
+            return 0
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def idle(self):
+        return not self.active and not self.waiting
+
+    def full_at(self):
+        """Return when the rate limit will have refilled to `burst`."""
+        if self.rate is None:
+            return self.refilled_at
+        return self.refilled_at + float(self.burst - self.tokens) / self.rate
+
+
+class Scheduler(object):
+
+    """
+    Shares the connections of many tenants' requests out fairly.
+
+    Requests are queued per tenant, by default each access token. At most
+    `concurrency` requests run at once in all; each tenant may have at most
+    `tenant_concurrency` of them, and make up to `rate` requests a second
+    (with bursts of `burst`). When requests are waiting, tenants take turns
+    in proportion to their weights (round-robin if they are all equal), so a
+    tenant with a thousand requests queued does not hold up one with one.
+
+        >>> scheduler = Scheduler(concurrency=50, tenant_concurrency=4, rate=10)
+        >>> scheduler.configure(vip_page_token, weight=4, rate=40)
+        >>> g = Graph(page_token, scheduler=scheduler)
+
+    Pass the same scheduler to every `Graph`: their calls are unchanged, but
+    each request (with its retries) waits for its turn. `key` maps access
+    tokens to tenants, to e.g. share limits between an app's tokens. Set
+    `max_waiting` to raise `QueueFull` rather than queue a request behind so
+    many others of its tenant. Waiting is done with eventlet, so callers
+    must be greenthreads of one hub.
+    """
+
+    def __init__(self, concurrency=50, tenant_concurrency=4, rate=None,
+                 burst=None, weight=1, max_waiting=None, key=None,
+                 clock=time.time):
+        self.concurrency = concurrency
+        self.tenant_concurrency = tenant_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.weight = weight
+        self.max_waiting = max_waiting
+        self.key = key
+        self.clock = clock
+        self.active = 0
+        self.requests = 0
+        self.queued = 0
+        self.tenants = {}
+        self._options = {}
+        # Tenants with requests waiting, as (finish, seq, tenant) entries.
+        # Entries are not removed when they go stale, but skipped: a tenant
+        # whose entry is no longer its `entry` has been served, or given up.
+        self._ready = []
+        self._seq = itertools.count()
+        self._waiting = 0
+        # Idle tenants kept until their rate limit has refilled, as
+        # (full_at, key) entries.
+        self._idle = []
+        self._vtime = 0.0
+        self._timer = None
+        self._timer_at = None
+
+    def __repr__(self):
+        return '<Scheduler(%d active, %d waiting) at 0x%x>' % (
+            self.active, self._waiting, id(self))
+
+    def configure(self, key, weight=None, concurrency=None, rate=None,
+                  burst=None):
+        """Override the limits and weight of the tenant `key`."""
+        options = self._options.setdefault(key, {})
+        for name, value in (('weight', weight), ('concurrency', concurrency),
+                            ('rate', rate), ('burst', burst)):
+            if value is not None:
+                options[name] = value
+        tenant = self.tenants.get(key)
+        if tenant is not None:
+            for name, value in options.iteritems():
+                setattr(tenant, name, value)
+            if tenant.waiting and tenant.entry is None:
+                self._push(tenant)
+                self._dispatch()
+
+    def _tenant(self, key):
+        tenant = self.tenants.get(key)
+        if tenant is None:
+            options = self._options.get(key, {})
+            tenant = self.tenants[key] = _Tenant(
+                key, options.get('weight', self.weight),
+                options.get('concurrency', self.tenant_concurrency),
+                options.get('rate', self.rate),
+                options.get('burst', self.burst), self.clock())
+        return tenant
+
+    def run(self, token, func, *args, **kwargs):
+        """Return `func(*args, **kwargs)`, once it is `token`'s turn."""
+        key = self.key(token) if self.key is not None else token
+        tenant = self._tenant(key)
+        if not self._waiting and self._can_start(tenant, self.clock()) == 0:
+            # Nobody is waiting: go straight ahead.
+            self._start(tenant)
+        else:
+            self._wait(tenant)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._finish(tenant)
+
+    def _wait(self, tenant):
+        if self.max_waiting is not None and len(tenant.waiting) >= self.max_waiting:
+            raise QueueFull(tenant.key, len(tenant.waiting))
+        self.queued += 1
+        self._waiting += 1
+        turn = eventlet.event.Event()
+        tenant.waiting.append(turn)
+        if len(tenant.waiting) == 1:
+            # Tenants coming back from idle do not get credit for it.
+            tenant.finish = max(tenant.finish, self._vtime)
+            self._push(tenant)
+        self._dispatch()
+        try:
+            turn.wait()
+        except BaseException:
+            # Killed while waiting: give up our place, or our turn.
+            if turn.ready():
+                self._finish(tenant)
+            else:
+                tenant.waiting.remove(turn)
+                self._waiting -= 1
+                if not tenant.waiting:
+                    tenant.entry = None
+                self._forget(tenant)
+            raise
+
+    def _can_start(self, tenant, now):
+        """
+        Return 0 if `tenant` may start a request now, None if it must wait
+        for a request to finish, or how long its rate limit has it wait.
+        """
+        if self.active >= self.concurrency or tenant.active >= tenant.concurrency:
+            return None
+        return tenant.wait_for_rate(now)
+
+    def _start(self, tenant):
+        self.active += 1
+        self.requests += 1
+        tenant.active += 1
+        if tenant.rate is not None:
+            tenant.tokens -= 1
+        tenant.finish = max(tenant.finish, self._vtime)
+        self._vtime = tenant.finish
+        tenant.finish += 1.0 / tenant.weight
+
+    def _finish(self, tenant):
+        self.active -= 1
+        tenant.active -= 1
+        if tenant.waiting and tenant.entry is None:
+            # It was set aside at its concurrency limit: back in line.
+            self._push(tenant)
+        self._dispatch()
+        self._forget(tenant)
+
+    def _forget(self, tenant):
+        """
+        Drop `tenant` once it is idle, unless it was configured: those whose
+        rate limit has yet to refill are kept until it has, so that requests
+        made one after another are limited too.
+        """
+        if tenant.idle() and tenant.key not in self._options:
+            now = self.clock()
+            full_at = tenant.full_at()
+            if full_at <= now:
+                self.tenants.pop(tenant.key, None)
+            else:
+                heapq.heappush(self._idle, (full_at, tenant.key))
+            self._expire(now)
+
+    def _expire(self, now):
+        while self._idle and self._idle[0][0] <= now:
+            full_at, key = heapq.heappop(self._idle)
+            tenant = self.tenants.get(key)
+            if (tenant is not None and tenant.idle() and
+                    key not in self._options and tenant.full_at() <= now):
+                del self.tenants[key]
+
+    def _push(self, tenant):
+        tenant.entry = (tenant.finish, next(self._seq), tenant)
+        heapq.heappush(self._ready, tenant.entry)
+
+    def _dispatch(self):
+        """Start waiting requests while there is room, fairest first."""
+        now = self.clock()
+        limited = []
+        retry_in = None
+        while self._ready and self.active < self.concurrency:
+            entry = heapq.heappop(self._ready)
+            tenant = entry[2]
+            if tenant.entry is not entry:
+                continue
+            wait = self._can_start(tenant, now)
+            if wait is None:
+                # At its concurrency limit: `_finish` puts it back.
+                tenant.entry = None
+                continue
+            if wait:
+                limited.append(entry)
+                retry_in = wait if retry_in is None else min(retry_in, wait)
+                continue
+            self._start(tenant)
+            turn = tenant.waiting.popleft()
+            self._waiting -= 1
+            if tenant.waiting:
+                self._push(tenant)
+            else:
+                tenant.entry = None
+            turn.send()
+        for entry in limited:
+            heapq.heappush(self._ready, entry)
+        if retry_in is not None:
+            self._wake_at(now + retry_in)
+
+    def _wake_at(self, when):
+        """Dispatch again at `when`, once a rate limit allows a request."""
+        if self._timer is not None:
+            if self._timer_at <= when:
+                return
+            self._timer.cancel()
+        self._timer_at = when
+        self._timer = eventlet.spawn_after(max(0, when - self.clock()),
+                                           self._wake)
+
+    def _wake(self):
+        self._timer = self._timer_at = None
+        self._dispatch()
+
+    def stats(self):
+        """
+        Return the number of requests made and of those which had to wait,
+        and the requests active and waiting for each busy tenant.
+        """
+        return {'requests': self.requests,
+                'queued': self.queued,
+                'active': self.active,
+                'tenants': dict((key, {'active': tenant.active,
+                                       'waiting': len(tenant.waiting)})
+                                for key, tenant in self.tenants.items()
+                                if not tenant.idle())}
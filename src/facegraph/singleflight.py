@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import sys
+
+import eventlet.event
+
+__all__ = ['SingleFlight']
+
+# Sent to the callers waiting on a call which never finished.
+_ABANDONED = object()
+
+
+class SingleFlight(object):
+
+    """
+    Lets concurrent identical requests share one call.
+
+    While a call for a key is in flight, further calls for the same key wait
+    for it and get its result, or have its exception raised, instead of
+    making their own; if it is killed or times out instead, one of them
+    makes the call again. Once it has finished the next call starts afresh, so
+    nothing is remembered: pair it with a `ResponseCache` for that.
+
+        >>> flights = SingleFlight()
+        >>> g = Graph(access_token, single_flight=flights)
+        >>> pending = [pool.spawn(g[post_id].call_fb) for i in range(100)]
+        >>> flights.stats()  # One request to Facebook, shared 99 times
+        {'calls': 1, 'shared': 99}
+
+    `Graph` keys reads on the final request URL, access token included, so
+    only requests which would get the same response are shared. Waiting
+    is done with eventlet, so callers must be greenthreads of one hub.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._flights = {}
+
+    def __repr__(self):
+        return '<SingleFlight(%d in flight) at 0x%x>' % (
+            len(self._flights), id(self))
+
+    def __len__(self):
+        return len(self._flights)
+
+    def do(self, key, func, *args, **kwargs):
+        """Return `func(*args, **kwargs)`, or the result of one in flight."""
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                break
+            self.shared += 1
+            result = flight.wait()
+            if result is not _ABANDONED:
+                return result
+            self.shared -= 1
+            # The call was killed or timed out rather than failing: that is
+            # not an answer, so make it again (one of us will lead).
+
+        flight = self._flights[key] = eventlet.event.Event()
+        self.calls += 1
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            exc_info = sys.exc_info()
+            del self._flights[key]
+            flight.send_exception(*exc_info)
+            raise exc_info[0], exc_info[1], exc_info[2]
+        except BaseException:
+            del self._flights[key]
+            flight.send(_ABANDONED)
+            raise
+        del self._flights[key]
+        flight.send(result)
+        return result
+
+    def stats(self):
+        return {'calls': self.calls, 'shared': self.shared}
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import codecs
+
+import simplejson as json
+from simplejson.decoder import JSONDecodeError
+
+__all__ = ['JSONStream', 'CHUNK_SIZE']
+
+# How much of a response is read from the socket at a time.
+CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = u' \t\n\r'
+DELIMITERS = u',:]}'
+
+_decoder = json.JSONDecoder()
+
+
+class JSONStream(object):
+
+    """
+    Decode a JSON object incrementally, yielding the items of one of its
+    array members (`data` by default) as they are parsed.
+
+        >>> stream = JSONStream(response.iter_content(CHUNK_SIZE))
+        >>> for item in stream:
+        ...     print item['id']
+        >>> stream.rest
+        {u'paging': {...}}
+
+    Only the chunk being parsed and the item being decoded are held in
+    memory. The object's other members are decoded whole, and are available
+    as `rest` once iteration has finished (those before the array already
+    are while its items are yielded); if the document is not an object (or
+    has no such array), `rest` is the whole decoded document. A stream can
+    only be iterated once.
+    """
+
+    def __init__(self, chunks, key='data', encoding='utf-8'):
+        self.key = key
+        self.rest = None
+        self.count = 0
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder(encoding)().decode
+        self._buffer = u''
+        self._pos = 0
+        self._eof = False
+
+    def __repr__(self):
+        return '<JSONStream(%r, %d items) at 0x%x>' % (
+            self.key, self.count, id(self))
+
+    def close(self):
+        """Stop reading, releasing the underlying response if possible."""
+        close = getattr(self._chunks, 'close', None)
+        if close is not None:
+            close()
+
+    def __iter__(self):
+        try:
+            if self._peek() != u'{':
+                self.rest = self._value()
+                return
+            self._pos += 1
+            rest = self.rest = {}
+            if self._peek() == u'}':
+                self._pos += 1
+            else:
+                while True:
+                    key = self._value()
+                    self._expect(u':')
+                    if key == self.key and self._peek() == u'[':
+                        for item in self._array():
+                            yield item
+                    else:
+                        rest[key] = self._value()
+                    if self._expect(u',}') == u'}':
+                        break
+        finally:
+            self.close()
+
+    def _array(self):
+        self._pos += 1
+        if self._peek() == u']':
+            self._pos += 1
+            return
+        while True:
+            item = self._value()
+            self.count += 1
+            yield item
+            if self._expect(u',]') == u']':
+                return
+
+    def _more(self):
+        """Read another chunk into the buffer; return False at the end."""
+        if self._eof:
+            return False
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self._buffer += self._decode(chunk)
+                return True
+        self._buffer += self._decode('', True)
+        self._eof = True
+        return False
+
+    def _peek(self):
+        """Skip whitespace; return the next character, or None at the end."""
+        while True:
+            buffer, pos = self._buffer, self._pos
+            while pos < len(buffer) and buffer[pos] in WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self._more():
+                return None
+
+    def _expect(self, chars):
+        char = self._peek()
+        if char is None or char not in chars:
+            raise JSONDecodeError('Expecting %s' % ' or '.join(
+                repr(str(c)) for c in chars), self._buffer, self._pos)
+        self._pos += 1
+        return char
+
+    def _value(self):
+        if self._peek() is None:
+            raise JSONDecodeError('Expecting value', self._buffer, self._pos)
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except JSONDecodeError:
+                # Most likely the value runs on into the next chunk.
+                if not self._more():
+                    raise
+                continue
+            # Values are followed by a delimiter. Until there is one, a number
+            # may have been cut short (`1.5` of `1.5e3`) by the chunk's end.
+            buffer, pos = self._buffer, end
+            while pos < len(buffer) and buffer[pos] in WHITESPACE:
+                pos += 1
+            if (pos == len(buffer) or buffer[pos] not in DELIMITERS) and \
+                    self._more():
+                continue
+            self._pos = end
+            return value
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import eventlet
+import eventlet.corolocal
+from eventlet.green import socket
+
+__all__ = ['Transport', 'DNSCache', 'LazySession', 'default_transport',
+           'default_session', 'pop_connect_time', 'POOL_SIZE']
+
+# Connections kept per host, and hosts kept, by default.
+POOL_SIZE = 500
+
+_import_lock = threading.Lock()
+
+
+class PatchedModule(object):
+
+    """
+    A module imported with eventlet's green sockets, the first time one of
+    its attributes is used.
+
+    Importing `requests` this way is slow, and many processes importing
+    facegraph never make a request.
+    """
+
+    def __init__(self, name):
+        self.__name = name
+        self.__module = None
+
+    def __repr__(self):
+        return '<PatchedModule(%r)>' % self.__name
+
+    def __getattr__(self, attr):
+        module = self.__module
+        if module is None:
+            with _import_lock:
+                module = self.__module
+                if module is None:
+                    module = self.__module = eventlet.import_patched(self.__name)
+        return getattr(module, attr)
+
+requests = PatchedModule('requests.__init__')
+requests_adapters = PatchedModule('requests.adapters')
+
+# Time each greenthread has spent opening connections; see `pop_connect_time`.
+_connect_times = eventlet.corolocal.local()
+
+
+def pop_connect_time():
+    """
+    Return the seconds the current greenthread has spent opening connections
+    through a `Transport` since the last call, and start counting afresh.
+    """
+    seconds = getattr(_connect_times, 'seconds', 0.0)
+    _connect_times.seconds = 0.0
+    return seconds
+
+
+def timed_connection_class(base):
+    """Return a subclass of the connection class `base` timing `connect()`."""
+
+    class TimedConnection(base):
+        def connect(self):
+            started = time.time()
+            try:
+                return base.connect(self)
+            finally:
+                _connect_times.seconds = (getattr(_connect_times, 'seconds', 0.0) +
+                                          time.time() - started)
+
+    TimedConnection.__name__ = 'Timed' + base.__name__
+    return TimedConnection
+
+
+class DNSCache(object):
+
+    """
+    Remembers hostname lookups for `ttl` seconds.
+
+    Connections are pooled, so hosts are only looked up when a new connection
+    is made; under load, with a pool churning, that can still be often.
+    """
+
+    def __init__(self, ttl=300, clock=time.time):
+        self.ttl = ttl
+        self.clock = clock
+        self._addresses = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<DNSCache(%d hosts) at 0x%x>' % (len(self._addresses), id(self))
+
+    def resolve(self, host, port):
+        """Return an address for `host`, looking it up if need be."""
+        now = self.clock()
+        entry = self._addresses.get((host, port))
+        if entry is not None and entry[1] > now:
+            return entry[0]
+        address = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0][4][0]
+        with self._lock:
+            self._addresses[(host, port)] = (address, now + self.ttl)
+        return address
+
+    def clear(self):
+        with self._lock:
+            self._addresses.clear()
+
+    def connection_class(self, base):
+        """Return a subclass of the connection class `base` using this cache."""
+        cache = self
+
+        class CachedDNSConnection(base):
+            def _new_conn(self):
+                # Connect to the cached address; TLS still checks `host`.
+                host = self.host
+                self.host = cache.resolve(host, self.port)
+                try:
+                    return base._new_conn(self)
+                finally:
+                    self.host = host
+
+        CachedDNSConnection.__name__ = 'CachedDNS' + base.__name__
+        return CachedDNSConnection
+
+
+def _hyper_contrib():
+    try:
+        return eventlet.import_patched('hyper.contrib')
+    except ImportError:
+        raise ImportError('HTTP/2 needs the hyper package: '
+                          'pip install pyfacegraph[http2]')
+
+
+class Transport(object):
+
+    """
+    How `Graph`, `FQL` and `Api` make HTTP requests: a `requests` session,
+    with its connection pools.
+
+        >>> transport = Transport(pool_maxsize=50, dns_cache_ttl=300)
+        >>> g = Graph(access_token, transport=transport)
+        >>> q = FQL(access_token, transport=transport)
+
+    Each transport has pools of its own, so give each tenant one to keep them
+    apart, or share one to share connections. Up to `pool_connections` hosts
+    are kept `pool_maxsize` connections each; with `pool_block`, requests
+    wait for a free connection rather than opening extra, unpooled ones.
+    `keep_alive=False` closes connections after each request. Lookups are
+    cached for `dns_cache_ttl` seconds if given.
+
+    With `http2=True` HTTPS requests are multiplexed over HTTP/2, so many
+    concurrent requests share a few connections; this needs the `hyper`
+    package (`pip install pyfacegraph[http2]`), and replaces the HTTPS
+    connection pool and DNS cache.
+
+    The session, and `requests` itself, are only created once `session` is
+    first used.
+    """
+
+    def __init__(self, pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE,
+                 pool_block=False, keep_alive=True, dns_cache_ttl=None,
+                 http2=False):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.dns_cache = DNSCache(dns_cache_ttl) if dns_cache_ttl else None
+        self.http2 = http2
+        # Fail now, rather than at the first request, if hyper is missing.
+        self._hyper_contrib = _hyper_contrib() if http2 else None
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        session = self._session
+        if session is None:
+            with self._lock:
+                session = self._session
+                if session is None:
+                    session = self._session = self._make_session()
+        return session
+
+    def _make_session(self):
+        from facegraph.adapters import DNSCachingAdapter, TimingAdapter
+
+        session = requests.Session()
+        session.headers['Accept-encoding'] = 'gzip'
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        for prefix in ('http://', 'https://'):
+            kwargs = {'pool_connections': self.pool_connections,
+                      'pool_maxsize': self.pool_maxsize,
+                      'pool_block': self.pool_block}
+            if self.dns_cache is not None:
+                adapter = DNSCachingAdapter(self.dns_cache, **kwargs)
+            else:
+                adapter = TimingAdapter(**kwargs)
+            session.mount(prefix, adapter)
+        if self.http2:
+            session.mount('https://', self._hyper_contrib.HTTP20Adapter())
+        return session
+
+    def __repr__(self):
+        return '<Transport(http2=%r) at 0x%x>' % (self.http2, id(self))
+
+    def get(self, url, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.session.post(url, **kwargs)
+
+    def close(self):
+        """Close every pooled connection."""
+        if self._session is not None:
+            self._session.close()
+
+
+class LazySession(object):
+
+    """
+    Stands in for the session of `transport`, which is only created when one
+    of its attributes is first used.
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    def __repr__(self):
+        return '<LazySession(%r)>' % (self.transport,)
+
+    def __getattr__(self, attr):
+        return getattr(self.transport.session, attr)
+
+
+default_transport = Transport()
+
+# What `Graph` and `FQL` use when they have no `transport` of their own.
+default_session = LazySession(default_transport)
@@ -1,3 +1,4 @@
+import re
 import urllib
 import urlparse
 
@@ -9,17 +10,42 @@ def get_host(url):
     scheme, host, path, query, fragment = urlparse.urlsplit(url)
     return host
 
+_version_re = re.compile(r'^v\d+\.\d+$')
+_id_re = re.compile(r'^\d+(_\d+)*$')
+
+# Top-level Graph API paths that are not nodes.
+NON_NODE_ROOTS = frozenset(['method', 'oauth', 'fql', 'search', 'debug_token'])
+
+def path_template(path):
+    """Normalize a Graph API path, replacing object ids with `{id}`, so
+    that e.g. '/v2.3/123/feed' and '/v2.3/me/feed' both give '/{id}/feed'.
+
+    The first component (after any API version) is taken to be a node,
+    unless it is one of NON_NODE_ROOTS. Later components are replaced if
+    they look like ids.
+    """
+    segments = [s for s in path.split('/') if s]
+    if segments and _version_re.match(segments[0]):
+        segments = segments[1:]
+    for i, segment in enumerate(segments):
+        if _id_re.match(segment) or (i == 0 and segment not in NON_NODE_ROOTS):
+            segments[i] = '{id}'
+    return '/' + '/'.join(segments)
+
 def add_path(url, new_path):
     """Given a url and path, return a new url that combines
     the two.
     """
     scheme, host, path, query, fragment = urlparse.urlsplit(url)
+    path = join_path(path, new_path)
+    return urlparse.urlunsplit([scheme, host, path, query, fragment])
+
+def join_path(path, new_path):
+    """Append new_path to a URL path, with a single slash between them."""
     new_path = new_path.lstrip('/')
     if path.endswith('/'):
-        path += new_path
-    else:
-        path += '/' + new_path
-    return urlparse.urlunsplit([scheme, host, path, query, fragment])
+        return path + new_path
+    return path + '/' + new_path
 
 def _query_param(key, value):
     """ensure that a query parameter's value is a string
@@ -39,6 +65,19 @@ def _make_query_tuples(params):
     else:
         return [_query_param(*params)]
 
+def merge_query_params(query_bits, params, update=True):
+    """Given a sequence of (key, value) pairs, as returned by
+    urlparse.parse_qsl, return a tuple of pairs including params.
+
+    If update is True, existing pairs with the same keys as params
+    are dropped.
+    """
+    new_bits = _make_query_tuples(params)
+    if update:
+        keys = set(k for (k, v) in new_bits)
+        query_bits = [(k, v) for (k, v) in query_bits if k not in keys]
+    return tuple(query_bits) + tuple(new_bits)
+
 def add_query_params(url, params):
     """use the _update_query_params function to set a new query
     string for the url based on params.
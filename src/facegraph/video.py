@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import urlparse
+
+from facegraph.graph import GraphException
+from facegraph.multipart import FilePart, _file_size
+from facegraph.retry import RetryPolicy
+
+__all__ = ['ResumableVideoUpload', 'VIDEO_HOST']
+
+# Video uploads go to their own host.
+VIDEO_HOST = 'graph-video.facebook.com'
+
+
+class ResumableVideoUpload(object):
+
+    """
+    Upload a large video in chunks, with Facebook's resumable upload protocol.
+
+        >>> upload = ResumableVideoUpload(g[page_id].videos, open('talk.mp4', 'rb'))
+        >>> upload.run(title='Talk', description='...')
+        Node({'success': True})
+        >>> upload.video_id
+        '10153...'
+
+    The upload is started (`upload_phase=start`), the file is sent a chunk at
+    a time as Facebook asks for them (`transfer`), and the video is published
+    (`finish`, with any extra parameters, e.g. `title`). Each chunk is read
+    from the file as it is sent, so only one is in memory at a time.
+
+    A chunk which fails is sent again under the graph's retry policy. If it
+    still fails, `session_id`, `video_id`, `start_offset` and `end_offset`
+    say where the upload got to; pass them to a new `ResumableVideoUpload`
+    for the same file, and `run()` carries on from there.
+    """
+
+    def __init__(self, graph, file, session_id=None, video_id=None,
+                 start_offset=0, end_offset=None):
+        scheme, host, path, query, fragment = urlparse.urlsplit(graph.url)
+        if host == urlparse.urlsplit(graph.API_ROOT).netloc:
+            graph = graph.copy(url=urlparse.urlunsplit(
+                (scheme, VIDEO_HOST, path, query, fragment)))
+        if session_id is not None and end_offset is None:
+            raise ValueError('Resuming an upload needs its end_offset')
+        self.graph = graph
+        self.file = file
+        self.file_size = _file_size(file)
+        self.session_id = session_id
+        self.video_id = video_id
+        self.start_offset = start_offset
+        self.end_offset = end_offset
+
+    def __repr__(self):
+        return '<ResumableVideoUpload(%r, %s/%d) at 0x%x>' % (
+            self.graph.url, self.start_offset, self.file_size, id(self))
+
+    @property
+    def done(self):
+        """Whether every chunk has been sent."""
+        return (self.session_id is not None and
+                self.start_offset >= self.end_offset)
+
+    def start(self):
+        data = self.graph._post_mime('upload_video', upload_phase='start',
+                                     file_size=str(self.file_size))
+        self.session_id = data['upload_session_id']
+        self.video_id = data.get('video_id')
+        self._update(data)
+        return data
+
+    def transfer(self):
+        """Send the next chunk; return whether there are more to send."""
+        chunk = FilePart(self.file, filename='chunk', offset=self.start_offset,
+                         length=self.end_offset - self.start_offset)
+        retry = RetryPolicy.resolve(self.graph.retry_policy,
+                                    self.graph.retries).start()
+        while True:
+            try:
+                data = self.graph._post_mime(
+                    'upload_video', upload_phase='transfer',
+                    upload_session_id=self.session_id,
+                    start_offset=str(self.start_offset),
+                    video_file_chunk=chunk)
+                break
+            except GraphException:
+                if not retry.retry():
+                    raise
+        self._update(data)
+        return not self.done
+
+    def finish(self, **params):
+        return self.graph._post_mime('upload_video', upload_phase='finish',
+                                     upload_session_id=self.session_id,
+                                     **params)
+
+    def run(self, **params):
+        """Upload the whole file and publish it; return Facebook's response."""
+        if self.session_id is None:
+            self.start()
+        while not self.done:
+            self.transfer()
+        return self.finish(**params)
+
+    def _update(self, data):
+        self.start_offset = int(data['start_offset'])
+        self.end_offset = int(data['end_offset'])
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+import collections
+import hashlib
+import hmac
+import logging
+
+import eventlet
+
+from facegraph.api import hmac_hexdigest
+from facegraph.batch import BATCH_SIZE
+from facegraph.streaming import CHUNK_SIZE, JSONStream
+
+__all__ = ['WebhookPipeline', 'Change', 'InvalidSignature', 'iter_changes',
+           'verify_signature', 'verify_subscription', 'sign',
+           'SIGNATURE_HEADER', 'SIGNATURE_256_HEADER']
+
+log = logging.getLogger('pyfacegraph')
+
+SIGNATURE_HEADER = 'X-Hub-Signature'
+SIGNATURE_256_HEADER = 'X-Hub-Signature-256'
+
+ALGORITHMS = {'sha1': hashlib.sha1, 'sha256': hashlib.sha256}
+
+# The members of a change's value which hold the id of the changed object,
+# most specific first.
+OBJECT_ID_KEYS = ('comment_id', 'post_id', 'photo_id', 'video_id',
+                  'event_id', 'album_id', 'share_id', 'id')
+
+
+class InvalidSignature(ValueError):
+    pass
+
+
+def sign(app_secret, body, algorithm='sha1'):
+    """Return the signature header value Facebook would send with `body`."""
+    return '%s=%s' % (algorithm,
+                      hmac_hexdigest(app_secret, body, ALGORITHMS[algorithm]))
+
+
+def verify_signature(app_secret, body, signature):
+    """
+    Check the value of an `X-Hub-Signature` (or `X-Hub-Signature-256`)
+    header against the raw request `body`; raise `InvalidSignature` unless
+    it was signed with `app_secret`.
+    """
+    if not signature or '=' not in signature:
+        raise InvalidSignature('Missing or malformed signature %r' % (signature,))
+    algorithm, digest = signature.split('=', 1)
+    if algorithm not in ALGORITHMS:
+        raise InvalidSignature('Unsupported signature algorithm %r' % (algorithm,))
+    expected = hmac_hexdigest(app_secret, body, ALGORITHMS[algorithm])
+    if not hmac.compare_digest(expected, str(digest).lower()):
+        raise InvalidSignature('Signature does not match the request body')
+
+
+def verify_subscription(params, verify_token):
+    """
+    Answer the GET Facebook makes when a subscription is set up: return the
+    `hub.challenge` to respond with, or raise `ValueError` if `params` (the
+    query parameters) do not carry our `verify_token`.
+    """
+    if params.get('hub.mode') != 'subscribe':
+        raise ValueError('Not a subscription request')
+    if not hmac.compare_digest(str(params.get('hub.verify_token', '')),
+                               str(verify_token)):
+        raise ValueError('Verify token does not match')
+    return params.get('hub.challenge', '')
+
+
+class Change(object):
+
+    """
+    One changed field of one object, from a real-time update.
+
+    `object` is the type of object subscribed to ('page', 'user', ...),
+    `entry_id` the id of the subscribed object, `field` the field which
+    changed and `value` what Facebook sent about it, if anything. The id of
+    the object to fetch is `object_id`: the comment, post, etc. named in
+    `value`, or else the entry itself.
+    """
+
+    __slots__ = ('object', 'entry_id', 'field', 'time', 'value')
+
+    def __init__(self, object, entry_id, field, time=None, value=None):
+        self.object = object
+        self.entry_id = entry_id
+        self.field = field
+        self.time = time
+        self.value = value
+
+    def __repr__(self):
+        return '<Change(%s %s.%s)>' % (self.object, self.object_id, self.field)
+
+    @property
+    def object_id(self):
+        if isinstance(self.value, dict):
+            for key in OBJECT_ID_KEYS:
+                if self.value.get(key) is not None:
+                    return unicode(self.value[key])
+        return unicode(self.entry_id)
+
+    @property
+    def removed(self):
+        """Whether the object was deleted, so there is nothing to fetch."""
+        return isinstance(self.value, dict) and self.value.get('verb') == 'remove'
+
+    @property
+    def key(self):
+        """Identifies the change, to recognise it when it is redelivered."""
+        verb = self.value.get('verb') if isinstance(self.value, dict) else None
+        return (self.object, self.entry_id, self.field, self.time,
+                self.object_id, verb)
+
+
+def _chunks(body):
+    for i in xrange(0, len(body), CHUNK_SIZE):
+        yield body[i:i + CHUNK_SIZE]
+
+
+def iter_changes(body, app_secret=None, signature=None):
+    """
+    Yield the `Change`s in the body of a real-time update callback.
+
+        >>> for change in iter_changes(request.body, app_secret,
+        ...                            request.headers[SIGNATURE_HEADER]):
+        ...     print change.object_id, change.field
+
+    With an `app_secret`, the signature is verified before anything is
+    parsed. Entries are decoded one at a time as they are iterated, so a
+    large callback is never decoded whole. Both `changes` (pages and most
+    objects) and `changed_fields` (users) entries are understood.
+    """
+    if app_secret is not None:
+        verify_signature(app_secret, body, signature)
+    stream = JSONStream(_chunks(body), key='entry')
+    # Facebook sends `object` before `entry`; should it come after, the
+    # changes are held back until it has been read.
+    late = []
+    for entry in stream:
+        object = stream.rest.get('object')
+        for change in _entry_changes(object, entry):
+            if object is None:
+                late.append(change)
+            else:
+                yield change
+    for change in late:
+        change.object = stream.rest.get('object')
+        yield change
+
+
+def _entry_changes(object, entry):
+    entry_id = entry.get('id', entry.get('uid'))
+    time = entry.get('time')
+    for change in entry.get('changes', ()):
+        yield Change(object, entry_id, change.get('field'),
+                     change.get('time', time), change.get('value'))
+    for field in entry.get('changed_fields', ()):
+        yield Change(object, entry_id, field, time)
+
+
+class _Seen(object):
+
+    """The last `size` keys added, for spotting duplicates."""
+
+    def __init__(self, size):
+        self.size = size
+        self._keys = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key):
+        """Remember `key`; return False if it already was."""
+        if key in self._keys:
+            return False
+        self._keys[key] = None
+        if len(self._keys) > self.size:
+            self._keys.popitem(last=False)
+        return True
+
+
+class WebhookPipeline(object):
+
+    """
+    Turns real-time update callbacks into batched `Graph` reads.
+
+    Pass each callback's body and signature header to `receive()`; changes
+    are verified, parsed, stripped of duplicates and queued. `flush()`
+    then fetches every changed object once, however many changes it had,
+    `batch_size` ids per request, and calls `handler(object_id, data,
+    changes)` for each: `data` is the fetched object, the exception it could
+    not be fetched with, or None if it was removed.
+
+        >>> def handler(object_id, data, changes):
+        ...     if not isinstance(data, Exception):
+        ...         index(object_id, data)
+        >>> pipeline = WebhookPipeline(Graph(access_token, app_secret), handler,
+        ...                            fields={'feed': ['id', 'message']})
+        >>> pipeline.start(flush_interval=1)
+        >>> # In the callback view:
+        >>> pipeline.receive(request.body, request.headers['X-Hub-Signature'])
+
+    A burst of 10,000 updates to 10,000 objects is fetched with 200 requests
+    (and fewer when they touch the same objects), `concurrency` at a time.
+
+    `fields` gives the fields to fetch: one list for every change, or a dict
+    of them by changed field; objects with several changes get the union.
+    Signatures are checked with `app_secret`, which defaults to the graph's.
+    Up to `dedupe_size` recent changes are remembered to drop redeliveries,
+    and `receive()` starts a flush in the background once `max_pending`
+    objects are waiting. Exceptions raised by `handler` are logged.
+    """
+
+    def __init__(self, graph, handler, app_secret=None, fields=None,
+                 batch_size=BATCH_SIZE, concurrency=10, max_pending=10000,
+                 dedupe_size=100000):
+        self.graph = graph
+        self.handler = handler
+        self.app_secret = app_secret if app_secret is not None else graph.app_secret
+        if not self.app_secret:
+            raise ValueError('An app secret is needed to verify signatures')
+        self.fields = fields
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.received = 0
+        self.duplicates = 0
+        self.fetched = 0
+        self.flushes = 0
+        self._seen = _Seen(dedupe_size)
+        self._pending = collections.OrderedDict()
+        self._flusher = None
+        self._flushing = False
+
+    def __repr__(self):
+        return '<WebhookPipeline(%d pending) at 0x%x>' % (
+            len(self._pending), id(self))
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _fields_for(self, change):
+        if isinstance(self.fields, dict):
+            return self.fields.get(change.field, ())
+        return self.fields or ()
+
+    def receive(self, body, signature):
+        """
+        Verify and queue the changes in a callback; return how many were new.
+        Raises `InvalidSignature`, before queueing anything, if it is forged.
+        """
+        new = 0
+        for change in iter_changes(body, self.app_secret, signature):
+            self.received += 1
+            if not self._seen.add(change.key):
+                self.duplicates += 1
+                continue
+            new += 1
+            pending = self._pending.get(change.object_id)
+            if pending is None:
+                pending = self._pending[change.object_id] = (set(), [])
+            pending[0].update(self._fields_for(change))
+            pending[1].append(change)
+        if len(self._pending) >= self.max_pending and not self._flushing:
+            # Fetching can take a while: answer the callback first.
+            self._flushing = True
+            eventlet.spawn_n(self._flush_logged)
+        return new
+
+    def flush(self):
+        """Fetch every pending object and hand it on; return how many."""
+        pending, self._pending = self._pending, collections.OrderedDict()
+        self._flushing = False
+        if not pending:
+            return 0
+        self.flushes += 1
+
+        # Objects wanting the same fields are fetched together.
+        groups = collections.OrderedDict()
+        for object_id, (fields, changes) in pending.iteritems():
+            if changes[-1].removed:
+                self._handle(object_id, None, changes)
+                continue
+            groups.setdefault(tuple(sorted(fields)), []).append(object_id)
+
+        for fields, ids in groups.iteritems():
+            results = self.graph.fetch_many(
+                ids, fields=list(fields) or None, chunk_size=self.batch_size,
+                concurrency=self.concurrency)
+            for object_id, data in results:
+                self.fetched += 1
+                self._handle(object_id, data, pending[object_id][1])
+        return len(pending)
+
+    def _handle(self, object_id, data, changes):
+        try:
+            self.handler(object_id, data, changes)
+        except Exception:
+            log.exception('Error in webhook handler %r', self.handler)
+
+    def start(self, flush_interval=1.0):
+        """Flush every `flush_interval` seconds, in a greenthread."""
+        if self._flusher is None:
+            self._flusher = eventlet.spawn(self._flush_every, flush_interval)
+
+    def stop(self):
+        """Stop flushing periodically, and flush what is pending."""
+        if self._flusher is not None:
+            self._flusher.kill()
+            self._flusher = None
+        self.flush()
+
+    def _flush_every(self, interval):
+        while True:
+            eventlet.sleep(interval)
+            self._flush_logged()
+
+    def _flush_logged(self):
+        try:
+            self.flush()
+        except Exception:
+            log.exception('Error flushing %r', self)
+
+    def stats(self):
+        return {'received': self.received, 'duplicates': self.duplicates,
+                'pending': len(self._pending), 'fetched': self.fetched,
+                'flushes': self.flushes}
@@ -0,0 +1,11 @@
+class FakeClock(object):
+    """A clock for `clock=` arguments, which only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
@@ -2,6 +2,7 @@ from unittest import TestCase
 
 from mock import Mock, patch
 
+from facegraph import api as api_module
 from facegraph.api import Api, get_appsecret_proof
 from facegraph.graph import Graph
 
@@ -20,6 +21,23 @@ class GetAppsecretProofTests(TestCase):
             get_appsecret_proof(TEST_APP_SECRET, TEST_ACCESS_TOKEN)
         )
 
+    @patch('facegraph.api._compute_appsecret_proof')
+    def test_proofs_are_memoized(self, mock_compute):
+        mock_compute.return_value = EXPECTED_APPSECRET_PROOF
+        api_module._appsecret_proofs.clear()
+        get_appsecret_proof(TEST_APP_SECRET, TEST_ACCESS_TOKEN)
+        get_appsecret_proof(TEST_APP_SECRET, TEST_ACCESS_TOKEN)
+        self.assertEqual(1, mock_compute.call_count)
+        get_appsecret_proof(TEST_APP_SECRET, 'other_token')
+        self.assertEqual(2, mock_compute.call_count)
+
+    @patch('facegraph.api.APPSECRET_PROOF_CACHE_SIZE', 2)
+    def test_memo_is_bounded(self):
+        api_module._appsecret_proofs.clear()
+        for token in ('a', 'b', 'c', 'd', 'e'):
+            get_appsecret_proof(TEST_APP_SECRET, token)
+        self.assertTrue(len(api_module._appsecret_proofs) <= 2)
+
 
 class GraphAppsecretProofNoInjectionTests(TestCase):
 
@@ -0,0 +1,73 @@
+from unittest import TestCase
+
+import eventlet
+from mock import patch
+
+from facegraph.async_graph import AsyncFQL, AsyncGraph
+from facegraph.graph import GraphException
+
+
+class AsyncGraphTests(TestCase):
+
+    def setUp(self):
+        self.graph = AsyncGraph(access_token='token', pool_size=10)
+
+    def test_urls(self):
+        self.assertEqual('https://graph.facebook.com/me/feed',
+                         self.graph.me.feed.url)
+        self.assertEqual('https://graph.facebook.com/me?fields=id',
+                         self.graph.me.fields('id').url)
+        self.assertTrue(self.graph.me.pool is self.graph.pool)
+
+    @patch('facegraph.graph.session')
+    def test_call_fb(self, mock_session):
+        mock_session.get.return_value.content = '{"id": "1"}'
+        pending = self.graph.me.call_fb(fields='id')
+        self.assertTrue(isinstance(pending, eventlet.greenthread.GreenThread))
+        self.assertEqual('1', pending.wait().id)
+        self.assertEqual(
+            'https://graph.facebook.com/me?access_token=token&fields=id',
+            mock_session.get.call_args[0][0])
+
+    @patch('facegraph.graph.session')
+    def test_post_and_delete(self, mock_session):
+        mock_session.post.return_value.content = 'true'
+        self.assertEqual(True, self.graph.me.feed.post(message='hi').wait())
+        self.assertEqual(True, self.graph['123'].delete().wait())
+        self.assertEqual(2, mock_session.post.call_count)
+
+    @patch('facegraph.graph.session')
+    def test_errors_are_raised_from_wait(self, mock_session):
+        mock_session.get.return_value.content = (
+            '{"error": {"code": 100, "message": "Bad"}}')
+        pending = self.graph.me.call_fb()
+        self.assertRaises(GraphException, pending.wait)
+
+    @patch('facegraph.graph.session')
+    def test_requests_run_concurrently(self, mock_session):
+        in_flight = []
+        peak = []
+
+        def get(url, **kwargs):
+            in_flight.append(url)
+            peak.append(len(in_flight))
+            eventlet.sleep(0.01)
+            in_flight.remove(url)
+            response = mock_session.get.return_value
+            response.content = '{}'
+            return response
+        mock_session.get.side_effect = get
+
+        pending = [self.graph[i].call_fb() for i in range(20)]
+        for p in pending:
+            p.wait()
+        self.assertEqual(10, max(peak))
+
+
+class AsyncFQLTests(TestCase):
+
+    @patch('facegraph.fql.session')
+    def test_query(self, mock_session):
+        mock_session.get.return_value.content = '[{"post_id": "1"}]'
+        q = AsyncFQL('token')
+        self.assertEqual('1', q('SELECT post_id FROM stream').wait()[0].post_id)
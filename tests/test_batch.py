@@ -0,0 +1,114 @@
+import urlparse
+from unittest import TestCase
+
+import simplejson as json
+from mock import patch
+
+from facegraph.graph import Graph, GraphException
+
+
+def _batch_items(mock_session, call=0):
+    data = mock_session.post.call_args_list[call][1]['data']
+    return json.loads(urlparse.parse_qs(data)['batch'][0])
+
+
+class GraphBatchTests(TestCase):
+
+    def setUp(self):
+        self.graph = Graph(access_token='token')
+
+    @patch('facegraph.graph.session')
+    def test_nothing_sent_until_executed(self, mock_session):
+        batch = self.graph.batch()
+        request = batch.call_fb(self.graph.me)
+        self.assertFalse(mock_session.post.called)
+        self.assertRaises(RuntimeError, request.result)
+
+    @patch('facegraph.graph.session')
+    def test_requests_are_packed(self, mock_session):
+        mock_session.post.return_value.content = json.dumps([
+            {'code': 200, 'body': '{"id": "1"}'},
+            {'code': 200, 'body': '{"id": "2"}'},
+            {'code': 200, 'body': 'true'},
+        ])
+        with self.graph.batch() as batch:
+            me = batch.call_fb(self.graph.me, fields='id')
+            comment = batch.post(self.graph['1'].comments, message='hi')
+            deleted = batch.delete(self.graph['3'])
+
+        self.assertEqual(1, mock_session.post.call_count)
+        self.assertEqual('https://graph.facebook.com/',
+                         mock_session.post.call_args[0][0])
+        self.assertEqual([
+            {'method': 'GET', 'relative_url': 'me?fields=id'},
+            {'method': 'POST', 'relative_url': '1/comments',
+             'body': 'message=hi'},
+            {'method': 'DELETE', 'relative_url': '3'},
+        ], _batch_items(mock_session))
+        self.assertEqual('1', me.result().id)
+        self.assertEqual('2', comment.result().id)
+        self.assertEqual(True, deleted.result())
+
+    @patch('facegraph.graph.session')
+    def test_custom_root(self, mock_session):
+        mock_session.post.return_value.content = json.dumps(
+            [{'code': 200, 'body': '{"id": "1"}'}])
+        graph = Graph('token', url='http://localhost:8000/')
+        with graph.batch() as batch:
+            me = batch.call_fb(graph.me)
+        self.assertEqual('http://localhost:8000/',
+                         mock_session.post.call_args[0][0])
+        self.assertEqual([{'method': 'GET', 'relative_url': 'me'}],
+                         _batch_items(mock_session))
+        self.assertEqual('1', me.result().id)
+
+    @patch('facegraph.graph.session')
+    def test_chunks_of_fifty(self, mock_session):
+        mock_session.post.return_value.content = json.dumps(
+            [{'code': 200, 'body': '{}'}] * 50)
+        with self.graph.batch() as batch:
+            for i in range(120):
+                batch.call_fb(self.graph[i])
+        self.assertEqual(3, mock_session.post.call_count)
+        self.assertEqual(50, len(_batch_items(mock_session, 0)))
+        self.assertEqual(20, len(_batch_items(mock_session, 2)))
+
+    @patch('facegraph.graph.session')
+    def test_errors_are_per_request(self, mock_session):
+        error = {'error': {'code': 100, 'message': 'Unsupported get request'}}
+        mock_session.post.return_value.content = json.dumps([
+            {'code': 200, 'body': '{"id": "1"}'},
+            {'code': 400, 'body': json.dumps(error)},
+            None,
+        ])
+        with self.graph.batch() as batch:
+            ok = batch.call_fb(self.graph['1'])
+            bad = batch.call_fb(self.graph['2'])
+            timed_out = batch.call_fb(self.graph['3'])
+
+        self.assertEqual('1', ok.result().id)
+        with self.assertRaises(GraphException) as cm:
+            bad.result()
+        self.assertEqual(100, cm.exception.code)
+        self.assertRaises(GraphException, timed_out.result)
+
+    @patch('facegraph.graph.session')
+    def test_other_tokens_are_sent_per_request(self, mock_session):
+        mock_session.post.return_value.content = '[{"code": 200, "body": "{}"}]'
+        other = Graph(access_token='other')
+        with self.graph.batch() as batch:
+            batch.call_fb(other.me)
+        self.assertEqual('me?access_token=other',
+                         _batch_items(mock_session)[0]['relative_url'])
+
+    @patch('facegraph.graph.session')
+    def test_batch_level_error_fails_every_request(self, mock_session):
+        mock_session.post.return_value.content = json.dumps(
+            {'error': {'code': 190, 'message': 'Invalid OAuth access token.'}})
+        with self.graph.batch() as batch:
+            requests = [batch.call_fb(self.graph[i]) for i in range(2)]
+        for request in requests:
+            self.assertRaises(GraphException, request.result)
+
+    def test_batch_size_is_bounded(self):
+        self.assertRaises(ValueError, self.graph.batch, batch_size=51)
@@ -0,0 +1,155 @@
+from unittest import TestCase
+
+import simplejson as json
+from mock import Mock, patch
+
+from facegraph.cache import (CacheBackend, ETagCache, LocalCacheBackend,
+                             ResponseCache)
+from facegraph.graph import Graph
+
+from tests.helpers import FakeClock
+
+
+class SharedBackend(CacheBackend):
+    """Stands in for memcached: values only survive as JSON."""
+
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        value = self.store.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.store[key] = json.dumps(value)
+
+    def delete(self, key):
+        self.store.pop(key, None)
+
+    def clear(self):
+        self.store.clear()
+
+
+class LocalCacheBackendTests(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.backend = LocalCacheBackend(maxsize=2, clock=self.clock)
+
+    def test_expiry(self):
+        self.backend.set('a', 1, 10)
+        self.assertEqual(1, self.backend.get('a'))
+        self.clock.now += 10
+        self.assertEqual(None, self.backend.get('a'))
+
+    def test_lru_eviction(self):
+        self.backend.set('a', 1, 10)
+        self.backend.set('b', 2, 10)
+        self.backend.get('a')
+        self.backend.set('c', 3, 10)
+        self.assertEqual(2, len(self.backend))
+        self.assertEqual(None, self.backend.get('b'))
+        self.assertEqual(1, self.backend.get('a'))
+        self.assertEqual(3, self.backend.get('c'))
+
+
+class ResponseCacheTests(TestCase):
+
+    def test_key_is_normalized(self):
+        cache = ResponseCache()
+        self.assertEqual(cache.key('https://Graph.facebook.com/me?b=2&a=1'),
+                         cache.key('https://graph.facebook.com/me?a=1&b=2'))
+
+    def test_token_agnostic_key(self):
+        url = 'https://graph.facebook.com/me?access_token=%s&appsecret_proof=%s'
+        cache = ResponseCache()
+        self.assertNotEqual(cache.key(url % ('a', 'x')), cache.key(url % ('b', 'y')))
+        cache = ResponseCache(token_agnostic=True)
+        self.assertEqual(cache.key(url % ('a', 'x')), cache.key(url % ('b', 'y')))
+
+    def test_ttl_rules(self):
+        cache = ResponseCache(ttl=60, ttl_rules=[(r'/feed$', 5), (r'^/me$', 0)])
+        self.assertEqual(5, cache.ttl_for('https://graph.facebook.com/1/feed?limit=2'))
+        self.assertEqual(60, cache.ttl_for('https://graph.facebook.com/1'))
+        cache.set('https://graph.facebook.com/me', {'id': '1'})
+        self.assertEqual(None, cache.get('https://graph.facebook.com/me'))
+
+    def test_errors_are_not_cached(self):
+        cache = ResponseCache()
+        cache.set('https://graph.facebook.com/me', {'error': {'code': 1}})
+        self.assertEqual(None, cache.get('https://graph.facebook.com/me'))
+
+
+class GraphCacheTests(TestCase):
+
+    @patch('facegraph.graph.session')
+    def test_call_fb_uses_cache(self, mock_session):
+        mock_session.get.return_value.content = '{"id": "1"}'
+        cache = ResponseCache()
+        graph = Graph(access_token='token', cache=cache)
+        self.assertEqual('1', graph.me.call_fb().id)
+        self.assertEqual('1', graph.me.call_fb().id)
+        self.assertEqual(1, mock_session.get.call_count)
+        self.assertEqual({'hits': 1, 'misses': 1, 'hit_rate': 0.5}, cache.stats())
+
+    @patch('facegraph.graph.session')
+    def test_cached_nodes_are_independent(self, mock_session):
+        mock_session.get.return_value.content = '{"from": {"id": "1"}}'
+        graph = Graph(cache=ResponseCache())
+        graph.me.call_fb()['from'].id = 'changed'
+        self.assertEqual('1', graph.me.call_fb()['from'].id)
+
+    @patch('facegraph.graph.session')
+    def test_shared_backend(self, mock_session):
+        mock_session.get.return_value.content = '{"id": "1"}'
+        backend = SharedBackend()
+        first = Graph(access_token='a', cache=ResponseCache(backend, token_agnostic=True))
+        second = Graph(access_token='b', cache=ResponseCache(backend, token_agnostic=True))
+        first.me.call_fb()
+        self.assertEqual('1', second.me.call_fb().id)
+        self.assertEqual(1, mock_session.get.call_count)
+
+
+class GraphETagTests(TestCase):
+
+    def _response(self, status, content='', etag=None):
+        response = Mock()
+        response.status_code = status
+        response.content = content
+        response.headers = {'ETag': etag} if etag else {}
+        return response
+
+    @patch('facegraph.graph.session')
+    def test_revalidates_with_etag(self, mock_session):
+        mock_session.get.side_effect = [
+            self._response(200, '{"id": "1"}', etag='"abc"'),
+            self._response(304),
+        ]
+        etags = ETagCache()
+        graph = Graph(etags=etags)
+        self.assertEqual('1', graph.me.call_fb().id)
+        self.assertEqual('1', graph.me.call_fb().id)
+
+        first, second = mock_session.get.call_args_list
+        self.assertEqual((('https://graph.facebook.com/me',), {}), first)
+        self.assertEqual({'If-None-Match': '"abc"'}, second[1]['headers'])
+        self.assertEqual({'hits': 1, 'misses': 1, 'hit_rate': 0.5}, etags.stats())
+
+    @patch('facegraph.graph.session')
+    def test_changed_response_replaces_etag(self, mock_session):
+        mock_session.get.side_effect = [
+            self._response(200, '{"id": "1"}', etag='"abc"'),
+            self._response(200, '{"id": "2"}', etag='"def"'),
+        ]
+        etags = ETagCache()
+        graph = Graph(etags=etags)
+        graph.me.call_fb()
+        self.assertEqual('2', graph.me.call_fb().id)
+        self.assertEqual('"def"', etags.get('https://graph.facebook.com/me')[0])
+
+    @patch('facegraph.graph.session')
+    def test_responses_without_etag_are_not_stored(self, mock_session):
+        mock_session.get.return_value = self._response(200, '{"id": "1"}')
+        etags = ETagCache()
+        Graph(etags=etags).me.call_fb()
+        self.assertEqual(0, len(etags))
@@ -0,0 +1,182 @@
+from unittest import TestCase
+
+import eventlet
+import simplejson as json
+from mock import Mock, patch
+
+from facegraph import graph
+from facegraph.api import Api
+from facegraph.circuit import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker,
+                               CircuitBreakerRegistry, CircuitOpenError)
+from facegraph.url_operations import path_template
+
+from tests.helpers import FakeClock
+
+
+class PathTemplateTests(TestCase):
+
+    def test_templates(self):
+        self.assertEqual('/{id}/feed', path_template('/v2.3/123/feed'))
+        self.assertEqual('/{id}/feed', path_template('/me/feed/'))
+        self.assertEqual('/{id}/comments', path_template('/123_456/comments'))
+        self.assertEqual('/{id}', path_template('/cocacola'))
+        self.assertEqual('/', path_template('/'))
+        self.assertEqual('/oauth/access_token', path_template('/oauth/access_token'))
+        self.assertEqual('/method/stream.publish',
+                         path_template('/method/stream.publish'))
+
+
+class CircuitBreakerTests(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(('graph.facebook.com', '/{id}/feed'),
+                                      failure_threshold=3, reset_timeout=10,
+                                      clock=self.clock)
+
+    def fail(self, times):
+        for i in range(times):
+            self.breaker.before()
+            self.breaker.failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.fail(2)
+        self.breaker.success()
+        self.fail(2)
+        self.assertEqual(CLOSED, self.breaker.state)
+        self.fail(1)
+        self.assertEqual(OPEN, self.breaker.state)
+        self.assertRaises(CircuitOpenError, self.breaker.before)
+        self.assertEqual({'state': OPEN, 'successes': 1, 'failures': 5,
+                          'rejected': 1, 'opened': 1}, self.breaker.stats())
+
+    def test_half_open_trial_success_closes(self):
+        self.fail(3)
+        self.clock.now += 10
+        self.breaker.before()
+        self.assertEqual(HALF_OPEN, self.breaker.state)
+        # Only one trial request at a time.
+        self.assertRaises(CircuitOpenError, self.breaker.before)
+        self.breaker.success()
+        self.assertEqual(CLOSED, self.breaker.state)
+        self.breaker.before()
+
+    def test_half_open_trial_failure_reopens(self):
+        self.fail(3)
+        self.clock.now += 10
+        self.fail(1)
+        self.assertEqual(OPEN, self.breaker.state)
+        try:
+            self.breaker.before()
+        except CircuitOpenError, e:
+            self.assertEqual(10, e.retry_after)
+            self.assertEqual(('graph.facebook.com', '/{id}/feed'), e.key)
+        else:
+            self.fail('CircuitOpenError not raised')
+
+    def test_lost_trials_expire(self):
+        self.fail(3)
+        self.clock.now += 10
+        self.breaker.before()
+        # The trial never reports back.
+        self.assertRaises(CircuitOpenError, self.breaker.before)
+        self.clock.now += 10
+        self.breaker.before()
+        self.breaker.success()
+        self.assertEqual(CLOSED, self.breaker.state)
+
+
+class RegistryTests(TestCase):
+
+    def test_breakers_are_shared_by_template(self):
+        registry = CircuitBreakerRegistry(failure_threshold=1)
+        feed = registry.get('https://graph.facebook.com/123/feed?limit=5')
+        self.assertTrue(feed is registry.get('https://graph.facebook.com/456/feed'))
+        self.assertFalse(feed is registry.get('https://graph.facebook.com/123/comments'))
+        self.assertEqual(1, feed.failure_threshold)
+        self.assertEqual(
+            [('graph.facebook.com', '/{id}/comments'), ('graph.facebook.com', '/{id}/feed')],
+            sorted(registry.stats()))
+
+
+class GraphCircuitTests(TestCase):
+
+    def setUp(self):
+        self.registry = CircuitBreakerRegistry(failure_threshold=2)
+        self.graph = graph.Graph(retries=0, circuit_breakers=self.registry)
+
+    @patch('facegraph.graph.session')
+    def test_fails_fast_once_open(self, mock_session):
+        mock_session.get.side_effect = graph.requests.ConnectionError()
+        for i in range(2):
+            self.assertRaises(graph.requests.ConnectionError,
+                              self.graph[i].feed.call_fb)
+        self.assertRaises(CircuitOpenError, self.graph[3].feed.call_fb)
+        self.assertEqual(2, mock_session.get.call_count)
+
+        # Other endpoints are unaffected.
+        mock_session.get.side_effect = None
+        mock_session.get.return_value = Mock(status_code=200, content='{}')
+        self.graph[3].comments.call_fb()
+
+    @patch('facegraph.graph.session')
+    def test_permanent_errors_are_not_failures(self, mock_session):
+        error = Mock(status_code=400, content=json.dumps(
+            {'error': {'code': 190, 'message': 'Invalid OAuth access token.'}}))
+        error.raise_for_status.side_effect = graph.requests.HTTPError()
+        mock_session.get.return_value = error
+        for i in range(3):
+            self.assertRaises(graph.GraphException, self.graph.me.call_fb)
+        self.assertEqual(CLOSED, self.registry.get(self.graph.me.url).state)
+
+    @patch('facegraph.graph.session')
+    def test_killed_trial_is_a_failure(self, mock_session):
+        clock = FakeClock()
+        registry = CircuitBreakerRegistry(failure_threshold=1, reset_timeout=10,
+                                          clock=clock)
+        g = graph.Graph(retries=0, circuit_breakers=registry)
+        mock_session.get.side_effect = graph.requests.ConnectionError()
+        self.assertRaises(graph.requests.ConnectionError, g.me.call_fb)
+        clock.now += 10
+
+        # The trial request is killed while waiting for its response.
+        mock_session.get.side_effect = lambda *args, **kwargs: eventlet.sleep(1)
+        trial = eventlet.spawn(g.me.call_fb)
+        eventlet.sleep(0)
+        trial.kill()
+        breaker = registry.get(g.me.url)
+        self.assertEqual(OPEN, breaker.state)
+
+        clock.now += 10
+        mock_session.get.side_effect = None
+        mock_session.get.return_value = Mock(status_code=200, content='{}')
+        g.me.call_fb()
+        self.assertEqual(CLOSED, breaker.state)
+
+
+class ApiCircuitTests(TestCase):
+
+    def test_fails_fast_once_open(self):
+        mock_urllib = Mock()
+        mock_urllib.urlopen.side_effect = IOError()
+        api = Api(urllib2=mock_urllib, retries=0,
+                  circuit_breakers=CircuitBreakerRegistry(failure_threshold=1))
+        self.assertRaises(IOError, api.stream.publish, _retries=0)
+        self.assertRaises(CircuitOpenError, api.stream.publish)
+        self.assertEqual(1, mock_urllib.urlopen.call_count)
+
+    def test_killed_trial_is_a_failure(self):
+        clock = FakeClock()
+        registry = CircuitBreakerRegistry(failure_threshold=1, reset_timeout=10,
+                                          clock=clock)
+        mock_urllib = Mock()
+        mock_urllib.urlopen.side_effect = IOError()
+        api = Api(urllib2=mock_urllib, retries=0, circuit_breakers=registry)
+        self.assertRaises(IOError, api.stream.publish, _retries=0)
+        clock.now += 10
+
+        mock_urllib.urlopen.side_effect = lambda *args, **kwargs: eventlet.sleep(1)
+        trial = eventlet.spawn(api.stream.publish, _retries=0)
+        eventlet.sleep(0)
+        trial.kill()
+        self.assertEqual(OPEN, registry.stats().values()[0]['state'])
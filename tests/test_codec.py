@@ -0,0 +1,63 @@
+from unittest import TestCase
+
+import simplejson
+from mock import Mock, patch
+from simplejson.decoder import JSONDecodeError
+
+from facegraph import codec
+from facegraph.api import Api
+from facegraph.graph import Graph
+
+
+class CodecTests(TestCase):
+
+    def setUp(self):
+        self.previous = codec.current()
+
+    def tearDown(self):
+        codec.use(self.previous.name)
+
+    def test_default(self):
+        self.assertEqual('simplejson', codec.current().name)
+        self.assertEqual(['simplejson', 'json'], codec.available()[:2])
+
+    def test_every_codec(self):
+        for name in codec.available():
+            c = codec.use(name)
+            self.assertEqual(name, c.name)
+            self.assertEqual({'data': [1, u'caf\xe9']},
+                             codec.loads('{"data": [1, "caf\\u00e9"]}'))
+            self.assertEqual([1, 'a'], simplejson.loads(codec.dumps([1, 'a'])))
+            for bad in ('', '{"data": ', '<html>'):
+                try:
+                    codec.loads(bad)
+                except JSONDecodeError, e:
+                    self.assertEqual(bad, e.doc)
+                else:
+                    self.fail('%s decoded %r' % (name, bad))
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, codec.use, 'nosuchjson')
+        self.assertEqual(self.previous, codec.current())
+
+    def test_register(self):
+        loads = Mock(return_value={'id': '1'})
+        codec.register('mock', loads, simplejson.dumps)
+        self.assertTrue('mock' in codec.available())
+        codec.use('mock')
+        self.assertEqual({'id': '1'}, codec.loads('x'))
+        loads.assert_called_once_with('x')
+
+    @patch('facegraph.graph.session')
+    def test_used_by_graph(self, mock_session):
+        mock_session.get.return_value.content = '{"id": "1"}'
+        codec.register('mock', Mock(return_value={'id': '2'}), simplejson.dumps)
+        codec.use('mock')
+        self.assertEqual('2', Graph().me.call_fb().id)
+
+    def test_used_by_api(self):
+        mock_urllib = Mock()
+        mock_urllib.urlopen.return_value.read.return_value = '[]'
+        codec.register('mock', Mock(return_value={'ok': True}), simplejson.dumps)
+        codec.use('mock')
+        self.assertEqual({'ok': True}, Api(urllib2=mock_urllib).fql.query(query='q'))
@@ -0,0 +1,86 @@
+import urlparse
+from unittest import TestCase
+
+import simplejson as json
+from mock import Mock, patch
+
+from facegraph.graph import Graph, GraphException
+
+
+def _requested_ids(url):
+    query = urlparse.parse_qs(urlparse.urlsplit(url).query)
+    return query['ids'][0].split(',')
+
+
+class FakeGraphAPI(object):
+    """Answers `?ids=` requests, rejecting any chunk with a bad id in it."""
+
+    def __init__(self, bad_ids=(), missing_ids=()):
+        self.bad_ids = set(bad_ids)
+        self.missing_ids = set(missing_ids)
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        ids = _requested_ids(url)
+        response = Mock()
+        if self.bad_ids.intersection(ids):
+            response.content = json.dumps({'error': {
+                'code': 100,
+                'message': 'Some of the aliases you requested do not exist'}})
+        else:
+            response.content = json.dumps(dict(
+                (id, {'id': id}) for id in ids if id not in self.missing_ids))
+        return response
+
+
+class FetchManyTests(TestCase):
+
+    def setUp(self):
+        self.graph = Graph(access_token='token')
+
+    @patch('facegraph.graph.session')
+    def test_chunks_and_fields(self, mock_session):
+        api = FakeGraphAPI()
+        mock_session.get.side_effect = api.get
+        results = dict(self.graph.fetch_many(range(120), fields=['id', 'message'],
+                                             chunk_size=50))
+        self.assertEqual(120, len(results))
+        self.assertEqual('7', results['7'].id)
+        self.assertEqual(3, len(api.urls))
+        self.assertTrue('fields=id%2Cmessage' in api.urls[0])
+        self.assertEqual(
+            [50, 50, 20], sorted([len(_requested_ids(u)) for u in api.urls],
+                                 reverse=True))
+
+    @patch('facegraph.graph.session')
+    def test_bad_ids_are_isolated(self, mock_session):
+        api = FakeGraphAPI(bad_ids=['3'])
+        mock_session.get.side_effect = api.get
+        results = dict(self.graph.fetch_many(range(8), chunk_size=8))
+        self.assertEqual(8, len(results))
+        self.assertTrue(isinstance(results['3'], GraphException))
+        for id in ['0', '1', '2', '4', '5', '6', '7']:
+            self.assertEqual(id, results[id].id)
+
+    @patch('facegraph.graph.session')
+    def test_missing_ids(self, mock_session):
+        mock_session.get.side_effect = FakeGraphAPI(missing_ids=['2']).get
+        results = dict(self.graph.fetch_many(range(3)))
+        self.assertTrue(isinstance(results['2'], GraphException))
+        self.assertEqual('1', results['1'].id)
+
+    @patch('facegraph.graph.session')
+    def test_other_errors_fail_the_chunk(self, mock_session):
+        mock_session.get.return_value.content = json.dumps(
+            {'error': {'code': 190, 'message': 'Invalid OAuth access token.'}})
+        results = list(self.graph.fetch_many(range(4)))
+        self.assertEqual(1, mock_session.get.call_count)
+        self.assertEqual(4, len(results))
+        for id, result in results:
+            self.assertEqual(190, result.code)
+
+    @patch('facegraph.graph.session')
+    def test_empty(self, mock_session):
+        self.assertEqual([], list(self.graph.fetch_many([])))
+        self.assertFalse(mock_session.get.called)
@@ -0,0 +1,112 @@
+import urlparse
+from unittest import TestCase
+
+import eventlet
+import simplejson as json
+from mock import Mock, patch
+
+from facegraph.fql import FQL, _group_queries
+from facegraph.graph import GraphException
+
+
+def _requested_queries(url):
+    query = urlparse.parse_qs(urlparse.urlsplit(url).query)
+    return json.loads(query['queries'][0])
+
+
+class FakeMultiquery(object):
+    """Answers `fql.multiquery` requests with each query's name as its rows."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.urls = []
+        self.in_flight = 0
+        self.peak = 0
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        eventlet.sleep(0.001)
+        self.in_flight -= 1
+        queries = _requested_queries(url)
+        if self.failing.intersection(queries):
+            content = {'error_code': 601, 'error_msg': 'Parser error'}
+        else:
+            content = [{'name': name, 'fql_result_set': [{'name': name}]}
+                       for name in queries]
+        return Mock(status_code=200, content=json.dumps(content))
+
+
+class GroupQueriesTests(TestCase):
+
+    def test_group_size(self):
+        queries = dict(('q%d' % i, 'SELECT uid FROM user') for i in range(25))
+        groups = list(_group_queries(queries, 10, 100000))
+        self.assertEqual([10, 10, 5], [len(g) for g in groups])
+        self.assertEqual(set(queries), set().union(*groups))
+
+    def test_max_length(self):
+        queries = dict(('q%d' % i, 'SELECT uid FROM user WHERE uid = %d' % i)
+                       for i in range(10))
+        groups = list(_group_queries(queries, 100, 200))
+        self.assertTrue(len(groups) > 2)
+        self.assertTrue(all(len(json.dumps(g)) < 200 for g in groups))
+
+    def test_dependent_queries_stay_together(self):
+        queries = [('posts', 'SELECT actor_id FROM stream'),
+                   ('other', 'SELECT uid FROM user'),
+                   ('actors', 'SELECT name FROM user WHERE uid IN '
+                              '(SELECT actor_id FROM #posts)'),
+                   ('pics', 'SELECT src FROM profile WHERE id IN '
+                            '(SELECT uid FROM #actors)')]
+        groups = list(_group_queries(queries, 2, 100000))
+        self.assertTrue({'posts', 'actors', 'pics'} <= set(groups[0]))
+        self.assertEqual(['other'], list(groups[1]))
+
+
+class IterMultiTests(TestCase):
+
+    def setUp(self):
+        self.fql = FQL('token')
+        self.queries = dict(('q%d' % i, 'SELECT uid FROM user WHERE uid = %d' % i)
+                            for i in range(40))
+
+    @patch('facegraph.fql.session')
+    def test_results(self, mock_session):
+        api = FakeMultiquery()
+        mock_session.get.side_effect = api.get
+        results = dict(self.fql.iter_multi(self.queries, group_size=10,
+                                           concurrency=3))
+        self.assertEqual(set(self.queries), set(results))
+        self.assertEqual('q7', results['q7'][0].name)
+        self.assertEqual(4, len(api.urls))
+        self.assertEqual(3, api.peak)
+
+    @patch('facegraph.fql.session')
+    def test_failed_groups_are_reported_per_query(self, mock_session):
+        api = FakeMultiquery(failing=['q3'])
+        mock_session.get.side_effect = api.get
+        results = dict(self.fql.iter_multi(self.queries, group_size=10))
+        self.assertEqual(40, len(results))
+        failed = [name for name, rows in results.items()
+                  if isinstance(rows, GraphException)]
+        self.assertEqual(10, len(failed))
+        self.assertTrue('q3' in failed)
+
+    @patch('facegraph.fql.session')
+    def test_groups_are_requested_as_results_are_taken(self, mock_session):
+        api = FakeMultiquery()
+        mock_session.get.side_effect = api.get
+        results = self.fql.iter_multi(self.queries, group_size=10,
+                                      concurrency=2)
+        for i in range(10):
+            next(results)
+        eventlet.sleep(0.01)
+        # The first group has been taken; the third is only requested once
+        # more results are.
+        self.assertEqual(2, len(api.urls))
+        next(results)
+        eventlet.sleep(0)
+        self.assertEqual(3, len(api.urls))
+        self.assertEqual(29, len(list(results)))
@@ -0,0 +1,291 @@
+import datetime
+from StringIO import StringIO
+from unittest import TestCase
+
+import simplejson as json
+from mock import Mock, patch
+
+from facegraph import graph, transport
+from facegraph.api import Api
+from facegraph.fql import FQL
+from facegraph.instrument import EVENTS, Histogram, Hooks, RequestEvent
+from facegraph.retry import RetryPolicy
+
+
+class Recorder(object):
+    """Records each event fired, with a copy of the interesting fields."""
+
+    def __init__(self):
+        self.events = []
+        for name in EVENTS:
+            setattr(self, name, self._recorder(name))
+
+    def _recorder(self, name):
+        def record(event):
+            self.events.append((name, event.attempt, event.status,
+                                event.error_code, event.error))
+        return record
+
+    @property
+    def names(self):
+        return [e[0] for e in self.events]
+
+
+def _response(status, content):
+    response = Mock(status_code=status, content=content)
+    response.elapsed = datetime.timedelta(seconds=0)
+    if status >= 400:
+        response.raise_for_status.side_effect = graph.requests.HTTPError()
+    return response
+
+
+def _policy():
+    return RetryPolicy(budget=None, sleep=lambda seconds: None)
+
+
+class HooksTests(TestCase):
+
+    def test_on_and_add(self):
+        hooks = Hooks()
+        seen = []
+
+        @hooks.on('before_request')
+        def before(event):
+            seen.append(('before', event))
+
+        hooks.add(Recorder())
+        self.assertEqual(2, len(hooks.before_request))
+        self.assertEqual(1, len(hooks.on_error))
+        hooks.fire('before_request', 'event')
+        self.assertEqual([('before', 'event')], seen)
+
+    def test_unknown_event(self):
+        self.assertRaises(ValueError, Hooks().on, 'after_request', len)
+
+    def test_errors_in_hooks_are_logged(self):
+        hooks = Hooks()
+        hooks.on('on_error', Mock(side_effect=ValueError))
+        called = hooks.on('on_error', Mock())
+        with patch('facegraph.instrument.log') as log:
+            hooks.fire('on_error', 'event')
+        self.assertEqual(1, log.exception.call_count)
+        called.assert_called_once_with('event')
+
+
+class RequestEventTests(TestCase):
+
+    def test_endpoint(self):
+        event = RequestEvent('GET', 'https://graph.facebook.com/v2.3/123/feed'
+                                    '?access_token=abc')
+        self.assertEqual('graph.facebook.com/{id}/feed', event.endpoint)
+
+    def test_timings_add_up(self):
+        event = RequestEvent('GET', 'https://graph.facebook.com/me')
+        event.started_at -= 1.0
+        transport._connect_times.seconds = 0.25
+        response = _response(200, '{"id": "1"}')
+        response.elapsed = datetime.timedelta(seconds=0.75)
+        event.received(response)
+        self.assertEqual({'id': '1'}, event.load(response.content))
+        event.finish()
+
+        self.assertEqual(200, event.status)
+        self.assertEqual(11, event.bytes)
+        self.assertEqual(0.25, event.connect)
+        self.assertEqual(0.5, event.ttfb)
+        self.assertTrue(event.download >= 0.25)
+        self.assertTrue(event.decode >= 0)
+        total = event.connect + event.ttfb + event.download + event.decode
+        self.assertTrue(abs(event.elapsed - total) < 0.01)
+        # The connect time has been used up.
+        self.assertEqual(0.0, transport.pop_connect_time())
+
+    def test_error_code(self):
+        event = RequestEvent('GET', 'https://graph.facebook.com/me')
+        self.assertEqual(None, event.finish(data='{"id": "1"}').error_code)
+        self.assertFalse(event.failed)
+        self.assertEqual(190, event.finish(data=json.dumps(
+            {'error': {'code': 190}})).error_code)
+        self.assertTrue(event.failed)
+        self.assertEqual(606, event.finish(data={'error_code': 606}).error_code)
+        self.assertEqual(None, event.finish(data='error: not json').error_code)
+
+
+class TimedConnectionTests(TestCase):
+
+    def test_connect_is_timed(self):
+        class Connection(object):
+            def connect(self):
+                return 'connected'
+
+        transport.pop_connect_time()
+        conn = transport.timed_connection_class(Connection)()
+        self.assertEqual('connected', conn.connect())
+        self.assertTrue(transport.pop_connect_time() > 0)
+        self.assertEqual(0.0, transport.pop_connect_time())
+
+    def test_transport_adapters_time_connections(self):
+        t = transport.Transport()
+        adapter = t.session.get_adapter('https://graph.facebook.com/')
+        pool = adapter.poolmanager.connection_from_host(
+            'graph.facebook.com', 443, 'https')
+        self.assertEqual('TimedVerifiedHTTPSConnection',
+                         pool.ConnectionCls.__name__)
+
+
+class GraphHooksTests(TestCase):
+
+    def setUp(self):
+        self.recorder = Recorder()
+        self.hooks = Hooks(self.recorder)
+
+    @patch('facegraph.graph.session')
+    def test_success(self, mock_session):
+        mock_session.get.return_value = _response(200, '{"id": "1"}')
+        g = graph.Graph('token', hooks=self.hooks)
+        self.assertEqual('1', g.me.call_fb().id)
+        self.assertEqual([('before_request', 0, None, None, None),
+                          ('after_response', 0, 200, None, None)],
+                         self.recorder.events)
+
+    @patch('facegraph.graph.session')
+    def test_retried_errors(self, mock_session):
+        error = graph.requests.ConnectionError()
+        mock_session.get.side_effect = [
+            error,
+            _response(500, json.dumps({'error': {'code': 2}})),
+            _response(200, '{"id": "1"}')]
+        g = graph.Graph('token', hooks=self.hooks, retry_policy=_policy())
+        g.me.call_fb()
+        self.assertEqual([('before_request', 0, None, None, None),
+                          ('on_error', 0, None, None, error),
+                          ('on_retry', 0, None, None, error),
+                          ('before_request', 1, None, None, None),
+                          ('after_response', 1, 500, 2, self.recorder.events[5][4]),
+                          ('on_error', 1, 500, 2, self.recorder.events[5][4]),
+                          ('on_retry', 1, 500, 2, self.recorder.events[5][4]),
+                          ('before_request', 2, None, None, None),
+                          ('after_response', 2, 200, None, None)],
+                         self.recorder.events)
+        self.assertTrue(isinstance(self.recorder.events[5][4],
+                                   graph.requests.HTTPError))
+
+    @patch('facegraph.graph.session')
+    def test_permanent_error(self, mock_session):
+        mock_session.get.return_value = _response(
+            400, json.dumps({'error': {'code': 190}}))
+        g = graph.Graph('token', hooks=self.hooks, retry_policy=_policy())
+        self.assertRaises(graph.GraphException, g.me.call_fb)
+        self.assertEqual(['before_request', 'after_response', 'on_error'],
+                         self.recorder.names)
+        self.assertEqual(190, self.recorder.events[-1][3])
+
+    @patch('facegraph.graph.session')
+    def test_hooks_are_only_passed_when_set(self, mock_session):
+        mock_session.get.return_value = _response(200, '{}')
+        with patch.object(graph.Graph, 'fetch', return_value={}) as fetch:
+            graph.Graph('token').me.call_fb()
+            self.assertFalse('hooks' in fetch.call_args[1])
+            graph.Graph('token', hooks=self.hooks).me.call_fb()
+            self.assertTrue(fetch.call_args[1]['hooks'] is self.hooks)
+
+    @patch('facegraph.graph.session')
+    def test_post_mime(self, mock_session):
+        mock_session.post.side_effect = [
+            graph.requests.ConnectionError(), _response(200, 'true')]
+        g = graph.Graph('token', hooks=self.hooks, retry_policy=_policy())
+        self.assertEqual(True, g.me.photos.post_file(StringIO('PNG')))
+        self.assertEqual(['before_request', 'on_error', 'on_retry',
+                          'before_request', 'after_response'],
+                         self.recorder.names)
+
+    @patch('facegraph.graph.session')
+    def test_photos_post(self, mock_session):
+        mock_session.post.return_value = _response(200, '{"id": "1"}')
+        g = graph.Graph('token', hooks=self.hooks)
+        self.assertEqual('1', g.me.photos.post(source=StringIO('PNG')).id)
+        self.assertEqual(['before_request', 'after_response'],
+                         self.recorder.names)
+
+
+class FQLHooksTests(TestCase):
+
+    @patch('facegraph.fql.session')
+    def test_events(self, mock_session):
+        recorder = Recorder()
+        mock_session.get.return_value = _response(
+            200, json.dumps({'error_code': 606, 'error_msg': 'Bad'}))
+        q = FQL('token', hooks=Hooks(recorder))
+        self.assertRaises(graph.GraphException, q, 'SELECT')
+        self.assertEqual([('before_request', 0, None, None, None),
+                          ('after_response', 0, 200, 606, None),
+                          ('on_error', 0, 200, 606, None)],
+                         recorder.events)
+
+
+class ApiHooksTests(TestCase):
+
+    def test_events(self):
+        recorder = Recorder()
+        mock_urllib = Mock()
+        opened = Mock(read=Mock(return_value='{}'), getcode=Mock(return_value=200))
+        mock_urllib.urlopen.side_effect = [IOError(), opened]
+        api = Api(urllib2=mock_urllib, retry_policy=_policy(),
+                  hooks=Hooks(recorder))
+        self.assertEqual({}, api.fql.query(query='q'))
+        self.assertEqual(['before_request', 'on_error', 'on_retry',
+                          'before_request', 'after_response'], recorder.names)
+        self.assertEqual(200, recorder.events[-1][2])
+
+
+class HistogramTests(TestCase):
+
+    def event(self, url, elapsed, status=200, error=None):
+        event = RequestEvent('GET', url)
+        event.status = status
+        event.bytes = 10
+        event.connect = 0.0
+        event.ttfb = event.download = event.decode = elapsed / 4.0
+        event.elapsed = elapsed
+        event.error = error
+        return event
+
+    def test_percentiles(self):
+        histogram = Histogram()
+        hooks = Hooks(histogram)
+        for i in range(100):
+            hooks.report(self.event('https://graph.facebook.com/%d/feed' % i,
+                                    0.04 if i < 90 else 2))
+        feed = 'graph.facebook.com/{id}/feed'
+        # Bucket bounds, or the maximum if it is lower.
+        self.assertEqual(0.05, histogram.percentile(feed, 50))
+        self.assertEqual(0.05, histogram.percentile(feed, 90))
+        self.assertEqual(2, histogram.percentile(feed, 95))
+        self.assertEqual(0.01, histogram.percentile(feed, 50, phase='ttfb'))
+        self.assertEqual(None, histogram.percentile('unknown', 50))
+
+        stats = histogram.stats()[feed]
+        self.assertEqual(100, stats['requests'])
+        self.assertEqual(1000, stats['bytes'])
+        self.assertEqual(0, stats['errors'])
+        self.assertEqual(100, stats['elapsed']['count'])
+        self.assertEqual(2, stats['elapsed']['max'])
+        self.assertAlmostEqual(0.236, stats['elapsed']['mean'])
+
+    def test_errors_and_slowest(self):
+        histogram = Histogram()
+        hooks = Hooks(histogram)
+        hooks.report(self.event('https://graph.facebook.com/me', 0.02))
+        hooks.report(self.event('https://graph.facebook.com/1/insights', 3))
+        failed = self.event('https://graph.facebook.com/1/insights', 30,
+                            status=None, error=IOError())
+        hooks.report(failed)
+
+        stats = histogram.stats()
+        self.assertEqual(2, stats['graph.facebook.com/{id}/insights']['requests'])
+        self.assertEqual(1, stats['graph.facebook.com/{id}/insights']['errors'])
+        self.assertEqual([('graph.facebook.com/{id}/insights', 30),
+                          ('graph.facebook.com/{id}', 0.02)],
+                         histogram.slowest(2))
+        histogram.reset()
+        self.assertEqual({}, histogram.stats())
@@ -0,0 +1,84 @@
+from unittest import TestCase
+
+import bunch
+import pickle
+import simplejson as json
+from mock import patch
+
+from facegraph.graph import Graph
+from facegraph.node import Node, NodeList, wrap
+
+POST = {'id': '1_2', 'from': {'id': '2', 'name': 'Zachary'},
+        'comments': {'data': [{'id': '3', 'likes': [{'id': '4'}]}]},
+        'message': 'Hello'}
+
+
+class NodeTests(TestCase):
+
+    def setUp(self):
+        self.raw = json.loads(json.dumps(POST))
+        self.node = wrap(self.raw)
+
+    def test_attribute_access(self):
+        self.assertTrue(isinstance(self.node, bunch.Bunch))
+        self.assertEqual('Zachary', self.node['from'].name)
+        self.assertEqual('4', self.node.comments.data[0].likes[0].id)
+        self.assertRaises(AttributeError, getattr, self.node, 'missing')
+        self.assertRaises(KeyError, self.node.__getitem__, 'missing')
+
+    def test_parity_with_bunchify(self):
+        bunched = bunch.bunchify(self.raw)
+        self.assertEqual(bunched, self.node)
+        self.assertEqual(bunched.toDict(), self.node.toDict())
+        self.assertEqual(json.loads(json.dumps(POST)),
+                         json.loads(json.dumps(self.node)))
+
+    def test_nested_values_are_wrapped_once(self):
+        self.assertTrue(type(self.raw['from']) is dict)
+        sender = self.node['from']
+        self.assertTrue(isinstance(sender, Node))
+        self.assertTrue(sender is self.node['from'])
+        self.assertTrue(isinstance(self.node.get('comments').data, NodeList))
+        self.assertEqual(None, self.node.get('missing'))
+        self.assertEqual(None, self.node.get('values'))
+
+    def test_raw_data_is_not_modified(self):
+        self.node['from'].name = 'Someone'
+        self.node.comments.data[0].likes.append({'id': '5'})
+        self.assertEqual(POST, self.raw)
+
+    def test_dict_methods(self):
+        self.assertTrue(all(isinstance(v, (Node, basestring))
+                            for v in self.node.values()))
+        self.assertTrue(all(isinstance(v, (Node, basestring))
+                            for k, v in self.node.iteritems()))
+        self.assertTrue(isinstance(self.node.setdefault('from'), Node))
+        self.assertTrue(isinstance(self.node.pop('comments'), Node))
+        self.assertFalse('comments' in self.node)
+
+    def test_list_access(self):
+        items = wrap([{'id': str(i)} for i in range(5)])
+        self.assertEqual(['0', '1', '2', '3', '4'], [i.id for i in items])
+        self.assertEqual(['4', '3'], [i.id for i in reversed(items)][:2])
+        self.assertEqual('4', items[-1].id)
+        self.assertEqual(['1', '2'], [i.id for i in items[1:3]])
+        self.assertEqual(['0', '2', '4'], [i.id for i in items[::2]])
+        self.assertEqual('4', items.pop().id)
+
+    def test_pickle(self):
+        self.node.comments.data
+        self.assertEqual(self.node, pickle.loads(pickle.dumps(self.node)))
+
+    def test_scalars(self):
+        self.assertEqual(True, wrap(True))
+        self.assertEqual('x', wrap('x'))
+
+
+class GraphNodeTests(TestCase):
+
+    @patch('facegraph.graph.session')
+    def test_call_fb_returns_node(self, mock_session):
+        mock_session.get.return_value.content = json.dumps(POST)
+        post = Graph().me.call_fb()
+        self.assertTrue(isinstance(post, Node))
+        self.assertEqual('Zachary', post['from'].name)
@@ -0,0 +1,99 @@
+from unittest import TestCase
+
+import simplejson as json
+from mock import Mock, patch
+
+from facegraph.graph import Graph
+
+
+def _response(data):
+    response = Mock()
+    response.content = json.dumps(data)
+    return response
+
+
+def _page(items, after=None, next=None):
+    page = {'data': [{'id': str(i)} for i in items]}
+    if after or next:
+        page['paging'] = {}
+        if after:
+            page['paging']['cursors'] = {'after': after}
+        if next:
+            page['paging']['next'] = next
+    return page
+
+
+class PagingTests(TestCase):
+
+    def setUp(self):
+        self.graph = Graph(access_token='token')
+
+    @patch('facegraph.graph.session')
+    def test_follows_cursors(self, mock_session):
+        mock_session.get.side_effect = [
+            _response(_page([1, 2], after='A', next='https://graph.facebook.com/x')),
+            _response(_page([3], after='B', next='https://graph.facebook.com/y')),
+            _response(_page([])),
+        ]
+        ids = [item.id for item in self.graph.me.feed.iter_items(limit=2)]
+        self.assertEqual(['1', '2', '3'], ids)
+        urls = [call[0][0] for call in mock_session.get.call_args_list]
+        self.assertEqual(3, len(urls))
+        self.assertTrue('after=A' in urls[1])
+        self.assertTrue('limit=2' in urls[1])
+        self.assertTrue('after=B' in urls[2])
+
+    @patch('facegraph.graph.session')
+    def test_follows_next_without_cursors(self, mock_session):
+        next_url = 'https://graph.facebook.com/me/feed?until=123'
+        mock_session.get.side_effect = [
+            _response(_page([1], next=next_url)),
+            _response(_page([2])),
+        ]
+        ids = [item.id for item in self.graph.me.feed.iter_items()]
+        self.assertEqual(['1', '2'], ids)
+        second = mock_session.get.call_args_list[1][0][0]
+        self.assertTrue(second.startswith('https://graph.facebook.com/me/feed?'))
+        self.assertTrue('until=123' in second)
+
+    @patch('facegraph.graph.session')
+    def test_stops_without_next(self, mock_session):
+        mock_session.get.return_value = _response(_page([1, 2], after='A'))
+        pages = list(self.graph.me.feed.iter_pages())
+        self.assertEqual(1, len(pages))
+
+    @patch('facegraph.graph.session')
+    def test_max_items(self, mock_session):
+        mock_session.get.return_value = _response(
+            _page([1, 2, 3], after='A', next='https://graph.facebook.com/x'))
+        items = list(self.graph.me.feed.iter_items(max_items=4))
+        self.assertEqual(4, len(items))
+        self.assertEqual(2, mock_session.get.call_count)
+
+    @patch('facegraph.graph.session')
+    def test_max_pages(self, mock_session):
+        mock_session.get.return_value = _response(
+            _page([1], after='A', next='https://graph.facebook.com/x'))
+        pages = list(self.graph.me.feed.iter_pages(max_pages=3))
+        self.assertEqual(3, len(pages))
+        self.assertEqual(3, mock_session.get.call_count)
+
+    @patch('facegraph.graph.session')
+    def test_prefetch(self, mock_session):
+        mock_session.get.side_effect = [
+            _response(_page([1], after='A', next='https://graph.facebook.com/x')),
+            _response(_page([2], after='B', next='https://graph.facebook.com/y')),
+            _response(_page([])),
+        ]
+        ids = [item.id for item in
+               self.graph.me.feed.iter_items(prefetch=True)]
+        self.assertEqual(['1', '2'], ids)
+        self.assertEqual(3, mock_session.get.call_count)
+
+    @patch('facegraph.graph.session')
+    def test_prefetch_respects_max_pages(self, mock_session):
+        mock_session.get.return_value = _response(
+            _page([1], after='A', next='https://graph.facebook.com/x'))
+        pages = list(self.graph.me.feed.iter_pages(max_pages=2, prefetch=True))
+        self.assertEqual(2, len(pages))
+        self.assertEqual(2, mock_session.get.call_count)
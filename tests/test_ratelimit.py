@@ -0,0 +1,101 @@
+from unittest import TestCase
+
+import simplejson as json
+from mock import Mock, patch
+
+from facegraph.graph import Graph
+from facegraph.ratelimit import RateLimiter
+
+from tests.helpers import FakeClock
+
+
+class RateLimiterTests(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(threshold=50, max_delay=40,
+                                   throttled_delay=30, ttl=300,
+                                   clock=self.clock, sleep=Mock())
+
+    def test_no_delay_below_threshold(self):
+        self.limiter.update('t', {'X-App-Usage': json.dumps(
+            {'call_count': 50, 'total_time': 10, 'total_cputime': 5})})
+        self.assertEqual(0, self.limiter.delay('t'))
+
+    def test_delay_grows_with_usage(self):
+        self.limiter.update('t', {'X-App-Usage': json.dumps({'call_count': 75})})
+        self.assertEqual(10, self.limiter.delay('t'))
+        self.limiter.update('t', {'X-App-Usage': json.dumps({'total_cputime': 100})})
+        self.assertEqual(40, self.limiter.delay('t'))
+
+    def test_app_usage_affects_every_token(self):
+        self.limiter.update('a', {'X-App-Usage': json.dumps({'call_count': 100})})
+        self.assertEqual(40, self.limiter.delay('b'))
+
+    def test_page_usage_is_per_token(self):
+        self.limiter.update('a', {'X-Page-Usage': json.dumps({'call_count': 100})})
+        self.assertEqual(40, self.limiter.delay('a'))
+        self.assertEqual(0, self.limiter.delay('b'))
+
+    def test_business_use_case_usage(self):
+        header = {'123': [{'type': 'pages', 'call_count': 20,
+                           'total_cputime': 90, 'total_time': 10,
+                           'estimated_time_to_regain_access': 0}]}
+        self.limiter.update('a', {'X-Business-Use-Case-Usage': json.dumps(header)})
+        self.assertAlmostEqual(25.6, self.limiter.delay('a'))
+        self.assertEqual(0, self.limiter.delay('b'))
+
+    def test_time_to_regain_access(self):
+        header = {'123': [{'type': 'pages', 'call_count': 100,
+                           'estimated_time_to_regain_access': 2}]}
+        self.limiter.update('a', {'X-Business-Use-Case-Usage': json.dumps(header)})
+        self.assertEqual(120, self.limiter.delay('a'))
+        self.clock.now += 121
+        self.assertEqual(0, self.limiter.delay('a'))
+
+    def test_throttling_errors(self):
+        self.limiter.throttled('c', 100)
+        self.assertEqual(0, self.limiter.delay('c'))
+        self.limiter.throttled('a', 17)
+        self.assertEqual(30, self.limiter.delay('a'))
+        self.assertEqual(0, self.limiter.delay('b'))
+        self.limiter.throttled('a', 4)
+        self.assertEqual(30, self.limiter.delay('b'))
+
+    def test_stale_readings_are_ignored(self):
+        self.limiter.update('t', {'X-App-Usage': json.dumps({'call_count': 100})})
+        self.clock.now += 300
+        self.assertEqual(0, self.limiter.delay('t'))
+
+    def test_unparseable_headers(self):
+        self.limiter.update('t', {'X-App-Usage': 'not json'})
+        self.assertEqual(0, self.limiter.delay('t'))
+
+
+class GraphRateLimitTests(TestCase):
+
+    @patch('facegraph.graph.session')
+    def test_requests_wait_and_record_usage(self, mock_session):
+        response = mock_session.get.return_value
+        response.content = '{"id": "1"}'
+        response.headers = {'X-App-Usage': json.dumps({'call_count': 100})}
+        sleep = Mock()
+        limiter = RateLimiter(threshold=50, max_delay=8, sleep=sleep)
+        graph = Graph(access_token='token', rate_limiter=limiter)
+
+        graph.me.call_fb()
+        self.assertFalse(sleep.called)
+        graph.me.call_fb()
+        sleep.assert_called_once_with(8)
+
+    @patch('facegraph.graph.session')
+    def test_throttling_errors_are_recorded(self, mock_session):
+        response = mock_session.post.return_value
+        response.content = json.dumps(
+            {'error': {'code': 613, 'message': 'Calls to this api have exceeded the rate limit.'}})
+        response.headers = {}
+        limiter = RateLimiter(throttled_delay=60, sleep=Mock())
+        graph = Graph(access_token='token', rate_limiter=limiter,
+                      err_handler=lambda e: None)
+        graph.me.feed.post(message='hi')
+        self.assertTrue(limiter.delay('token') > 59)
@@ -0,0 +1,107 @@
+import pickle
+from unittest import TestCase
+
+import simplejson as json
+from mock import Mock, patch
+
+from facegraph.graph import Graph
+from facegraph.node import Node
+from facegraph.records import Record, expand_fields, record_class
+
+FIELDS = ('id', 'created_time', 'message', 'from.id')
+
+
+class RecordClassTests(TestCase):
+
+    def setUp(self):
+        self.Post = record_class(FIELDS)
+
+    def test_slots(self):
+        post = self.Post('1', 'today', 'Hi', '2')
+        self.assertTrue(isinstance(post, Record))
+        self.assertEqual(('id', 'created_time', 'message', 'from_id'),
+                         self.Post.__slots__)
+        self.assertFalse(hasattr(post, '__dict__'))
+        self.assertRaises(AttributeError, setattr, post, 'other', 1)
+
+    def test_classes_are_cached(self):
+        self.assertTrue(self.Post is record_class(list(FIELDS)))
+        self.assertFalse(self.Post is record_class(('id',)))
+
+    def test_from_dict(self):
+        post = self.Post.from_dict({'id': '1', 'message': 'Hi', 'likes': 3,
+                                    'from': {'id': '2', 'name': 'Zachary'}})
+        self.assertEqual(self.Post(id='1', message='Hi', from_id='2'), post)
+        self.assertEqual(None, post.created_time)
+        self.assertEqual({'id': '1', 'created_time': None, 'message': 'Hi',
+                          'from_id': '2'}, post._asdict())
+        self.assertEqual(
+            "Record(id='1', created_time=None, message='Hi', from_id='2')",
+            repr(post))
+        self.assertEqual(None, self.Post.from_dict({'from': 'x'}).from_id)
+
+    def test_pickle(self):
+        post = self.Post('1', 'today', 'Hi', '2')
+        for protocol in range(3):
+            self.assertEqual(post, pickle.loads(pickle.dumps(post, protocol)))
+
+    def test_bad_fields(self):
+        self.assertRaises(ValueError, record_class, ('from{id}',))
+        self.assertRaises(ValueError, record_class, ('from.id', 'from_id'))
+        self.assertRaises(TypeError, self.Post, 1, 2, 3, 4, 5)
+        self.assertRaises(TypeError, self.Post, name='x')
+
+    def test_expand_fields(self):
+        self.assertEqual('id,from{id,name},message',
+                         expand_fields(['id', 'from.id', 'message', 'from.name']))
+        self.assertEqual('a{b{c}}', expand_fields(['a.b.c']))
+
+
+class GraphRecordTests(TestCase):
+
+    def setUp(self):
+        self.feed = Graph().me.feed.fields(*FIELDS, record=True)
+
+    def test_url(self):
+        self.assertEqual('https://graph.facebook.com/me/feed?'
+                         'fields=id%2Ccreated_time%2Cmessage%2Cfrom%7Bid%7D',
+                         self.feed.url)
+        self.assertEqual('https://graph.facebook.com/me?fields=from.id',
+                         Graph().me.fields('from.id').url)
+        self.assertRaises(TypeError, Graph().fields, 'id', records=True)
+
+    @patch('facegraph.graph.session')
+    def test_page(self, mock_session):
+        mock_session.get.return_value.content = json.dumps(
+            {'data': [{'id': '1', 'from': {'id': '2'}}],
+             'paging': {'cursors': {'after': 'A'}}})
+        page = self.feed.call_fb()
+        self.assertTrue(isinstance(page, Node))
+        self.assertEqual('A', page.paging.cursors.after)
+        self.assertEqual(['2'], [post.from_id for post in page.data])
+        self.assertTrue(isinstance(page.data[0], record_class(FIELDS)))
+
+    @patch('facegraph.graph.session')
+    def test_object(self, mock_session):
+        mock_session.get.return_value.content = '{"id": "1", "message": "Hi"}'
+        post = Graph()['1'].fields(*FIELDS, record=True).call_fb()
+        self.assertEqual('Hi', post.message)
+
+    @patch('facegraph.graph.session')
+    def test_fetch_many(self, mock_session):
+        mock_session.get.return_value.content = json.dumps(
+            {'1': {'id': '1', 'message': 'a'}, '2': {'id': '2', 'message': 'b'}})
+        results = dict(Graph().fetch_many(['1', '2'], fields=['id', 'message'],
+                                          record=True))
+        self.assertEqual('b', results['2'].message)
+        self.assertTrue(isinstance(results['1'], Record))
+
+    @patch('facegraph.graph.session')
+    def test_streamed(self, mock_session):
+        response = Mock()
+        response.iter_content.return_value = [
+            '{"data": [{"id": "1", "from": {"id": "2"}}, ', '{"id": "3"}]}']
+        mock_session.get.return_value = response
+        posts = list(self.feed.iter_items(stream=True))
+        self.assertEqual([('1', '2'), ('3', None)],
+                         [(p.id, p.from_id) for p in posts])
@@ -0,0 +1,136 @@
+from unittest import TestCase
+
+import simplejson as json
+from mock import Mock, patch
+
+from facegraph import graph
+from facegraph.api import Api
+from facegraph.retry import RetryBudget, RetryPolicy
+
+from tests.helpers import FakeClock
+
+
+def _policy(clock, **kwargs):
+    kwargs.setdefault('budget', None)
+    return RetryPolicy(sleep=clock.sleep, clock=clock, **kwargs)
+
+
+class RetryPolicyTests(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_exponential_backoff(self):
+        policy = _policy(self.clock, base_delay=1, max_delay=5, jitter=False)
+        self.assertEqual([1, 2, 4, 5, 5], [policy.backoff(i) for i in range(5)])
+
+    def test_jitter(self):
+        policy = _policy(self.clock, base_delay=1, max_delay=5)
+        for attempt in range(5):
+            delay = policy.backoff(attempt)
+            self.assertTrue(0 <= delay <= min(5, 2 ** attempt))
+
+    def test_max_retries(self):
+        retry = _policy(self.clock, max_retries=2).start()
+        self.assertEqual([True, True, False], [retry.retry() for i in range(3)])
+
+    def test_max_elapsed(self):
+        policy = _policy(self.clock, max_retries=10, base_delay=1,
+                         max_delay=100, max_elapsed=10, jitter=False)
+        retry = policy.start()
+        while retry.retry():
+            pass
+        self.assertEqual(3, retry.attempt)
+        self.assertEqual(7, self.clock.now - retry.started_at)
+
+    def test_budget(self):
+        budget = RetryBudget(capacity=2, rate=1, clock=self.clock)
+        policy = _policy(self.clock, max_retries=10, base_delay=0, budget=budget)
+        retry = policy.start()
+        self.assertEqual([True, True, False], [retry.retry() for i in range(3)])
+        self.clock.now += 1
+        self.assertTrue(policy.start().retry())
+
+    def test_classification(self):
+        policy = _policy(self.clock)
+        self.assertTrue(policy.is_retryable('Got EOF while waiting for outstanding responses'))
+        self.assertTrue(policy.is_retryable('<html>Sorry, something went wrong</html>'))
+        self.assertTrue(policy.is_retryable('', 503))
+        self.assertTrue(policy.is_retryable(json.dumps({'error': {'code': 2}}), 400))
+        self.assertTrue(policy.is_retryable(
+            json.dumps({'error': {'code': 100, 'is_transient': True}}), 400))
+        self.assertFalse(policy.is_retryable(json.dumps({'error': {'code': 190}}), 400))
+        self.assertFalse(policy.is_retryable('not json', 400))
+
+    def test_default_policy_uses_retries(self):
+        self.assertEqual(3, RetryPolicy.resolve(None, 3).max_retries)
+        self.assertEqual(0, RetryPolicy.resolve(None, None).max_retries)
+
+    def test_default_policy_has_no_elapsed_limit_or_budget(self):
+        policy = RetryPolicy.resolve(None, 3)
+        self.assertEqual(None, policy.max_elapsed)
+        self.assertEqual(None, policy.budget)
+        # A slow first attempt (e.g. a 180s Api read timing out) is retried.
+        policy.sleep, policy.clock = self.clock.sleep, self.clock
+        retry = policy.start()
+        self.clock.now += 180
+        self.assertTrue(retry.retry())
+        policy = RetryPolicy(max_retries=1)
+        self.assertTrue(RetryPolicy.resolve(policy, 3) is policy)
+
+
+class GraphRetryTests(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    @patch('facegraph.graph.session')
+    def test_connection_errors_back_off(self, mock_session):
+        ok = Mock(status_code=200, content='{"id": "1"}')
+        mock_session.get.side_effect = [
+            graph.requests.ConnectionError(), graph.requests.ConnectionError(), ok]
+        policy = _policy(self.clock, base_delay=1, jitter=False)
+        g = graph.Graph(retry_policy=policy)
+        self.assertEqual('1', g.me.call_fb().id)
+        self.assertEqual(3, mock_session.get.call_count)
+        self.assertEqual(3, self.clock.now - 1000)
+
+    @patch('facegraph.graph.session')
+    def test_gives_up(self, mock_session):
+        mock_session.get.side_effect = graph.requests.ConnectionError()
+        g = graph.Graph(retry_policy=_policy(self.clock, max_retries=2))
+        self.assertRaises(graph.requests.ConnectionError, g.me.call_fb)
+        self.assertEqual(3, mock_session.get.call_count)
+
+    @patch('facegraph.graph.session')
+    def test_transient_error_responses_are_retried(self, mock_session):
+        error = Mock(status_code=500, content=json.dumps(
+            {'error': {'code': 2, 'message': 'Service temporarily unavailable'}}))
+        error.raise_for_status.side_effect = graph.requests.HTTPError()
+        ok = Mock(status_code=200, content='{"id": "1"}')
+        mock_session.get.side_effect = [error, ok]
+        g = graph.Graph(retry_policy=_policy(self.clock))
+        self.assertEqual('1', g.me.call_fb().id)
+
+    @patch('facegraph.graph.session')
+    def test_permanent_error_responses_are_not_retried(self, mock_session):
+        error = Mock(status_code=400, content=json.dumps(
+            {'error': {'code': 190, 'message': 'Invalid OAuth access token.'}}))
+        error.raise_for_status.side_effect = graph.requests.HTTPError()
+        mock_session.get.return_value = error
+        g = graph.Graph(retry_policy=_policy(self.clock))
+        self.assertRaises(graph.GraphException, g.me.call_fb)
+        self.assertEqual(1, mock_session.get.call_count)
+
+
+class ApiRetryTests(TestCase):
+
+    def test_execute_backs_off(self):
+        clock = FakeClock()
+        mock_urllib = Mock()
+        mock_urllib.urlopen.side_effect = [IOError(), Mock(read=Mock(return_value='{}'))]
+        api = Api(urllib2=mock_urllib,
+                  retry_policy=_policy(clock, base_delay=2, jitter=False))
+        self.assertEqual({}, api.fql.query(query='q'))
+        self.assertEqual(2, mock_urllib.urlopen.call_count)
+        self.assertEqual(2, clock.now - 1000)
@@ -0,0 +1,158 @@
+from unittest import TestCase
+
+import eventlet
+from mock import Mock, patch
+
+from facegraph.graph import Graph
+from facegraph.scheduler import QueueFull, Scheduler
+
+from tests.helpers import FakeClock
+
+
+class SchedulerTests(TestCase):
+
+    def setUp(self):
+        self.order = []
+        self.pool = eventlet.GreenPool()
+
+    def request(self, name):
+        self.order.append(name)
+        eventlet.sleep(0.001)
+        return name
+
+    def submit(self, scheduler, token, count):
+        return [self.pool.spawn(scheduler.run, token, self.request, token)
+                for i in range(count)]
+
+    def test_runs_straight_away_when_idle(self):
+        scheduler = Scheduler()
+        self.assertEqual('a', scheduler.run('a', self.request, 'a'))
+        self.assertEqual({'requests': 1, 'queued': 0, 'active': 0,
+                          'tenants': {}}, scheduler.stats())
+
+    def test_tenant_concurrency(self):
+        scheduler = Scheduler(concurrency=10, tenant_concurrency=2)
+        peak = []
+
+        def request():
+            peak.append(scheduler.tenants['a'].active)
+            eventlet.sleep(0.001)
+
+        for i in range(6):
+            self.pool.spawn(scheduler.run, 'a', request)
+        self.pool.waitall()
+        self.assertEqual(2, max(peak))
+        self.assertEqual(0, scheduler.active)
+        self.assertEqual({}, scheduler.tenants)
+
+    def test_tenants_take_turns(self):
+        scheduler = Scheduler(concurrency=1, tenant_concurrency=1)
+        self.submit(scheduler, 'noisy', 20)
+        eventlet.sleep(0)
+        self.submit(scheduler, 'quiet', 2)
+        self.pool.waitall()
+        # The quiet tenant alternates with the noisy one, rather than
+        # waiting for its backlog.
+        quiet = [i for i, name in enumerate(self.order) if name == 'quiet']
+        self.assertTrue(max(quiet) <= 4, self.order)
+
+    def test_weights(self):
+        scheduler = Scheduler(concurrency=1, tenant_concurrency=1)
+        scheduler.configure('heavy', weight=3)
+        self.submit(scheduler, 'heavy', 30)
+        self.submit(scheduler, 'light', 30)
+        self.pool.waitall()
+        first = self.order[:20]
+        self.assertTrue(14 <= first.count('heavy') <= 16, first)
+
+    def test_rate_limit(self):
+        scheduler = Scheduler(rate=100, burst=1)
+        started = eventlet.hubs.get_hub().clock()
+        self.submit(scheduler, 'a', 5)
+        self.pool.waitall()
+        self.assertTrue(eventlet.hubs.get_hub().clock() - started >= 0.035)
+        self.assertEqual(5, len(self.order))
+
+    def test_rate_limits_sequential_requests(self):
+        clock = FakeClock()
+        scheduler = Scheduler(rate=100, burst=1, clock=clock)
+        self.assertEqual('a', scheduler.run('a', self.request, 'a'))
+        second = self.pool.spawn(scheduler.run, 'a', self.request, 'a')
+        eventlet.sleep(0.02)
+        # No (fake) time has passed, so the bucket is still empty.
+        self.assertEqual(['a'], self.order)
+        clock.now += 0.01
+        self.assertEqual('a', second.wait())
+        self.assertEqual(['a'], list(scheduler.tenants))
+        # Once it has refilled, the tenant is forgotten.
+        clock.now += 1
+        scheduler.run('b', self.request, 'b')
+        self.assertEqual({}, scheduler.tenants)
+
+    def test_rate_limited_tenant_does_not_block_others(self):
+        scheduler = Scheduler(concurrency=1)
+        scheduler.configure('slow', rate=1, burst=1)
+        self.submit(scheduler, 'slow', 2)
+        eventlet.sleep(0)
+        self.submit(scheduler, 'fast', 3)
+        self.pool.waitall()
+        self.assertEqual(['slow', 'fast', 'fast', 'fast', 'slow'], self.order)
+
+    def test_many_tenants(self):
+        scheduler = Scheduler(concurrency=10, tenant_concurrency=1)
+        tenants = ['t%d' % i for i in range(200)]
+        for tenant in tenants:
+            self.submit(scheduler, tenant, 2)
+        self.pool.waitall()
+        # Every tenant gets one request in before any gets a second.
+        self.assertEqual(set(tenants), set(self.order[:200]))
+        self.assertEqual(400, len(self.order))
+        self.assertEqual([], scheduler._ready)
+        self.assertEqual({}, scheduler.tenants)
+
+    def test_max_waiting(self):
+        scheduler = Scheduler(tenant_concurrency=1, max_waiting=1)
+        pending = self.submit(scheduler, 'a', 3)
+        self.assertRaises(QueueFull, pending[2].wait)
+        self.assertEqual(['a', 'a'], [p.wait() for p in pending[:2]])
+
+    def test_exceptions_free_the_slot(self):
+        scheduler = Scheduler(tenant_concurrency=1)
+        self.assertRaises(ZeroDivisionError, scheduler.run, 'a', lambda: 1 / 0)
+        self.assertEqual(0, scheduler.active)
+        self.assertEqual('a', scheduler.run('a', self.request, 'a'))
+
+    def test_killed_waiters_give_up_their_place(self):
+        scheduler = Scheduler(tenant_concurrency=1)
+        first, second = self.submit(scheduler, 'a', 2)
+        eventlet.sleep(0)
+        second.kill()
+        self.assertEqual('a', first.wait())
+        self.assertEqual(0, scheduler.active)
+        self.assertEqual({}, scheduler.tenants)
+
+    def test_key(self):
+        scheduler = Scheduler(tenant_concurrency=1,
+                              key=lambda token: token.split('|')[0])
+        self.submit(scheduler, 'app|1', 1)
+        self.submit(scheduler, 'app|2', 1)
+        eventlet.sleep(0)
+        self.assertEqual({'active': 1, 'waiting': 1},
+                         scheduler.stats()['tenants']['app'])
+        self.pool.waitall()
+
+
+class GraphSchedulerTests(TestCase):
+
+    @patch('facegraph.graph.session')
+    def test_requests_are_scheduled_by_token(self, mock_session):
+        mock_session.get.return_value = Mock(status_code=200, content='{"id": "1"}')
+        scheduler = Mock(wraps=Scheduler())
+        g = Graph('token', scheduler=scheduler)
+        self.assertEqual('1', g.me.call_fb().id)
+        self.assertEqual('token', scheduler.run.call_args[0][0])
+
+    def test_setting_is_inherited(self):
+        scheduler = Scheduler()
+        self.assertTrue(Graph('token', scheduler=scheduler).me.feed.scheduler
+                        is scheduler)
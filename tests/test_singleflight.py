@@ -0,0 +1,146 @@
+from unittest import TestCase
+
+import eventlet
+from mock import Mock, patch
+
+from facegraph.cache import ResponseCache
+from facegraph.graph import Graph, GraphException
+from facegraph.singleflight import SingleFlight
+
+
+class SingleFlightTests(TestCase):
+
+    def setUp(self):
+        self.flights = SingleFlight()
+        self.calls = []
+
+    def slow(self, value):
+        self.calls.append(value)
+        eventlet.sleep(0.01)
+        return value
+
+    def test_concurrent_calls_are_shared(self):
+        pool = eventlet.GreenPool()
+        pending = [pool.spawn(self.flights.do, 'key', self.slow, i)
+                   for i in range(5)]
+        self.assertEqual([0] * 5, [p.wait() for p in pending])
+        self.assertEqual([0], self.calls)
+        self.assertEqual({'calls': 1, 'shared': 4}, self.flights.stats())
+        self.assertEqual(0, len(self.flights))
+
+    def test_different_keys_are_not_shared(self):
+        pool = eventlet.GreenPool()
+        a = pool.spawn(self.flights.do, 'a', self.slow, 'a')
+        b = pool.spawn(self.flights.do, 'b', self.slow, 'b')
+        self.assertEqual(('a', 'b'), (a.wait(), b.wait()))
+        self.assertEqual(['a', 'b'], self.calls)
+
+    def test_finished_calls_are_not_remembered(self):
+        self.assertEqual(1, self.flights.do('key', self.slow, 1))
+        self.assertEqual(2, self.flights.do('key', self.slow, 2))
+        self.assertEqual({'calls': 2, 'shared': 0}, self.flights.stats())
+
+    def test_exceptions_are_shared(self):
+        def fail():
+            self.calls.append(1)
+            eventlet.sleep(0.01)
+            raise ValueError('boom')
+
+        pool = eventlet.GreenPool()
+        pending = [pool.spawn(self.flights.do, 'key', fail) for i in range(3)]
+        for p in pending:
+            self.assertRaises(ValueError, p.wait)
+        self.assertEqual([1], self.calls)
+        self.assertEqual(0, len(self.flights))
+        # The failed call is not remembered either.
+        self.assertEqual(3, self.flights.do('key', self.slow, 3))
+
+    def test_killed_calls_are_made_again(self):
+        pool = eventlet.GreenPool()
+        leader = pool.spawn(self.flights.do, 'key', self.slow, 1)
+        followers = [pool.spawn(self.flights.do, 'key', self.slow, 2)
+                     for i in range(3)]
+        eventlet.sleep(0)
+        leader.kill()
+        # The killed leader's fate is not handed on: a follower takes over.
+        self.assertEqual([2] * 3, [p.wait() for p in followers])
+        self.assertEqual([1, 2], self.calls)
+        self.assertEqual({'calls': 2, 'shared': 2}, self.flights.stats())
+        self.assertEqual(0, len(self.flights))
+
+    def test_timeouts_are_not_shared(self):
+        def impatient():
+            with eventlet.Timeout(0.001):
+                return self.flights.do('key', self.slow, 1)
+
+        pool = eventlet.GreenPool()
+        leader = pool.spawn(impatient)
+        eventlet.sleep(0)
+        follower = pool.spawn(self.flights.do, 'key', self.slow, 2)
+        self.assertRaises(eventlet.Timeout, leader.wait)
+        self.assertEqual(2, follower.wait())
+
+
+class GraphSingleFlightTests(TestCase):
+
+    def setUp(self):
+        self.flights = SingleFlight()
+
+    def slow_get(self, content):
+        def get(url, **kwargs):
+            eventlet.sleep(0.01)
+            response = Mock()
+            response.status_code = 200
+            response.content = content
+            return response
+        return get
+
+    @patch('facegraph.graph.session')
+    def test_identical_reads_share_one_request(self, mock_session):
+        mock_session.get.side_effect = self.slow_get('{"id": "1", "likes": 3}')
+        g = Graph('token', single_flight=self.flights)
+
+        pool = eventlet.GreenPool()
+        pending = [pool.spawn(g['1'].call_fb) for i in range(10)]
+        results = [p.wait() for p in pending]
+        self.assertEqual(['1'] * 10, [r.id for r in results])
+        self.assertEqual(1, mock_session.get.call_count)
+        self.assertEqual({'calls': 1, 'shared': 9}, self.flights.stats())
+
+    @patch('facegraph.graph.session')
+    def test_keyed_on_the_final_url(self, mock_session):
+        mock_session.get.side_effect = self.slow_get('{"id": "1"}')
+        pool = eventlet.GreenPool()
+        pending = [
+            pool.spawn(Graph('a', single_flight=self.flights)['1'].call_fb),
+            pool.spawn(Graph('b', single_flight=self.flights)['1'].call_fb),
+            pool.spawn(Graph('a', single_flight=self.flights)['1'].call_fb,
+                       fields='id'),
+        ]
+        for p in pending:
+            p.wait()
+        self.assertEqual(3, mock_session.get.call_count)
+
+    @patch('facegraph.graph.session')
+    def test_errors_are_raised_for_every_caller(self, mock_session):
+        mock_session.get.side_effect = self.slow_get(
+            '{"error": {"code": 100, "message": "Bad"}}')
+        g = Graph('token', single_flight=self.flights)
+
+        pool = eventlet.GreenPool()
+        pending = [pool.spawn(g['1'].call_fb) for i in range(3)]
+        for p in pending:
+            self.assertRaises(GraphException, p.wait)
+        self.assertEqual(1, mock_session.get.call_count)
+
+    @patch('facegraph.graph.session')
+    def test_with_cache(self, mock_session):
+        mock_session.get.side_effect = self.slow_get('{"id": "1"}')
+        g = Graph('token', single_flight=self.flights, cache=ResponseCache())
+
+        pool = eventlet.GreenPool()
+        pending = [pool.spawn(g['1'].call_fb) for i in range(3)]
+        for p in pending:
+            p.wait()
+        self.assertEqual('1', g['1'].call_fb().id)
+        self.assertEqual(1, mock_session.get.call_count)
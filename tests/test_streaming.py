@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+
+import simplejson as json
+from mock import Mock, patch
+from simplejson.decoder import JSONDecodeError
+
+from facegraph.graph import Graph, GraphException
+from facegraph.streaming import JSONStream
+
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _response(data, size=7):
+    response = Mock()
+    response.iter_content.return_value = _chunks(json.dumps(data), size)
+    return response
+
+
+class JSONStreamTests(TestCase):
+
+    DOC = {'data': [{'id': '1', 'message': u'caf\xe9 ☃'}, 12345, 1.5e3,
+                    None, [1, [2]], 'x'],
+           'paging': {'cursors': {'after': 'QVFI'}}}
+
+    def test_every_chunk_size(self):
+        text = json.dumps(self.DOC, ensure_ascii=False).encode('utf-8')
+        for size in range(1, len(text) + 1):
+            stream = JSONStream(_chunks(text, size))
+            self.assertEqual(self.DOC['data'], list(stream))
+            self.assertEqual({'paging': self.DOC['paging']}, stream.rest)
+            self.assertEqual(6, stream.count)
+
+    def test_members_around_data(self):
+        text = '{"summary": {"total_count": 2} , "data" : [ ] ,"x":1}'
+        stream = JSONStream(_chunks(text, 3))
+        self.assertEqual([], list(stream))
+        self.assertEqual({'summary': {'total_count': 2}, 'x': 1}, stream.rest)
+
+    def test_not_an_object(self):
+        stream = JSONStream(['[1, ', '2]'])
+        self.assertEqual([], list(stream))
+        self.assertEqual([1, 2], stream.rest)
+
+    def test_data_not_an_array(self):
+        stream = JSONStream(['{"data": {"a": 1}}'])
+        self.assertEqual([], list(stream))
+        self.assertEqual({'data': {'a': 1}}, stream.rest)
+
+    def test_truncated(self):
+        stream = JSONStream(['{"data": [{"id": 1}, {"id"'])
+        iterator = iter(stream)
+        self.assertEqual({'id': 1}, next(iterator))
+        self.assertRaises(JSONDecodeError, next, iterator)
+
+    def test_empty(self):
+        self.assertRaises(JSONDecodeError, list, JSONStream(['', '  ']))
+
+    def test_closes_chunks(self):
+        closed = []
+
+        def chunks():
+            try:
+                yield '{"data": [1, 2, 3]}'
+            finally:
+                closed.append(True)
+        iterator = iter(JSONStream(chunks()))
+        next(iterator)
+        iterator.close()
+        self.assertEqual([True], closed)
+
+
+class GraphStreamingTests(TestCase):
+
+    def setUp(self):
+        self.graph = Graph(access_token='token')
+
+    @patch('facegraph.graph.session')
+    def test_iter_items(self, mock_session):
+        mock_session.get.side_effect = [
+            _response({'data': [{'id': '1'}, {'id': '2'}],
+                       'paging': {'cursors': {'after': 'A'}, 'next': 'x'}}),
+            _response({'data': [{'id': '3'}], 'paging': {}}),
+        ]
+        items = list(self.graph.me.feed.iter_items(stream=True, limit=2))
+        self.assertEqual(['1', '2', '3'], [item.id for item in items])
+        urls = [call[0][0] for call in mock_session.get.call_args_list]
+        self.assertTrue('after=A' in urls[1])
+        self.assertEqual({'stream': True}, mock_session.get.call_args[1])
+
+    @patch('facegraph.graph.session')
+    def test_max_items_releases_response(self, mock_session):
+        response = _response({'data': [{'id': str(i)} for i in range(10)]})
+        mock_session.get.return_value = response
+        items = self.graph.me.feed.iter_items(stream=True, max_items=3)
+        self.assertEqual(3, len(list(items)))
+        self.assertEqual(1, response.close.call_count)
+
+    @patch('facegraph.graph.session')
+    def test_errors(self, mock_session):
+        mock_session.get.return_value = _response(
+            {'error': {'code': 100, 'message': 'Bad'}})
+        items = self.graph.me.feed.iter_items(stream=True)
+        self.assertRaises(GraphException, list, items)
+
+    def test_no_prefetch(self):
+        items = self.graph.me.feed.iter_items(stream=True, prefetch=True)
+        self.assertRaises(ValueError, list, items)
@@ -0,0 +1,224 @@
+import subprocess
+import sys
+from StringIO import StringIO
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from facegraph import fql, graph, transport
+from facegraph.adapters import DNSCachingAdapter
+from facegraph.api import Api
+from facegraph.fql import FQL
+from facegraph.graph import Graph
+from facegraph.retry import RetryPolicy
+from facegraph.transport import DNSCache, LazySession, Transport
+
+from tests.helpers import FakeClock
+
+
+class FakeFile(StringIO):
+    def open(self):
+        self.seek(0)
+
+
+def fake_response(content):
+    response = Mock()
+    response.content = content
+    response.status_code = 200
+    return response
+
+
+class TransportTests(TestCase):
+
+    def test_pool_sizes(self):
+        t = Transport(pool_connections=3, pool_maxsize=7, pool_block=True)
+        for prefix in ('http://', 'https://'):
+            adapter = t.session.get_adapter(prefix + 'graph.facebook.com/')
+            self.assertEqual(3, adapter._pool_connections)
+            self.assertEqual(7, adapter._pool_maxsize)
+            self.assertEqual(True, adapter._pool_block)
+            self.assertFalse(isinstance(adapter, DNSCachingAdapter))
+
+    def test_headers(self):
+        self.assertEqual('gzip', Transport().session.headers['Accept-encoding'])
+        self.assertEqual('keep-alive', Transport().session.headers['Connection'])
+        t = Transport(keep_alive=False)
+        self.assertEqual('close', t.session.headers['Connection'])
+
+    def test_transports_have_their_own_pools(self):
+        a, b = Transport(), Transport()
+        self.assertFalse(a.session is b.session)
+        self.assertFalse(a.session.get_adapter('https://graph.facebook.com/') is
+                         b.session.get_adapter('https://graph.facebook.com/'))
+
+    def test_dns_cache_adapter(self):
+        t = Transport(dns_cache_ttl=60)
+        adapter = t.session.get_adapter('https://graph.facebook.com/')
+        self.assertTrue(isinstance(adapter, DNSCachingAdapter))
+        self.assertTrue(adapter.dns_cache is t.dns_cache)
+        pool = adapter.poolmanager.connection_from_host(
+            'graph.facebook.com', 443, 'https')
+        self.assertEqual('CachedDNSTimedVerifiedHTTPSConnection',
+                         pool.ConnectionCls.__name__)
+
+    def test_http2_needs_hyper(self):
+        with patch.object(transport.eventlet, 'import_patched',
+                          side_effect=ImportError('No module named hyper')):
+            self.assertRaises(ImportError, Transport, http2=True)
+
+    def test_http2_mounts_https_adapter(self):
+        hyper_contrib = Mock()
+        with patch.object(transport.eventlet, 'import_patched',
+                          return_value=hyper_contrib):
+            t = Transport(http2=True)
+        self.assertTrue(t.session.get_adapter('https://graph.facebook.com/') is
+                        hyper_contrib.HTTP20Adapter.return_value)
+        self.assertFalse(t.session.get_adapter('http://graph.facebook.com/') is
+                         hyper_contrib.HTTP20Adapter.return_value)
+
+    def test_default_session_is_shared(self):
+        self.assertTrue(graph.session is transport.default_session)
+        self.assertTrue(fql.session is graph.session)
+        self.assertTrue(graph.session.transport is transport.default_transport)
+
+    def test_session_is_created_when_first_used(self):
+        t = Transport()
+        self.assertEqual(None, t._session)
+        t.close()
+        session = LazySession(t)
+        self.assertEqual('gzip', session.headers['Accept-encoding'])
+        self.assertTrue(t._session is t.session)
+
+    def test_import_is_lazy(self):
+        # Importing the package, or a module, neither imports requests nor
+        # creates a session.
+        code = ('import sys, facegraph, facegraph.graph, facegraph.fql; '
+                'from facegraph.transport import default_transport; '
+                'assert default_transport._session is None; '
+                'assert "requests" not in sys.modules; '
+                'assert "facegraph.async_graph" not in sys.modules; '
+                'from facegraph import AsyncGraph; '
+                'assert "facegraph.async_graph" in sys.modules')
+        self.assertEqual(0, subprocess.call([sys.executable, '-c', code],
+                                            env={'PYTHONPATH': ':'.join(sys.path)}))
+
+
+class DNSCacheTests(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = DNSCache(ttl=60, clock=self.clock)
+        patcher = patch.object(transport.socket, 'getaddrinfo')
+        self.getaddrinfo = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.getaddrinfo.return_value = [
+            (2, 1, 6, '', ('10.0.0.1', 443))]
+
+    def test_resolve_is_cached_for_ttl(self):
+        self.assertEqual('10.0.0.1', self.cache.resolve('graph.facebook.com', 443))
+        self.assertEqual('10.0.0.1', self.cache.resolve('graph.facebook.com', 443))
+        self.assertEqual(1, self.getaddrinfo.call_count)
+
+        self.clock.now += 61
+        self.getaddrinfo.return_value = [
+            (2, 1, 6, '', ('10.0.0.2', 443))]
+        self.assertEqual('10.0.0.2', self.cache.resolve('graph.facebook.com', 443))
+        self.assertEqual(2, self.getaddrinfo.call_count)
+
+    def test_clear(self):
+        self.cache.resolve('graph.facebook.com', 443)
+        self.cache.clear()
+        self.cache.resolve('graph.facebook.com', 443)
+        self.assertEqual(2, self.getaddrinfo.call_count)
+
+    def test_connection_connects_to_cached_address(self):
+        connected = []
+
+        class Connection(object):
+            def __init__(self, host, port):
+                self.host = host
+                self.port = port
+
+            def _new_conn(self):
+                connected.append(self.host)
+                return 'socket'
+
+        conn = self.cache.connection_class(Connection)('graph.facebook.com', 443)
+        self.assertEqual('socket', conn._new_conn())
+        self.assertEqual(['10.0.0.1'], connected)
+        self.assertEqual('graph.facebook.com', conn.host)
+
+
+class InjectedTransportTests(TestCase):
+
+    def setUp(self):
+        self.transport = Mock()
+        self.transport.get.return_value = fake_response('{"id": "1"}')
+        self.transport.post.return_value = fake_response('true')
+
+    @patch('facegraph.graph.session')
+    def test_graph(self, mock_session):
+        g = Graph('token', transport=self.transport)
+        self.assertEqual('1', g.me.call_fb().id)
+        self.assertEqual(True, g.me.feed.post(message='hi'))
+        self.assertTrue(g.me.feed.transport is self.transport)
+        self.assertEqual(1, self.transport.get.call_count)
+        self.assertEqual(1, self.transport.post.call_count)
+        self.assertFalse(mock_session.get.called or mock_session.post.called)
+
+    @patch('facegraph.graph.session')
+    def test_graph_post_file(self, mock_session):
+        g = Graph('token', transport=self.transport)
+        self.assertEqual(True, g.me.photos.post_file(StringIO('PNGDATA')))
+        self.assertEqual(1, self.transport.post.call_count)
+        self.assertFalse(mock_session.post.called)
+
+    @patch('facegraph.graph.session')
+    def test_graph_stream(self, mock_session):
+        self.transport.get.return_value.iter_content.return_value = iter(
+            ['{"data": [{"id": "1"}]}'])
+        g = Graph('token', transport=self.transport)
+        self.assertEqual(['1'], [i.id for i in g.me.feed.iter_items(stream=True)])
+        self.assertEqual(True, self.transport.get.call_args[1]['stream'])
+        self.assertFalse(mock_session.get.called)
+
+    @patch('facegraph.fql.session')
+    def test_fql(self, mock_session):
+        self.transport.get.return_value = fake_response('[{"post_id": "1"}]')
+        q = FQL('token', transport=self.transport)
+        self.assertEqual('1', q('SELECT post_id FROM stream')[0].post_id)
+        self.assertFalse(mock_session.get.called)
+
+    @patch('facegraph.graph.session')
+    def test_api(self, mock_session):
+        api = Api('token', transport=self.transport)
+        self.assertEqual({'id': '1'}, api.users.getInfo(uids='1'))
+        self.assertEqual({'id': '1'}, api.query('SELECT uid FROM user'))
+        self.assertEqual(2, self.transport.get.call_count)
+        self.assertEqual(180, self.transport.get.call_args[1]['timeout'])
+        self.assertFalse(mock_session.get.called)
+
+    @patch('facegraph.graph.session')
+    def test_api_uses_shared_session(self, mock_session):
+        mock_session.get.return_value = fake_response('{"id": "1"}')
+        self.assertEqual({'id': '1'}, Api('token').users.getInfo(uids='1'))
+        self.assertEqual(1, mock_session.get.call_count)
+
+    @patch('facegraph.graph.session')
+    def test_api_http_errors_are_retried(self, mock_session):
+        error = fake_response('{"error": {"code": 2, "message": "Try again"}}')
+        error.status_code = 500
+        error.raise_for_status.side_effect = graph.requests.HTTPError()
+        self.transport.get.side_effect = [error, fake_response('{"id": "1"}')]
+        api = Api('token', transport=self.transport,
+                  retry_policy=RetryPolicy(budget=None, sleep=lambda s: None))
+        self.assertEqual({'id': '1'}, api.users.getInfo(uids='1'))
+        self.assertEqual(2, self.transport.get.call_count)
+
+    @patch('facegraph.graph.session')
+    def test_api_photo_upload(self, mock_session):
+        self.transport.post.return_value = fake_response('{"pid": "1"}')
+        api = Api('token', transport=self.transport)
+        self.assertEqual('1', api.photos.upload(photo=FakeFile('PNGDATA'))['pid'])
+        self.assertEqual(1, self.transport.post.call_count)
+        self.assertFalse(mock_session.post.called)
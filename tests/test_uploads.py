@@ -0,0 +1,245 @@
+import os
+import tempfile
+from StringIO import StringIO
+from unittest import TestCase
+
+import simplejson as json
+from mock import Mock, patch
+
+from facegraph import graph
+from facegraph.api import Api
+from facegraph.multipart import FilePart, MultipartEncoder
+from facegraph.retry import RetryPolicy
+from facegraph.video import ResumableVideoUpload
+
+
+class FakeFile(StringIO):
+    """Like Django's `File`, which is opened before being read."""
+
+    def __init__(self, data='PNGDATA'):
+        StringIO.__init__(self, data)
+        self.opened = 0
+
+    def open(self):
+        self.opened += 1
+        self.seek(0)
+
+
+class Unseekable(object):
+    def read(self):
+        return 'PNGDATA'
+
+
+def _capture(mock_session, content):
+    """Record the URL, keyword arguments and body of each POST."""
+    sent = []
+
+    def post(url, data, **kwargs):
+        sent.append((url, kwargs, data.read()))
+        return Mock(content=content)
+    mock_session.post.side_effect = post
+    return sent
+
+
+class ReadRecorder(object):
+    def __init__(self, file):
+        self.file = file
+        self.sizes = []
+
+    def read(self, size):
+        self.sizes.append(size)
+        return self.file.read(size)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+class MultipartEncoderTests(TestCase):
+
+    def test_body(self):
+        body = MultipartEncoder(
+            [('message', 'Hi')],
+            [(None, FilePart(StringIO('0123456789'), offset=2, length=5)),
+             ('source', FilePart(StringIO('xyz'), filename='a.mp4',
+                                 content_type='video/mp4'))],
+            boundary='B')
+        expected = ('--B\r\nContent-Disposition: form-data; name="message"\r\n\r\n'
+                    'Hi\r\n'
+                    '--B\r\nContent-Disposition: form-data; filename="facegraphfile.png"\r\n\r\n'
+                    '23456\r\n'
+                    '--B\r\nContent-Disposition: form-data; name="source"; filename="a.mp4"\r\n'
+                    'Content-Type: video/mp4\r\n\r\n'
+                    'xyz\r\n'
+                    '--B--\r\n')
+        self.assertEqual(len(expected), len(body))
+        self.assertEqual(expected, body.read())
+        self.assertEqual('', body.read())
+        body.rewind()
+        self.assertEqual(expected, ''.join(iter(lambda: body.read(4), '')))
+        body.rewind()
+        self.assertEqual(expected, ''.join(body))
+        self.assertEqual('multipart/form-data; boundary=B', body.content_type)
+
+    def test_files_are_read_in_chunks(self):
+        fd, path = tempfile.mkstemp()
+        os.write(fd, 'x' * 100000)
+        os.close(fd)
+        try:
+            with open(path, 'rb') as file:
+                file = ReadRecorder(file)
+                part = FilePart(file)
+                self.assertEqual(100000, part.length)
+                body = MultipartEncoder([], [('source', part)])
+                self.assertEqual(len(body), len(''.join(body)))
+                self.assertEqual(100000, sum(file.sizes))
+                self.assertTrue(max(file.sizes) <= 64 * 1024)
+        finally:
+            os.remove(path)
+
+    def test_unseekable_files(self):
+        part = FilePart(Unseekable())
+        self.assertEqual(7, part.length)
+
+    def test_short_file(self):
+        body = MultipartEncoder([], [(None, FilePart(StringIO('abc'), length=5))])
+        self.assertRaises(IOError, body.read)
+
+
+class GraphUploadTests(TestCase):
+
+    def setUp(self):
+        self.graph = graph.Graph(access_token='token', timeout=30)
+
+    @patch('facegraph.graph.session')
+    def test_post_photo(self, mock_session):
+        sent = _capture(mock_session, '{"id": "1"}')
+        photo = FakeFile()
+        result = self.graph.me.photos.post(file=photo, message=u'caf\xe9')
+        self.assertEqual('1', result.id)
+        (url, kwargs, body), = sent
+        self.assertEqual('https://graph.facebook.com/me/photos', url)
+        self.assertEqual(30, kwargs['timeout'])
+        self.assertTrue(kwargs['headers']['Content-Type'].startswith(
+            'multipart/form-data; boundary='))
+        self.assertTrue('name="message"\r\n\r\ncaf\xc3\xa9' in body)
+        self.assertTrue('name="access_token"\r\n\r\ntoken' in body)
+        self.assertTrue('filename="facegraphfile.png"\r\n\r\nPNGDATA\r\n' in body)
+        self.assertEqual(1, photo.opened)
+        self.assertTrue(photo.closed)
+
+    @patch('facegraph.graph.session')
+    def test_post_file(self, mock_session):
+        sent = _capture(mock_session, '{"id": "2"}')
+        self.assertEqual('2', self.graph.me.videos.post_file(Unseekable()).id)
+        self.assertTrue('PNGDATA' in sent[0][2])
+
+    @patch('facegraph.graph.session')
+    def test_failed_uploads_are_sent_again(self, mock_session):
+        bodies = []
+
+        def post(url, data, **kwargs):
+            bodies.append(data.read())
+            if len(bodies) == 1:
+                raise graph.requests.ConnectionError()
+            return Mock(content='{"id": "1"}')
+        mock_session.post.side_effect = post
+        policy = RetryPolicy(base_delay=0, budget=None)
+        result = graph.Graph.post_mime('https://graph.facebook.com/me/photos',
+                                       retry_policy=policy, file=FakeFile())
+        self.assertEqual({'id': '1'}, result)
+        self.assertEqual(2, len(bodies))
+        self.assertEqual(bodies[0], bodies[1])
+        self.assertTrue('PNGDATA' in bodies[0])
+
+    @patch('facegraph.graph.session')
+    def test_gives_up(self, mock_session):
+        mock_session.post.side_effect = graph.requests.ConnectionError()
+        self.assertRaises(graph.requests.ConnectionError, graph.Graph.post_mime,
+                          'https://graph.facebook.com/me/photos', retries=0)
+
+
+class ApiUploadTests(TestCase):
+
+    @patch('facegraph.graph.session')
+    def test_photo_upload(self, mock_session):
+        sent = _capture(mock_session, '{"pid": "1"}')
+        api = Api(access_token='token', timeout=30)
+        self.assertEqual({'pid': '1'}, api.photos.upload(photo=FakeFile()))
+        (url, kwargs, body), = sent
+        self.assertEqual('https://api.facebook.com/method/photos.upload', url)
+        self.assertEqual(30, kwargs['timeout'])
+        self.assertTrue('name="access_token"\r\n\r\ntoken' in body)
+        self.assertTrue('filename="myfilewhichisgood.png"\r\n'
+                        'Content-Type: image/png\r\n\r\nPNGDATA' in body)
+
+
+class VideoUploadTests(TestCase):
+
+    def setUp(self):
+        self.graph = graph.Graph(access_token='token', retries=1)
+        self.video = StringIO('0123456789')
+        self.requests = []
+
+    def _respond(self, *responses):
+        responses = list(responses)
+
+        def post(url, data, **kwargs):
+            body = data.read()
+            self.requests.append((url, body))
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return Mock(content=json.dumps(response))
+        return post
+
+    def _chunks(self):
+        return [body.split('filename="chunk"\r\n\r\n')[1].split('\r\n')[0]
+                for url, body in self.requests if 'name="video_file_chunk"' in body]
+
+    @patch('facegraph.graph.session')
+    def test_upload(self, mock_session):
+        mock_session.post.side_effect = self._respond(
+            {'upload_session_id': 'S', 'video_id': 'V',
+             'start_offset': '0', 'end_offset': '4'},
+            {'start_offset': '4', 'end_offset': '8'},
+            {'start_offset': '8', 'end_offset': '10'},
+            {'start_offset': '10', 'end_offset': '10'},
+            {'success': True})
+        self.assertEqual({'success': True},
+                         self.graph['123'].videos.upload_video(self.video, title='T'))
+        self.assertEqual(['0123', '4567', '89'], self._chunks())
+        urls = set(url for url, body in self.requests)
+        self.assertEqual(set(['https://graph-video.facebook.com/123/videos']), urls)
+        start, finish = self.requests[0][1], self.requests[-1][1]
+        self.assertTrue('name="file_size"\r\n\r\n10\r\n' in start)
+        self.assertTrue('name="upload_phase"\r\n\r\nfinish\r\n' in finish)
+        self.assertTrue('name="title"\r\n\r\nT\r\n' in finish)
+
+    @patch('facegraph.graph.session')
+    def test_failed_chunks_are_retried_then_resumed(self, mock_session):
+        error = {'error': {'code': 6001, 'message': 'Upload failed'}}
+        mock_session.post.side_effect = self._respond(
+            {'upload_session_id': 'S', 'video_id': 'V',
+             'start_offset': '0', 'end_offset': '4'},
+            {'start_offset': '4', 'end_offset': '8'},
+            error, error)
+        upload = ResumableVideoUpload(self.graph['123'].videos, self.video)
+        upload.graph.retry_policy = RetryPolicy(max_retries=1, base_delay=0,
+                                                budget=None)
+        self.assertRaises(graph.GraphException, upload.run)
+        self.assertEqual((4, 8), (upload.start_offset, upload.end_offset))
+
+        mock_session.post.side_effect = self._respond(
+            {'start_offset': '8', 'end_offset': '10'},
+            {'start_offset': '10', 'end_offset': '10'},
+            {'success': True})
+        resumed = ResumableVideoUpload(
+            self.graph['123'].videos, self.video, session_id=upload.session_id,
+            video_id=upload.video_id, start_offset=upload.start_offset,
+            end_offset=upload.end_offset)
+        self.assertEqual({'success': True}, resumed.run())
+        self.assertEqual(['0123', '4567', '4567', '4567', '89'], self._chunks())
+
+    def test_resuming_needs_offsets(self):
+        self.assertRaises(ValueError, ResumableVideoUpload, self.graph,
+                          self.video, session_id='S', start_offset=4)
@@ -1,34 +1,22 @@
 from unittest import TestCase
 from facegraph import graph
 from facegraph import url_operations as ops
+from facegraph.api import Api
 from facegraph.fql import FQL
 from mock import patch, Mock
-import httplib
 
 class CustomExceptionsTest(TestCase):
-    def _set_up_mock_httplib(self, desired_response):
-        mock_file = Mock()
-        mock_file.read = Mock(return_value=desired_response)
-
-        mock_r = Mock()
-
-        mock_getresponse = Mock(return_value=mock_file)
-        mock_r.getresponse = mock_getresponse
-
-        mock_httplib = Mock(spec=httplib)
-        mock_httplib.HTTPSConnection = Mock(return_value=mock_r)
-
-        return mock_httplib
-
-    def test_empty_response(self):
-        mock_httplib = self._set_up_mock_httplib('')
+    @patch('facegraph.graph.session')
+    def test_empty_response(self, mock_session):
+        mock_session.post.return_value.content = ''
         with self.assertRaises(graph.EmptyStringReturnedException):
-            graph.Graph.post_mime('url', httplib=mock_httplib)
+            graph.Graph.post_mime('url')
 
-    def test_bad_json_response(self):
-        mock_httplib = self._set_up_mock_httplib('invalid')
+    @patch('facegraph.graph.session')
+    def test_bad_json_response(self, mock_session):
+        mock_session.post.return_value.content = 'invalid'
         with self.assertRaises(graph.WrappedJSONDecodeError):
-            graph.Graph.post_mime('url', httplib=mock_httplib)
+            graph.Graph.post_mime('url')
 
 
 class UrlOperationsTests(TestCase):
@@ -122,6 +110,18 @@ class UrlOperationsTests(TestCase):
         self.assertEquals('http://a.com?my+key=c', ops.add_query_params(url, ('my key', 'c')))
         self.assertEquals('http://a.com?c=my+val', ops.add_query_params(url, ('c', 'my val')))
 
+    def test_join_path(self):
+        self.assertEquals('/a', ops.join_path('', 'a'))
+        self.assertEquals('/a', ops.join_path('/', '/a'))
+        self.assertEquals('/a/b/', ops.join_path('/a', 'b/'))
+
+    def test_merge_query_params(self):
+        bits = (('a', 'b'), ('c', 'd'))
+        self.assertEquals((('c', 'd'), ('a', 'e')),
+                          ops.merge_query_params(bits, ('a', 'e')))
+        self.assertEquals((('a', 'b'), ('c', 'd'), ('a', 'e')),
+                          ops.merge_query_params(bits, ('a', 'e'), update=False))
+
     def test_no_double_escaping_existing_params(self):
         url = 'http://a.com?a=%C4%A9'
         self.assertEquals('http://a.com?a=%C4%A9&c=d', ops.update_query_params(url, {'c': 'd'}))
@@ -156,6 +156,38 @@ class GraphUrlTests(TestCase):
         expected = 'https://graph.facebook.com/path/path2'
         self.assertEquals(expected, self.graph['path']['path2'].url)
 
+    def test_with_url_params(self):
+        node = self.graph.path.with_url_params('a', 'b')
+        self.assertEquals('https://graph.facebook.com/path?a=b', node.url)
+        node = node.with_url_params('a', 'c').child
+        self.assertEquals('https://graph.facebook.com/path/child?a=c', node.url)
+
+    def test_fields_and_ids(self):
+        self.assertEquals('https://graph.facebook.com/me?fields=id%2Cname',
+                          self.graph.me.fields('id', 'name').url)
+        self.assertEquals('https://graph.facebook.com/?ids=1%2C2',
+                          self.graph.ids(1, 2).url)
+
+    def test_copy_with_url(self):
+        node = self.graph.copy(url='https://graph.facebook.com/a?b=c#d')
+        self.assertEquals('https://graph.facebook.com/a?b=c#d', node.url)
+        self.assertEquals('https://graph.facebook.com/a/e?b=c#d', node.e.url)
+
+    def test_settings_are_inherited(self):
+        parent = graph.Graph(access_token='token', timeout=5)
+        child = parent.me.feed
+        self.assertEquals('token', child.access_token)
+        self.assertEquals(5, child.timeout)
+        child.timeout = 10
+        self.assertEquals(5, parent.timeout)
+        self.assertEquals(10, child.comments.timeout)
+
+    def test_nodes_have_no_instance_dict(self):
+        self.assertFalse(hasattr(self.graph.me, '__dict__'))
+
+    def test_unexpected_state(self):
+        self.assertRaises(TypeError, graph.Graph, unknown='value')
+
 
 class FQLTests(TestCase):
     def setUp(self):
@@ -184,3 +216,32 @@ class FQLTests(TestCase):
         url = mock_fetch.call_args[0][0]
         self.assertTrue(url.startswith('https://api.facebook.com/method/fql.multiquery?'))
         self.assertTrue("&queries=%5B%22my_query1%22%2C+%22my_query2%22%5D" in url)
+
+
+class ApiUrlTests(TestCase):
+    def setUp(self):
+        self.urllib2 = Mock()
+        self.urllib2.urlopen.return_value.read.return_value = '{}'
+
+    def test_default_roots(self):
+        api = Api(access_token='abc123', urllib2=self.urllib2)
+        api.users.getInfo(uids='1')
+        api.query('my_query')
+        urls = [c[0][0] for c in self.urllib2.urlopen.call_args_list]
+        self.assertTrue(urls[0].startswith(
+            'https://api.facebook.com/method/users.getInfo?access_token=abc123&'))
+        self.assertTrue(urls[1].startswith('https://graph.facebook.com/fql?'))
+
+    def test_overridden_roots(self):
+        class LocalApi(Api):
+            GRAPH_ROOT = 'http://localhost:8000/'
+            REST_ROOT = 'http://localhost:8000/method/'
+
+        api = LocalApi(access_token='abc123', urllib2=self.urllib2)
+        api.users.getInfo(uids='1')
+        api.query('my_query')
+        api.exists('123')
+        urls = [c[0][0] for c in self.urllib2.urlopen.call_args_list]
+        self.assertTrue(urls[0].startswith('http://localhost:8000/method/users.getInfo?'))
+        self.assertTrue(urls[1].startswith('http://localhost:8000/fql?'))
+        self.assertEqual('http://localhost:8000/123?access_token=abc123', urls[2])
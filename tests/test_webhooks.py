@@ -0,0 +1,182 @@
+from unittest import TestCase
+
+import eventlet
+import simplejson as json
+from mock import patch
+
+from facegraph.graph import Graph
+from facegraph.webhooks import (InvalidSignature, WebhookPipeline,
+                                iter_changes, sign, verify_signature,
+                                verify_subscription)
+
+from tests.test_fetch_many import FakeGraphAPI, _requested_ids
+
+SECRET = 'app-secret'
+
+
+def feed_update(*post_ids, **kwargs):
+    verb = kwargs.get('verb', 'add')
+    return json.dumps({'object': 'page', 'entry': [
+        {'id': '1', 'time': 100, 'changes': [
+            {'field': 'feed', 'value': {'item': 'post', 'verb': verb,
+                                        'post_id': post_id}}]}
+        for post_id in post_ids]})
+
+
+class SignatureTests(TestCase):
+
+    def test_sign_and_verify(self):
+        body = feed_update('1_2')
+        for algorithm in ('sha1', 'sha256'):
+            verify_signature(SECRET, body, sign(SECRET, body, algorithm))
+
+    def test_bad_signatures_are_rejected(self):
+        body = feed_update('1_2')
+        for signature in (None, '', 'nonsense', 'md5=abc',
+                          sign('other-secret', body),
+                          sign(SECRET, body + ' ')):
+            self.assertRaises(InvalidSignature, verify_signature,
+                              SECRET, body, signature)
+
+    def test_unicode_secret(self):
+        body = feed_update('1_2')
+        verify_signature(u'app-secret', body, sign(SECRET, body))
+
+    def test_verify_subscription(self):
+        params = {'hub.mode': 'subscribe', 'hub.verify_token': 'token',
+                  'hub.challenge': '1158201444'}
+        self.assertEqual('1158201444', verify_subscription(params, 'token'))
+        self.assertRaises(ValueError, verify_subscription, params, 'other')
+        self.assertRaises(ValueError, verify_subscription, {}, 'token')
+
+
+class IterChangesTests(TestCase):
+
+    def test_changes(self):
+        changes = list(iter_changes(feed_update('1_2', '1_3')))
+        self.assertEqual(['1_2', '1_3'], [c.object_id for c in changes])
+        self.assertEqual(['page', 'page'], [c.object for c in changes])
+        self.assertEqual('feed', changes[0].field)
+        self.assertEqual(100, changes[0].time)
+
+    def test_object_is_read_first(self):
+        body = ('{"object": "page", "entry": [{"id": "1", "changes": '
+                '[{"field": "feed", "value": {"post_id": "1_2"}}]}]}')
+        stream = iter_changes(body)
+        self.assertEqual('page', next(stream).object)
+
+    def test_changed_fields(self):
+        body = json.dumps({'object': 'user', 'entry': [
+            {'uid': '7', 'id': '7', 'time': 5, 'changed_fields': ['name', 'email']}]})
+        changes = list(iter_changes(body))
+        self.assertEqual([('7', 'name'), ('7', 'email')],
+                         [(c.object_id, c.field) for c in changes])
+
+    def test_signature_is_checked_before_parsing(self):
+        self.assertRaises(InvalidSignature, list,
+                          iter_changes('{not json', SECRET, 'sha1=00'))
+
+    def test_removed(self):
+        change = list(iter_changes(feed_update('1_2', verb='remove')))[0]
+        self.assertTrue(change.removed)
+
+
+class WebhookPipelineTests(TestCase):
+
+    def setUp(self):
+        self.handled = {}
+        self.pipeline = WebhookPipeline(Graph('token', SECRET), self.handle,
+                                        fields={'feed': ['id', 'message']})
+
+    def handle(self, object_id, data, changes):
+        self.handled[object_id] = (data, changes)
+
+    def receive(self, body):
+        return self.pipeline.receive(body, sign(SECRET, body))
+
+    def test_app_secret_is_required(self):
+        self.assertRaises(ValueError, WebhookPipeline, Graph('token'), self.handle)
+
+    def test_forged_callbacks_are_rejected(self):
+        body = feed_update('1_2')
+        self.assertRaises(InvalidSignature, self.pipeline.receive,
+                          body, sign('other-secret', body))
+        self.assertEqual(0, len(self.pipeline))
+
+    @patch('facegraph.graph.session')
+    def test_burst_is_batched(self, mock_session):
+        api = FakeGraphAPI()
+        mock_session.get.side_effect = api.get
+        post_ids = ['1_%d' % i for i in range(1000)]
+        for i in range(0, 1000, 100):
+            self.assertEqual(100, self.receive(feed_update(*post_ids[i:i + 100])))
+
+        self.assertEqual(1000, self.pipeline.flush())
+        self.assertEqual(20, len(api.urls))
+        self.assertTrue('fields=id%2Cmessage' in api.urls[0])
+        self.assertEqual(set(post_ids), set(self.handled))
+        data, changes = self.handled['1_5']
+        self.assertEqual('1_5', data.id)
+        self.assertEqual(1, len(changes))
+
+    @patch('facegraph.graph.session')
+    def test_redeliveries_are_dropped(self, mock_session):
+        api = FakeGraphAPI()
+        mock_session.get.side_effect = api.get
+        body = feed_update('1_2', '1_3')
+        self.assertEqual(2, self.receive(body))
+        self.assertEqual(0, self.receive(body))
+        self.pipeline.flush()
+        self.assertEqual(['1_2', '1_3'], sorted(_requested_ids(api.urls[0])))
+        self.assertEqual(2, self.pipeline.stats()['duplicates'])
+
+    @patch('facegraph.graph.session')
+    def test_changes_to_one_object_are_coalesced(self, mock_session):
+        api = FakeGraphAPI()
+        mock_session.get.side_effect = api.get
+        self.receive(feed_update('1_2'))
+        self.receive(feed_update('1_2', verb='edited'))
+        self.assertEqual(1, self.pipeline.flush())
+        self.assertEqual(['1_2'], _requested_ids(api.urls[0]))
+        self.assertEqual(2, len(self.handled['1_2'][1]))
+
+    @patch('facegraph.graph.session')
+    def test_removed_objects_are_not_fetched(self, mock_session):
+        self.receive(feed_update('1_2', verb='remove'))
+        self.pipeline.flush()
+        self.assertFalse(mock_session.get.called)
+        self.assertEqual(None, self.handled['1_2'][0])
+
+    @patch('facegraph.graph.session')
+    def test_fetch_errors_are_handed_on(self, mock_session):
+        api = FakeGraphAPI(missing_ids=['1_3'])
+        mock_session.get.side_effect = api.get
+        self.receive(feed_update('1_2', '1_3'))
+        self.pipeline.flush()
+        self.assertTrue(isinstance(self.handled['1_3'][0], Exception))
+        self.assertEqual('1_2', self.handled['1_2'][0].id)
+
+    @patch('facegraph.graph.session')
+    def test_handler_errors_are_logged(self, mock_session):
+        api = FakeGraphAPI()
+        mock_session.get.side_effect = api.get
+        self.pipeline.handler = lambda *args: 1 / 0
+        self.receive(feed_update('1_2', '1_3'))
+        self.assertEqual(2, self.pipeline.flush())
+
+    @patch('facegraph.graph.session')
+    def test_flushes_when_full(self, mock_session):
+        api = FakeGraphAPI()
+        mock_session.get.side_effect = api.get
+        self.pipeline.max_pending = 3
+        self.receive(feed_update('1_1', '1_2'))
+        self.assertEqual(2, len(self.pipeline))
+        self.receive(feed_update('1_3'))
+        self.receive(feed_update('1_4'))
+        # The callbacks are answered before anything is fetched.
+        self.assertEqual(4, len(self.pipeline))
+        self.assertFalse(mock_session.get.called)
+        eventlet.sleep(0.01)
+        self.assertEqual(0, len(self.pipeline))
+        self.assertEqual(4, len(self.handled))
+        self.assertEqual(1, self.pipeline.stats()['flushes'])